@@ -0,0 +1,175 @@
+import os
+import sys
+import logging
+import argparse
+from datetime import date
+
+from seed import connect, create_schema, seed, add_connection_args
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "possum_api"))
+import graphs
+from queries import VISIT_STATISTICS_QUERY, RECENT_ACTIVITY_QUERY, VISITS_BY_NIGHT_QUERY
+# Project root for the repository queries (appended: its config.py must not shadow the API's)
+sys.path.append(os.path.join(HERE, "..", ".."))
+from db.queries import REPRESENTATIVE_ROI_QUERY, VISIT_ROIS_FOR_STATISTICS_QUERY
+
+# Tables where a full table scan (EXPLAIN type ALL) means a missing index
+LARGE_TABLES = {"visits", "frames", "rois"}
+
+# The queries the API and the visit repository actually run, by the parameters they take
+QUERIES = {
+    "visits_by_night_range": (VISIT_STATISTICS_QUERY, "week"),
+    "recent_activity": (RECENT_ACTIVITY_QUERY, None),
+    "videos_rois_by_night": (VISITS_BY_NIGHT_QUERY, "night"),
+    "visit_rois_for_statistics": (VISIT_ROIS_FOR_STATISTICS_QUERY, "visit"),
+    "representative_roi": (REPRESENTATIVE_ROI_QUERY, "visit")
+}
+
+# Dashboard queries whose plans must use the new indexes (index scans are fine,
+# these aggregate over all ROIs, but reading full rows is not)
+DASHBOARD_CHARTS = [graphs.start_fence_position, graphs.end_fence_position, graphs.heatmap_position]
+
+# Index each query is expected to use per table
+EXPECTED_KEYS = {
+    "visits_by_night_range": {"visits": "idx_visits_night_approved"},
+    "recent_activity": {"visits": "idx_visits_approved_start"},
+    "videos_rois_by_night": {"visits": "idx_visits_night_approved"},
+    "visit_rois_for_statistics": {"frames": "idx_frames_visit_frame"},
+    "representative_roi": {"frames": "idx_frames_visit_frame"},
+    "heatmap_position": {"rois": "idx_rois_frame_center"}
+}
+
+
+class CaptureConnection:
+    """
+    Connection stand-in recording the query a chart function executes.
+    """
+
+    def __init__(self):
+        self.query = None
+
+    def cursor(self, dictionary=False):
+        return self
+
+    def execute(self, query, params=None):
+        self.query = query
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+def chart_query(func):
+    conn = CaptureConnection()
+    func(conn)
+    return conn.query
+
+
+def sample_params(conn, kind):
+    cur = conn.cursor()
+
+    if kind == "night" or kind == "week":
+        cur.execute("SELECT night_date FROM visits ORDER BY night_date DESC LIMIT 1")
+        night = cur.fetchone()[0]
+        params = (night,) if kind == "night" else (date.fromordinal(night.toordinal() - 7), night)
+
+    elif kind == "visit":
+        cur.execute("SELECT MAX(visit_id) DIV 2 FROM visits")
+        params = (cur.fetchone()[0],)
+
+    else:
+        params = None
+
+    cur.close()
+    return params
+
+
+def explain(conn, query, params):
+    cur = conn.cursor(dictionary=True)
+    cur.execute("EXPLAIN " + query, params)
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+
+def check_plan(name, plan):
+    """
+    Returns a list of problems: full scans of large tables and unexpected indexes.
+    """
+    problems = []
+
+    for row in plan:
+        table = row["table"]
+        # Aliases (v, f, r) are resolved by the first letter of the table name
+        table_name = next((t for t in LARGE_TABLES if t == table or t[0] == table), None)
+
+        if table_name and row["type"] == "ALL":
+            problems.append(f"{name}: full scan of {table_name}")
+
+        expected = EXPECTED_KEYS.get(name, {}).get(table_name)
+        if expected and row["key"] != expected:
+            problems.append(f"{name}: {table_name} uses {row['key']} instead of {expected}")
+
+    return problems
+
+
+def check_all(conn, rois=0, verbose=True):
+    """
+    EXPLAINs every query and returns the problems found.
+    With `rois` the (load test) database is recreated and seeded first.
+    """
+    # The optimizer prefers full scans on tiny tables, plans are only
+    # meaningful with realistic volumes
+    if rois:
+        create_schema(conn)
+        seed(conn, rois)
+
+    checks = [(name, query, sample_params(conn, kind)) for name, (query, kind) in QUERIES.items()]
+    checks += [(func.__name__, chart_query(func), None) for func in DASHBOARD_CHARTS]
+
+    problems = []
+
+    for name, query, params in checks:
+        plan = explain(conn, query, params)
+
+        if verbose:
+            for row in plan:
+                print(f"{name:28s} {str(row['table']):14s} {str(row['type']):8s} {str(row['key']):28s} {row['Extra'] or ''}")
+
+        problems += check_plan(name, plan)
+
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN the hot queries and fail on full scans")
+    add_connection_args(parser)
+    parser.add_argument("--rois", type=int, default=100000,
+                        help="Seed this many ROIs first (0 = use existing data)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    conn = connect(args)
+
+    try:
+        problems = check_all(conn, args.rois)
+    finally:
+        conn.close()
+
+    for problem in problems:
+        print(f"FAIL {problem}")
+
+    if problems:
+        sys.exit(1)
+    print("All query plans use indexes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+import subprocess
+import http.client
+from datetime import timedelta
+from urllib.parse import urlparse, urlencode
+
+from seed import connect, create_schema, seed, add_connection_args
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(HERE, "..", "possum_api")
+
+QUANTILES = (0.5, 0.95, 0.99)
+ENDPOINTS = ["/visits", "/videos_rois", "/recent_activity", "/statistics/dashboard"]
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class RequestFactory:
+    """
+    Builds request paths with random dates inside the seeded night range.
+    """
+
+    def __init__(self, first_night, last_night, window_days=30):
+        self.first_night = first_night
+        self.nights = max(1, (last_night - first_night).days + 1)
+        self.window_days = window_days
+
+    def random_night(self, rng):
+        return self.first_night + timedelta(days=rng.randrange(self.nights))
+
+    def path(self, endpoint, rng):
+        if endpoint == "/visits":
+            start = self.random_night(rng)
+            end = start + timedelta(days=self.window_days)
+            return f"{endpoint}?{urlencode({'start_date': start, 'end_date': end})}"
+
+        if endpoint == "/videos_rois":
+            return f"{endpoint}?{urlencode({'current_date': self.random_night(rng)})}"
+
+        return endpoint
+
+
+def client_loop(base_url, endpoint, factory, deadline, results, seed_value):
+    """
+    One client: sends requests back to back over a keep-alive connection until deadline.
+    """
+    rng = random.Random(seed_value)
+    url = urlparse(base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port, timeout=60)
+
+    latencies = []
+    errors = 0
+
+    while time.perf_counter() < deadline:
+        path = factory.path(endpoint, rng)
+        start = time.perf_counter()
+
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status == 200
+
+        except (OSError, http.client.HTTPException):
+            ok = False
+            conn.close()
+            conn = http.client.HTTPConnection(url.hostname, url.port, timeout=60)
+
+        if ok:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors += 1
+
+    conn.close()
+    results.append((latencies, errors))
+
+
+def run_endpoint(base_url, endpoint, factory, clients, duration_sec):
+    results = []
+    deadline = time.perf_counter() + duration_sec
+
+    threads = [
+        threading.Thread(
+            target=client_loop,
+            args=(base_url, endpoint, factory, deadline, results, i)
+        )
+        for i in range(clients)
+    ]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for client_latencies, _ in results for latency in client_latencies)
+    errors = sum(client_errors for _, client_errors in results)
+
+    report = {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1)
+    }
+
+    if latencies:
+        for q in QUANTILES:
+            report[f"p{int(q * 100)}_ms"] = round(percentile(latencies, q) * 1000, 1)
+        report["max_ms"] = round(latencies[-1] * 1000, 1)
+
+    return report
+
+
+def wait_until_ready(base_url, timeout=60):
+    url = urlparse(base_url)
+    deadline = time.time() + timeout
+
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(url.hostname, url.port, timeout=5)
+            conn.request("GET", "/recent_activity")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+
+    raise RuntimeError(f"API at {base_url} did not become ready within {timeout}s")
+
+
+def start_api(args):
+    """
+    Starts possum_api under uvicorn against the local database with fake URL signing.
+    """
+    env = dict(
+        os.environ,
+        DB_HOST=args.host,
+        DB_PORT=str(args.port),
+        DB_USER=args.user,
+        DB_PASS=args.password,
+        DB_NAME=args.database,
+        DB_POOL_SIZE=str(args.pool_size),
+        URL_SIGNER="fake",
+        DASHBOARD_CACHE_TTL_SECONDS=str(args.dashboard_cache_ttl)
+    )
+    env.pop("INSTANCE_CONNECTION_NAME", None)
+
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--app-dir", API_DIR,
+            "--host", "127.0.0.1",
+            "--port", str(args.api_port),
+            "--workers", str(args.workers),
+            "--log-level", "warning"
+        ],
+        env=env
+    )
+
+    return process
+
+
+def night_range(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT MIN(night_date), MAX(night_date) FROM visits")
+    first_night, last_night = cur.fetchone()
+    cur.close()
+    return first_night, last_night
+
+
+def run_scale(args, scale):
+    conn = connect(args)
+    try:
+        if scale is not None:
+            logging.info(f"Seeding {scale} ROIs")
+            create_schema(conn)
+            counts = seed(conn, scale, args.seed)
+        else:
+            counts = None
+        factory = RequestFactory(*night_range(conn))
+    finally:
+        conn.close()
+
+    process = None
+    base_url = args.base_url
+    if not base_url:
+        process = start_api(args)
+        base_url = f"http://127.0.0.1:{args.api_port}"
+
+    try:
+        wait_until_ready(base_url)
+
+        endpoints = {}
+        for endpoint in args.endpoints:
+            logging.info(f"Load testing {endpoint} with {args.clients} clients for {args.duration}s")
+            endpoints[endpoint] = run_endpoint(base_url, endpoint, factory, args.clients, args.duration)
+
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    return {"rois": scale, "rows": counts, "endpoints": endpoints}
+
+
+def print_report(report):
+    header = f"{'ROIs':>9} {'endpoint':24} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+    print(header)
+    print("-" * len(header))
+
+    for run in report["runs"]:
+        for endpoint, r in run["endpoints"].items():
+            print(
+                f"{str(run['rois'] or '-'):>9} {endpoint:24} {r['throughput_rps']:>8} "
+                f"{r.get('p50_ms', '-'):>8} {r.get('p95_ms', '-'):>8} {r.get('p99_ms', '-'):>8} {r['errors']:>7}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test possum_api against a seeded local MySQL")
+    add_connection_args(parser)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="ROI volumes to seed and test")
+    parser.add_argument("--no-seed", action="store_true", help="Use the data already in the database")
+    parser.add_argument("--base-url", help="Test an already running API instead of starting one")
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS)
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per endpoint")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--api-port", type=int, default=8089)
+    parser.add_argument("--pool-size", type=int, default=10, help="API DB connection pool size")
+    parser.add_argument("--dashboard-cache-ttl", type=int, default=0,
+                        help="Dashboard cache TTL (0 measures the queries, 120 matches production)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="loadtest_results.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    scales = [None] if args.no_seed or args.base_url else args.scales
+
+    report = {
+        "config": {
+            "clients": args.clients,
+            "duration_sec": args.duration,
+            "workers": args.workers,
+            "pool_size": args.pool_size,
+            "dashboard_cache_ttl": args.dashboard_cache_ttl
+        },
+        "runs": [run_scale(args, scale) for scale in scales]
+    }
+
+    print_report(report)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+from datetime import date, datetime, timedelta
+
+import mysql.connector
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATABASE_DIR = os.path.join(HERE, "..", "..", "database")
+SCHEMA_FILE = os.path.join(DATABASE_DIR, "schema.sql")
+
+sys.path.insert(0, DATABASE_DIR)
+from migrate import split_statements, apply_migrations
+
+# Synthetic data shape (close to what the edge device produces)
+VISITS_PER_NIGHT = 8
+FRAME_INTERVAL_SEC = 0.4
+MIN_DURATION_SEC = 5
+MAX_DURATION_SEC = 120
+APPROVED_RATIO = 0.8
+VIDEO_RATIO = 0.7
+BUCKET = "possum-loadtest"
+
+BATCH_SIZE = 5000
+
+
+def connect(args):
+    """
+    Connects to the load test database, creating it if needed.
+    """
+    conn = mysql.connector.connect(
+        host=args.host,
+        port=args.port,
+        user=args.user,
+        password=args.password
+    )
+
+    cur = conn.cursor()
+    cur.execute(f"CREATE DATABASE IF NOT EXISTS `{args.database}`")
+    cur.close()
+    conn.database = args.database
+
+    return conn
+
+
+def create_schema(conn):
+    cur = conn.cursor()
+
+    # Drop dependent tables first, schema.sql drops them in alphabetical order
+    cur.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for table in ("rois", "frames", "visit_statistics", "records", "visits", "schema_migrations"):
+        cur.execute(f"DROP TABLE IF EXISTS `{table}`")
+
+    with open(SCHEMA_FILE) as f:
+        for statement in split_statements(f.read()):
+            cur.execute(statement)
+
+    cur.execute("SET FOREIGN_KEY_CHECKS = 1")
+    conn.commit()
+    cur.close()
+
+    # Base dump + all migrations = production schema
+    apply_migrations(conn)
+
+
+def night_of(start_time):
+    # Visits after midnight belong to the previous night
+    return (start_time - timedelta(hours=12)).date()
+
+
+def generate_visits(target_rois, rng):
+    """
+    Yields (visit, frames, rois, statistics) tuples until target_rois ROIs were generated.
+    IDs are assigned here so rows can be bulk inserted without reading them back.
+    """
+    expected_visits = max(1, target_rois // int((MIN_DURATION_SEC + MAX_DURATION_SEC) / 2 / FRAME_INTERVAL_SEC * 1.2))
+    nights = max(1, expected_visits // VISITS_PER_NIGHT)
+    first_night = date.today() - timedelta(days=nights)
+
+    visit_id = frame_id = roi_id = 0
+
+    while roi_id < target_rois:
+        visit_id += 1
+
+        night = first_night + timedelta(days=rng.randrange(nights))
+        # Between 21:00 and 05:00
+        start_time = datetime(night.year, night.month, night.day, 21) + timedelta(seconds=rng.randrange(8 * 3600))
+        duration = rng.randint(MIN_DURATION_SEC, MAX_DURATION_SEC)
+        end_time = start_time + timedelta(seconds=duration)
+        approved = rng.random() < APPROVED_RATIO
+        video_url = f"gs://{BUCKET}/videos/visit_{visit_id}.mp4" if rng.random() < VIDEO_RATIO else None
+        poster_url = f"gs://{BUCKET}/visits/visit_{visit_id}/poster.webp" if video_url else None
+        sprite_url = f"gs://{BUCKET}/visits/visit_{visit_id}/sprite_5x2.webp" if video_url else None
+
+        frames = []
+        rois = []
+        cx = rng.uniform(100, 1400)
+
+        for i in range(int(duration / FRAME_INTERVAL_SEC)):
+            if roi_id >= target_rois:
+                break
+
+            frame_id += 1
+            ts = start_time + timedelta(seconds=i * FRAME_INTERVAL_SEC)
+            frames.append((frame_id, visit_id, ts, f"gs://{BUCKET}/frames/{visit_id}/frame_{frame_id}.jpg"))
+
+            cx = min(1450, max(50, cx + rng.gauss(0, 20)))
+            for _ in range(2 if rng.random() < 0.2 else 1):
+                roi_id += 1
+                w = rng.randint(80, 200)
+                y1 = rng.randint(350, 600)
+                rois.append((
+                    roi_id, frame_id, f"gs://{BUCKET}/rois/{visit_id}/roi_{roi_id}.jpg",
+                    int(cx - w / 2), y1, int(cx + w / 2), y1 + rng.randint(60, 150), ts
+                ))
+
+        representative_roi_id = rois[len(rois) // 2][0] if rois else None
+        visit = (
+            visit_id, start_time, end_time, duration, video_url, end_time,
+            night_of(start_time), int(approved), representative_roi_id, poster_url, sprite_url
+        )
+
+        moving = duration * rng.uniform(0.2, 0.9)
+        distance = rng.uniform(50, 2000)
+        statistics = (
+            visit_id, duration, duration, moving, duration - moving, moving / duration,
+            distance, distance / duration, distance / duration * rng.uniform(1.5, 4), end_time
+        )
+
+        yield visit, frames, rois, statistics
+
+
+def insert_batches(cur, query, rows):
+    for i in range(0, len(rows), BATCH_SIZE):
+        cur.executemany(query, rows[i:i + BATCH_SIZE])
+
+
+def seed(conn, target_rois, seed_value=0):
+    """
+    Fills an empty schema with synthetic visits, frames, ROIs and statistics.
+    Returns row counts.
+    """
+    rng = random.Random(seed_value)
+    cur = conn.cursor()
+    cur.execute("SET FOREIGN_KEY_CHECKS = 0")
+    cur.execute("SET UNIQUE_CHECKS = 0")
+
+    counts = {"visits": 0, "frames": 0, "rois": 0}
+    pending = {"visits": [], "frames": [], "rois": [], "visit_statistics": []}
+
+    queries = {
+        "visits": """
+            INSERT INTO visits (visit_id, start_time, end_time, duration_seconds, video_url,
+                                created_at, night_date, approved, representative_roi_id,
+                                poster_url, sprite_url)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        "frames": """
+            INSERT INTO frames (frame_id, visit_id, frame_timestamp, frame_url)
+            VALUES (%s, %s, %s, %s)
+        """,
+        "rois": """
+            INSERT INTO rois (roi_id, frame_id, roi_url, bbox_x1, bbox_y1, bbox_x2, bbox_y2, roi_timestamp)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        "visit_statistics": """
+            INSERT INTO visit_statistics (visit_id, visit_duration_sec_stored, visit_duration_sec_calculated,
+                                          moving_time_sec, idle_time_sec, activity_ratio, total_distance_px,
+                                          avg_speed_px_per_sec, max_speed_px_per_sec, calculated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """
+    }
+
+    def flush():
+        # Parents before children
+        for table in ("visits", "frames", "rois", "visit_statistics"):
+            insert_batches(cur, queries[table], pending[table])
+            pending[table].clear()
+        conn.commit()
+
+    start = time.perf_counter()
+
+    for visit, frames, rois, statistics in generate_visits(target_rois, rng):
+        pending["visits"].append(visit)
+        pending["frames"].extend(frames)
+        pending["rois"].extend(rois)
+        pending["visit_statistics"].append(statistics)
+
+        counts["visits"] += 1
+        counts["frames"] += len(frames)
+        counts["rois"] += len(rois)
+
+        if len(pending["rois"]) >= BATCH_SIZE * 4:
+            flush()
+            logging.info(f"Seeded {counts['rois']}/{target_rois} ROIs")
+
+    flush()
+
+    cur.execute(
+        "INSERT INTO records (record_link) VALUES (%s)",
+        (f"gs://{BUCKET}/records/longest_visit.mp4",)
+    )
+    cur.execute("SET UNIQUE_CHECKS = 1")
+    cur.execute("SET FOREIGN_KEY_CHECKS = 1")
+    cur.execute("ANALYZE TABLE visits, frames, rois, visit_statistics")
+    cur.fetchall()
+    conn.commit()
+    cur.close()
+
+    logging.info(f"Seeded {counts} in {time.perf_counter() - start:.1f}s")
+
+    return counts
+
+
+def add_connection_args(parser):
+    # Defaults match database/docker-compose.yml. A separate database is used
+    # because seeding drops and recreates all tables.
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="rootpassword")
+    parser.add_argument("--database", default="possum_loadtest")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a local MySQL database with synthetic possum visits")
+    add_connection_args(parser)
+    parser.add_argument("--rois", type=int, default=10000, help="Number of ROIs to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    conn = connect(args)
+    try:
+        create_schema(conn)
+        seed(conn, args.rois, args.seed)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -267,12 +267,12 @@ def start_fence_position(conn):
         WITH fence_positions AS (
             SELECT 
                 r.roi_id,
-                (r.bbox_x1 + r.bbox_x2) / 2 AS box_center,
+                r.bbox_center_x AS box_center,
                 v.visit_id
             FROM visits v
             JOIN frames f ON v.visit_id = f.visit_id
             JOIN rois r ON f.frame_id = r.frame_id
-            WHERE r.bbox_x1 IS NOT NULL AND r.bbox_x2 IS NOT NULL
+            WHERE r.bbox_center_x IS NOT NULL
         ),
         ranked_rois AS (
             SELECT 
@@ -310,12 +310,12 @@ def end_fence_position(conn):
         WITH fence_positions AS (
             SELECT 
                 r.roi_id,
-                (r.bbox_x1 + r.bbox_x2) / 2 AS box_center,
+                r.bbox_center_x AS box_center,
                 v.visit_id
             FROM visits v
             JOIN frames f ON v.visit_id = f.visit_id
             JOIN rois r ON f.frame_id = r.frame_id
-            WHERE r.bbox_x1 IS NOT NULL AND r.bbox_x2 IS NOT NULL
+            WHERE r.bbox_center_x IS NOT NULL
         ),
         ranked_rois AS (
             SELECT 
@@ -352,7 +352,7 @@ def heatmap_position(conn):
     query = """
         WITH fence_positions AS (
         SELECT 
-            (bbox_x1 + bbox_x2) / 2 AS box_center
+            bbox_center_x AS box_center
         FROM rois),
         positions AS (
         SELECT 
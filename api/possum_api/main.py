@@ -3,7 +3,7 @@ from fastapi import FastAPI, Query
 import mysql.connector
 # Access environment variables (database credentials, connection strings)
 import os
-from datetime import date, timedelta
+from datetime import date
 # Google Cloud Storage SDK — used to generate signed URLs and access storage buckets
 from google.cloud import storage
 # Used to raise HTTP errors when invalid request parameters are received
@@ -12,6 +12,10 @@ from fastapi import HTTPException
 from google.auth.transport.requests import Request
 from google.auth import default
 from google.auth import iam
+# In-process signers: service account key file and local fake URLs
+from signing import SIGNED_URL_EXPIRATION, load_signing_credentials, key_signed_url, fake_signed_url
+# SQL of the hot queries (also EXPLAINed by api/loadtest/explain_check.py)
+from queries import VISIT_STATISTICS_QUERY, RECENT_ACTIVITY_QUERY, VISITS_BY_NIGHT_QUERY, SCHEMA_VERSION_QUERY
 # Allows running multiple database queries in parallel (performance optimisation)
 from concurrent.futures import ThreadPoolExecutor, as_completed
 # MySQL connection pooling — reduces cost of creating new connections for each request by reusing a pool of connections
@@ -60,10 +64,34 @@ app.add_middleware(
     allow_headers=["*"],   
 )
 
-#Creates connection to GCS.
-storage_client = storage.Client()
-# Fetches default credentials for the service account running this code (Cloud Run service account).
-credentials, _ = default()
+# URL signing mode:
+# "iam"  - signs with the Cloud Run service account through the IAM signBlob API
+#          (one network round trip per URL)
+# "key"  - signs V4 URLs in-process with a service account key file mounted
+#          as a secret (SIGNING_KEY_FILE), no network call
+# "fake" - builds unsigned URLs locally without any GCP call (load tests, local runs)
+URL_SIGNER = os.environ.get("URL_SIGNER", "iam")
+
+storage_client = None
+credentials = None
+signing_credentials = None
+
+if URL_SIGNER == "iam":
+    #Creates connection to GCS.
+    storage_client = storage.Client()
+    # Fetches default credentials for the service account running this code (Cloud Run service account).
+    credentials, _ = default()
+
+elif URL_SIGNER == "key":
+    # Private key stays in memory, signatures are computed locally
+    signing_credentials = load_signing_credentials(os.environ["SIGNING_KEY_FILE"])
+    storage_client = storage.Client(
+        project=signing_credentials.project_id,
+        credentials=signing_credentials
+    )
+
+elif URL_SIGNER != "fake":
+    raise ValueError(f"Unknown URL_SIGNER: {URL_SIGNER}")
 
 # Function to refresh credentials if they are expired. 
 def get_credentials():
@@ -76,38 +104,81 @@ def get_credentials():
     return credentials
 
 
+# On Cloud Run connects directly to Cloud SQL instance via Unix socket,
+# otherwise over TCP (local MySQL, load tests).
+if os.environ.get("INSTANCE_CONNECTION_NAME"):
+    db_address = {"unix_socket": f"/cloudsql/{os.environ['INSTANCE_CONNECTION_NAME']}"}
+else:
+    db_address = {
+        "host": os.environ.get("DB_HOST", "127.0.0.1"),
+        "port": int(os.environ.get("DB_PORT", 3306))
+    }
+
 # Creates pool of reusable connections. 
 db_pool = MySQLConnectionPool(
     pool_name="possum_pool",
-    # Can be Adjusted
-    pool_size=10,  
+    # Can be Adjusted (mysql-connector allows at most 32)
+    pool_size=int(os.environ.get("DB_POOL_SIZE", 10)),
     user=os.environ["DB_USER"],
     password=os.environ["DB_PASS"],
     database=os.environ["DB_NAME"],
-    #Connects directly to Cloud SQL instance via Unix socket.
-    unix_socket=f"/cloudsql/{os.environ['INSTANCE_CONNECTION_NAME']}"
+    **db_address
 )
 
 # Returns a connection from the pool.
 def get_connection():
     return db_pool.get_connection()
 
+# Latest migration (database/migrations) the API relies on:
+# 003 stored bbox columns for the position charts, 004 preview URLs
+REQUIRED_SCHEMA_VERSION = "004"
+
+# Fails startup if the migrations are missing instead of erroring on the first chart request.
+def check_schema_version(required=REQUIRED_SCHEMA_VERSION):
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(SCHEMA_VERSION_QUERY)
+        current = cursor.fetchone()[0]
+    except mysql.connector.ProgrammingError:
+        # No schema_migrations table: migrations were never run
+        current = None
+    finally:
+        cursor.close()
+        conn.close()
+
+    if current is None or current < required:
+        raise RuntimeError(
+            f"Database schema is at migration {current or 'none'}, {required} is required: "
+            f"run python database/migrate.py (see README, Database migrations)"
+        )
+
+check_schema_version()
+
 # Google Storage helper logic
 def generate_signed_url(gcs_path: str):
 
     if not gcs_path:
         return None
 
-    creds = get_credentials()
-
     path = gcs_path.replace("gs://", "")
     bucket_name, blob_name = path.split("/", 1)
 
+    if URL_SIGNER == "fake":
+        return fake_signed_url(bucket_name, blob_name)
+
+    if URL_SIGNER == "key":
+        return key_signed_url(storage_client, bucket_name, blob_name, signing_credentials)
+
     bucket = storage_client.bucket(bucket_name)
     blob = bucket.blob(blob_name)
 
+    creds = get_credentials()
+
     return blob.generate_signed_url(
-        expiration=timedelta(minutes=6),
+        expiration=SIGNED_URL_EXPIRATION,
         method="GET",
         service_account_email=creds.service_account_email,
         access_token=creds.token,
@@ -118,8 +189,8 @@ dashboard_cache = {
     "data": None,
     "timestamp": 0
 }
-# Cache validity 
-CACHE_TTL_SECONDS = 120  
+# Cache validity (0 disables the cache, e.g. to load test the queries themselves)
+CACHE_TTL_SECONDS = int(os.environ.get("DASHBOARD_CACHE_TTL_SECONDS", 120))
 # Prevents multiple threads updating cache simultaneously.
 cache_lock = threading.Lock()
 
@@ -141,16 +212,7 @@ def fetch_visit_statistics(start_date: date, end_date: date):
     # Returns rows as dictionaries instead of tuples.
     cursor = conn.cursor(dictionary=True)
 
-    query = """
-        SELECT night_date,
-               COUNT(visit_id) as number_of_visits,
-               AVG(duration_seconds) as average_duration_seconds,
-               SUM(CASE WHEN video_url IS NOT NULL AND approved = 1 THEN 1 ELSE 0 END) as number_of_videos
-        FROM visits
-        WHERE night_date BETWEEN %s AND %s
-        GROUP BY night_date
-        ORDER BY night_date
-    """
+    query = VISIT_STATISTICS_QUERY
 
     try:
         cursor.execute(query, (start_date, end_date))
@@ -165,20 +227,7 @@ def fetch_recent_activity():
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
 
-    query = """
-        SELECT
-            v.visit_id,
-            v.start_time,
-            v.night_date,
-            r.roi_id,
-            r.roi_url
-        FROM visits v
-        LEFT JOIN rois r
-            ON r.roi_id = v.representative_roi_id
-        WHERE v.approved = 1
-        ORDER BY v.start_time DESC
-        LIMIT 6
-    """
+    query = RECENT_ACTIVITY_QUERY
 
     try:
         cursor.execute(query)
@@ -195,22 +244,7 @@ def fetch_median_rois_by_date(current_date: date):
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
 
-    query = """
-        SELECT
-            v.visit_id,
-            v.duration_seconds,
-            v.start_time,
-            v.night_date,
-            v.video_url,
-            r.roi_id,
-            r.roi_url
-        FROM visits v
-        LEFT JOIN rois r
-            ON r.roi_id = v.representative_roi_id
-        WHERE v.night_date = %s
-          AND v.approved = 1
-        ORDER BY v.start_time 
-    """
+    query = VISITS_BY_NIGHT_QUERY
 
     try:
         cursor.execute(query, (current_date,))
@@ -266,6 +300,9 @@ def get_videos(current_date: date = Query(...)):
             "visit_id": r["visit_id"],
             "video_url": generate_signed_url(r["video_url"]) if r["video_url"] else None,
             "roi_url": generate_signed_url(r["roi_url"]) if r["roi_url"] else None,
+            # Small previews, the gallery loads the video only on demand
+            "poster_url": generate_signed_url(r["poster_url"]) if r["poster_url"] else None,
+            "sprite_url": generate_signed_url(r["sprite_url"]) if r["sprite_url"] else None,
             "roi_id": r["roi_id"],
             "night_date": r["night_date"].isoformat() if r["night_date"] else None,
         }
@@ -283,6 +320,7 @@ def get_recent_activity():
             "visit_id": r["visit_id"],
             "start_time": r["start_time"].isoformat() if r["start_time"] else None,
             "roi_url": generate_signed_url(r["roi_url"]) if r["roi_url"] else None,
+            "poster_url": generate_signed_url(r["poster_url"]) if r["poster_url"] else None,
             "roi_id": r["roi_id"],
             "night_date": r["night_date"].isoformat() if r["night_date"] else None,
         }
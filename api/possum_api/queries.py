@@ -0,0 +1,52 @@
+# SQL of the hot API queries, shared with the EXPLAIN check (api/loadtest/explain_check.py)
+
+# Visits aggregated by night_date: number of visits, average duration and number of videos
+VISIT_STATISTICS_QUERY = """
+    SELECT night_date,
+           COUNT(visit_id) as number_of_visits,
+           AVG(duration_seconds) as average_duration_seconds,
+           SUM(CASE WHEN video_url IS NOT NULL AND approved = 1 THEN 1 ELSE 0 END) as number_of_videos
+    FROM visits
+    WHERE night_date BETWEEN %s AND %s
+    GROUP BY night_date
+    ORDER BY night_date
+"""
+
+RECENT_ACTIVITY_QUERY = """
+    SELECT
+        v.visit_id,
+        v.start_time,
+        v.night_date,
+        v.poster_url,
+        r.roi_id,
+        r.roi_url
+    FROM visits v
+    LEFT JOIN rois r
+        ON r.roi_id = v.representative_roi_id
+    WHERE v.approved = 1
+    ORDER BY v.start_time DESC
+    LIMIT 6
+"""
+
+# Videos of a night_date with the representative ROI of each visit
+VISITS_BY_NIGHT_QUERY = """
+    SELECT
+        v.visit_id,
+        v.duration_seconds,
+        v.start_time,
+        v.night_date,
+        v.video_url,
+        v.poster_url,
+        v.sprite_url,
+        r.roi_id,
+        r.roi_url
+    FROM visits v
+    LEFT JOIN rois r
+        ON r.roi_id = v.representative_roi_id
+    WHERE v.night_date = %s
+      AND v.approved = 1
+    ORDER BY v.start_time
+"""
+
+# Latest applied migration (database/migrate.py records versions in schema_migrations)
+SCHEMA_VERSION_QUERY = "SELECT MAX(version) FROM schema_migrations"
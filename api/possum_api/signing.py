@@ -0,0 +1,38 @@
+# Signed URL helpers that need no GCP call (importable without the API's DB pool)
+import time
+from datetime import timedelta
+from urllib.parse import quote
+
+from google.oauth2 import service_account
+
+SIGNED_URL_EXPIRATION = timedelta(minutes=6)
+
+
+# Loads the mounted service account key; the private key stays in memory.
+def load_signing_credentials(key_file: str):
+    return service_account.Credentials.from_service_account_file(key_file)
+
+
+# V4 signed GET URL computed in-process with the service account key.
+def key_signed_url(storage_client, bucket_name: str, blob_name: str, signing_credentials,
+                   expiration=SIGNED_URL_EXPIRATION):
+
+    blob = storage_client.bucket(bucket_name).blob(blob_name)
+
+    return blob.generate_signed_url(
+        version="v4",
+        expiration=expiration,
+        method="GET",
+        credentials=signing_credentials,
+    )
+
+
+# Local stand-in for signed URLs, same shape without credentials or network calls.
+def fake_signed_url(bucket_name: str, blob_name: str, expiration=SIGNED_URL_EXPIRATION):
+
+    expires_in = int(expiration.total_seconds())
+
+    return (
+        f"https://storage.googleapis.com/{bucket_name}/{quote(blob_name)}"
+        f"?X-Goog-Algorithm=FAKE&X-Goog-Expires={expires_in}&X-Goog-Date={int(time.time())}"
+    )
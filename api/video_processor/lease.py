@@ -0,0 +1,62 @@
+# Per-generation processing lease stored as a small GCS object.
+# Creation uses if_generation_match=0, so exactly one invocation wins even
+# when duplicate notifications arrive at the same time.
+import os
+import json
+import time
+import uuid
+import socket
+
+from google.api_core.exceptions import NotFound, PreconditionFailed
+
+# Leases end with .json, the processor ignores them
+LEASE_PREFIX = "_leases/"
+# Must exceed the longest processing time (Cloud Run request timeout)
+LEASE_TTL_SEC = int(os.environ.get("LEASE_TTL_SEC", 1800))
+
+# Identifies this instance in lease objects
+OWNER = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def lease_name(object_name, generation):
+    return f"{LEASE_PREFIX}{object_name}@{generation}.json"
+
+
+def acquire_lease(bucket, object_name, generation, ttl_sec=LEASE_TTL_SEC):
+    """
+    Returns the lease blob if this invocation may process the object
+    generation, None if another invocation holds a live lease.
+    Expired leases (crashed instance) are taken over.
+    """
+    lease = bucket.blob(lease_name(object_name, generation))
+    body = json.dumps({"owner": OWNER, "expires_at": time.time() + ttl_sec})
+
+    try:
+        lease.upload_from_string(body, content_type="application/json", if_generation_match=0)
+        return lease
+    except PreconditionFailed:
+        pass
+
+    try:
+        lease.reload()
+        current = json.loads(lease.download_as_bytes(if_generation_match=lease.generation))
+    except (NotFound, PreconditionFailed):
+        # Released or replaced meanwhile: someone else finished or took over
+        return None
+
+    if current.get("expires_at", 0) > time.time():
+        return None
+
+    # Take over only if nobody else replaced the expired lease first
+    try:
+        lease.upload_from_string(body, content_type="application/json", if_generation_match=lease.generation)
+        return lease
+    except PreconditionFailed:
+        return None
+
+
+def release_lease(lease):
+    try:
+        lease.delete(if_generation_match=lease.generation)
+    except (NotFound, PreconditionFailed):
+        pass
@@ -8,6 +8,17 @@ import tempfile
 import subprocess
 # Used for file cleanup (removing temp files)
 import os
+# Credentials for ffmpeg reading objects directly over HTTPS
+from urllib.parse import quote
+import google.auth
+from google.auth.transport.requests import Request as AuthRequest
+# Streaming download -> ffmpeg -> resumable upload
+from streaming import CHUNK_SIZE, COPY_ARGS, encode_args, moov_before_mdat, transcode_stream
+# ffprobe: skip, remux or transcode
+from probe import probe_video, choose_action, choose_preset
+# One invocation per object generation
+from lease import acquire_lease, release_lease
+from google.api_core.exceptions import PreconditionFailed
 
 
 # Create FastAPI app instance
@@ -15,6 +26,27 @@ app = FastAPI()
 # Initialize GCS client 
 storage_client = storage.Client()
 
+# "stream" - bounded memory, download/encode/upload overlap, fragmented MP4 output
+# "file"   - download to /tmp, transcode to a second file with +faststart, upload
+PROCESSING_MODE = os.environ.get("PROCESSING_MODE", "stream")
+# Encoder preset policy: "auto" (by video length and size), "speed", "balanced" or "size"
+ENCODE_POLICY = os.environ.get("ENCODE_POLICY", "auto")
+
+credentials = None
+
+
+def get_access_token():
+    global credentials
+
+    if credentials is None:
+        credentials, _ = google.auth.default(
+            scopes=["https://www.googleapis.com/auth/devstorage.read_only"]
+        )
+    if not credentials.valid:
+        credentials.refresh(AuthRequest())
+
+    return credentials.token
+
 
 # Cloud Run will send a POST request with GCS event payload
 @app.post("/")
@@ -43,47 +75,195 @@ async def process_video(request: Request):
     if metadata.get("processed") == "true":
         return {"status": "already processed"}
 
+    # Late duplicate of an event for a generation that was already replaced
+    event_generation = event.get("generation")
+    if event_generation and str(event_generation) != str(blob.generation):
+        return {"status": "stale event"}
+
+    # Exactly one invocation processes a given object generation
+    lease = acquire_lease(bucket, object_name, blob.generation)
+    if lease is None:
+        return {"status": "in progress"}
+
+    try:
+        if PROCESSING_MODE == "stream":
+            action = process_streaming(bucket, blob)
+        else:
+            action = process_with_files(bucket, blob)
+
+    except PreconditionFailed:
+        # The object changed while processing (new upload), its own event handles it
+        return {"status": "superseded"}
+
+    finally:
+        release_lease(lease)
+
+    return {"status": "processed", "action": action}
+
+
+def gcs_input_args(bucket, blob):
+    """
+    ffmpeg/ffprobe input reading the object generation over HTTPS.
+    Range requests make it seekable without downloading the whole file.
+    """
+    # JSON API media URL on the client's endpoint (storage.googleapis.com unless overridden)
+    url = (
+        f"{bucket.client.api_endpoint}/download/storage/v1/b/{bucket.name}/o/{quote(blob.name, safe='')}"
+        f"?alt=media&generation={blob.generation}"
+    )
+
+    return [
+        "-headers", f"Authorization: Bearer {get_access_token()}\r\n",
+        "-i", url
+    ]
+
+
+def output_args_for(action, info):
+    if action == "remux":
+        return COPY_ARGS
+    return encode_args(choose_preset(info, ENCODE_POLICY))
+
+
+def mark_processed(blob):
+    """
+    Already compatible video: only set the flag, no new object generation.
+    """
+    blob.metadata = {**(blob.metadata or {}), "processed": "true"}
+    blob.patch(if_generation_match=blob.generation, if_metageneration_match=blob.metageneration)
+
+
+def cancel_upload(writer):
+    """
+    Closes a BlobWriter without finalizing it and cancels its resumable session.
+    writer.terminate() alone sends the DELETE to the upload initiation URL
+    instead of the session, which then keeps the uploaded chunks until it expires.
+    """
+    # Set once the first chunk was sent (None: nothing reached GCS yet)
+    started = writer._upload_and_transport
+    writer.terminate()
+
+    if started:
+        upload, transport = started
+        # GCS answers a cancelled session with 499
+        transport.delete(upload.resumable_url)
+
+
+def process_streaming(bucket, blob):
+    """
+    Pipes the original object through ffmpeg into a resumable upload
+    overwriting it. Peak memory is a few chunks instead of 2x the video.
+    Returns the chosen action.
+    """
+    # Pin reads to the original generation while the new one is uploaded
+    source_blob = bucket.blob(blob.name, generation=blob.generation)
+
+    def read_range(start, end):
+        return source_blob.download_as_bytes(start=start, end=end)
+
+    moov_first = moov_before_mdat(read_range)
+    info = probe_video(gcs_input_args(bucket, blob))
+    action = choose_action(info, moov_first)
+
+    if action == "none":
+        mark_processed(blob)
+        return action
+
+    output_args = output_args_for(action, info)
+
+    # Prepare to overwrite the same object in GCS
+    new_blob = bucket.blob(blob.name)
+    # Add metadata to prevent re-processing
+    new_blob.metadata = {"processed": "true"}
+
+    # Resumable upload session, finalized only by close().
+    # Replaces only the generation that was processed.
+    writer = new_blob.open(
+        "wb",
+        content_type="video/mp4",
+        chunk_size=CHUNK_SIZE,
+        if_generation_match=blob.generation
+    )
+
+    try:
+        if moov_first:
+            # Index at the start: ffmpeg can decode straight from a pipe
+            with source_blob.open("rb", chunk_size=CHUNK_SIZE) as reader:
+                transcode_stream(reader, writer, output_args, chunk_size=CHUNK_SIZE)
+        else:
+            # Index at the end (OpenCV recordings): ffmpeg has to seek, let it read
+            # the object over HTTPS with range requests instead of a pipe
+            transcode_stream(None, writer, output_args, input_args=gcs_input_args(bucket, blob), chunk_size=CHUNK_SIZE)
+    except BaseException:
+        # Cancel the resumable session: left open, the writer would be
+        # finalized by close() on garbage collection and replace the
+        # original with a truncated video
+        cancel_upload(writer)
+        raise
+
+    # Only reached if ffmpeg succeeded, a failed run leaves the original untouched
+    writer.close()
+
+    return action
+
+
+def process_with_files(bucket, blob):
+    object_name = blob.name
+
     # Download original video into a temporary local file
     # Cloud Run container has writable /tmp storage
     with tempfile.NamedTemporaryFile(delete=False) as temp_input:
         blob.download_to_filename(temp_input.name)
         input_path = temp_input.name
 
-    output_path = input_path + "_converted.mp4"
-
-    # Build ffmpeg command
-    command = [
-        "ffmpeg",              # ffmpeg executable
-        "-y",                  # overwrite output if exists
-        "-i", input_path,      # input file
-        "-c:v", "libx264",     # convert video codec to H.264
-        "-preset", "slow",     # better compression 
-        "-crf", "22",          # quality level (lower = better quality)
-        "-pix_fmt", "yuv420p", # browser compatibility
-        "-movflags", "+faststart",  # web streaming optimization
-        output_path            # output file
-    ]
+    try:
+        with open(input_path, "rb") as f:
+            header = f.read(1024 * 1024)
 
-    # Execute ffmpeg conversion
-    subprocess.run(command, check=True)
+        # First megabyte is enough to find moov in front of mdat
+        moov_first = moov_before_mdat(lambda start, end: header[start:end + 1])
+        info = probe_video(["-i", input_path])
+        action = choose_action(info, moov_first)
 
-    # Prepare to overwrite the same object in GCS
-    new_blob = bucket.blob(object_name)
+        if action == "none":
+            mark_processed(blob)
+            return action
 
-    # Add metadata to prevent re-processing
-    new_blob.metadata = {"processed": "true"}
+        output_path = input_path + "_converted.mp4"
 
-    # Upload converted file and overwrite original
-    new_blob.upload_from_filename(
-        output_path,
-        content_type="video/mp4"
-    )
+        # Build ffmpeg command
+        command = [
+            "ffmpeg",              # ffmpeg executable
+            "-y",                  # overwrite output if exists
+            "-i", input_path,      # input file
+            *output_args_for(action, info),  # stream copy or H.264 encode (see streaming.py)
+            "-movflags", "+faststart",  # web streaming optimization
+            output_path            # output file
+        ]
+
+        # Execute ffmpeg conversion
+        subprocess.run(command, check=True)
+
+        # Prepare to overwrite the same object in GCS
+        new_blob = bucket.blob(object_name)
+
+        # Add metadata to prevent re-processing
+        new_blob.metadata = {"processed": "true"}
+
+        # Upload converted file and overwrite original
+        new_blob.upload_from_filename(
+            output_path,
+            content_type="video/mp4",
+            # Replaces only the generation that was processed
+            if_generation_match=blob.generation
+        )
+
+        # Clean up converted file
+        os.remove(output_path)
 
-    # Clean up temporary files
-    os.remove(input_path)
-    os.remove(output_path)
+    finally:
+        os.remove(input_path)
 
-    return {"status": "processed"}
+    return action
 
 # gcloud builds submit --tag gcr.io/possum-tracker/video-processor
 # gcloud run deploy video-processor --image gcr.io/possum-tracker/video-processor --region australia-southeast1 --platform managed --allow-unauthenticated --memory 2Gi --cpu 2
\ No newline at end of file
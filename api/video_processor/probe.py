@@ -0,0 +1,82 @@
+# ffprobe based decision: skip, remux or transcode an uploaded video.
+import json
+import subprocess
+
+# Encoder preset per ENCODE_POLICY
+PRESETS = {
+    "speed": "veryfast",
+    "balanced": "medium",
+    "size": "slow"
+}
+
+# "auto" policy: slow preset for short clips, faster ones as the amount of
+# video (width x height x seconds) grows, so long visits do not block the instance
+AUTO_SLOW_LIMIT = 1280 * 720 * 60
+AUTO_MEDIUM_LIMIT = 1280 * 720 * 300
+
+# Codecs browsers play inside MP4
+COMPATIBLE_VIDEO = {"h264"}
+COMPATIBLE_PIX_FMT = {"yuv420p"}
+COMPATIBLE_AUDIO = {None, "aac"}
+
+
+def probe_video(input_args):
+    """
+    Runs ffprobe on `input_args` (e.g. ["-i", path] or HTTPS URL with headers)
+    and returns codec, pixel format, size and duration.
+    """
+    command = [
+        "ffprobe",
+        "-v", "error",
+        "-print_format", "json",
+        "-show_streams",
+        "-show_format",
+        *input_args
+    ]
+
+    result = subprocess.run(command, check=True, capture_output=True)
+    data = json.loads(result.stdout)
+
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+
+    return {
+        "video_codec": video.get("codec_name"),
+        "pix_fmt": video.get("pix_fmt"),
+        "width": video.get("width") or 0,
+        "height": video.get("height") or 0,
+        "duration": float(data.get("format", {}).get("duration") or 0),
+        "audio_codec": audio.get("codec_name")
+    }
+
+
+def choose_action(info, moov_first):
+    """
+    "none"      - browser compatible with the index at the start, nothing to do
+    "remux"     - compatible streams, copy them into a web friendly container
+    "transcode" - re-encode to H.264 / yuv420p
+    """
+    compatible = (
+        info["video_codec"] in COMPATIBLE_VIDEO
+        and info["pix_fmt"] in COMPATIBLE_PIX_FMT
+        and info["audio_codec"] in COMPATIBLE_AUDIO
+    )
+
+    if not compatible:
+        return "transcode"
+
+    return "none" if moov_first else "remux"
+
+
+def choose_preset(info, policy="auto"):
+    if policy in PRESETS:
+        return PRESETS[policy]
+
+    amount = info["width"] * info["height"] * info["duration"]
+
+    if amount <= AUTO_SLOW_LIMIT:
+        return "slow"
+    if amount <= AUTO_MEDIUM_LIMIT:
+        return "medium"
+    return "veryfast"
@@ -0,0 +1,172 @@
+# Streaming transcode: GCS download -> ffmpeg -> resumable GCS upload
+# without full copies of the video on /tmp (RAM on Cloud Run).
+import sys
+import logging
+import threading
+import subprocess
+
+# Resumable uploads need chunks in multiples of 256 KiB
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# Output written to a pipe cannot be rewritten for +faststart (moov at the
+# start), fragmented MP4 puts an empty moov first and is playable progressively
+FRAGMENTED_MOVFLAGS = "frag_keyframe+empty_moov+default_base_moof"
+
+# Stream copy for videos that are already browser compatible
+COPY_ARGS = ["-c", "copy"]
+
+
+def encode_args(preset):
+    """
+    H.264 settings shared with the file based mode.
+    """
+    return [
+        "-c:v", "libx264",     # convert video codec to H.264
+        "-preset", preset,     # speed vs compression (see probe.choose_preset)
+        "-crf", "22",          # quality level (lower = better quality)
+        "-pix_fmt", "yuv420p", # browser compatibility
+    ]
+
+
+def moov_before_mdat(read_range, max_boxes=16):
+    """
+    Walks top-level MP4 boxes using `read_range(start, end)` (inclusive end)
+    and returns True if the moov box comes before mdat.
+
+    Only then can ffmpeg decode the file from a non-seekable pipe.
+    """
+    offset = 0
+
+    for _ in range(max_boxes):
+        header = read_range(offset, offset + 15)
+        if len(header) < 8:
+            return False
+
+        size = int.from_bytes(header[0:4], "big")
+        box_type = header[4:8]
+
+        if box_type == b"moov":
+            return True
+        if box_type == b"mdat":
+            return False
+
+        # 64-bit size follows the type
+        if size == 1:
+            size = int.from_bytes(header[8:16], "big")
+        # Box extends to the end of the file
+        if size < 8:
+            return False
+
+        offset += size
+
+    return False
+
+
+def transcode_stream(source, sink, output_args, input_args=None, chunk_size=CHUNK_SIZE):
+    """
+    Runs ffmpeg with `output_args` (encode_args(...) or COPY_ARGS) and writes
+    fragmented MP4 chunk by chunk into `sink`.
+
+    `source` is a readable file object piped into ffmpeg stdin, or None when
+    `input_args` point ffmpeg to a seekable input (e.g. HTTPS URL with headers).
+    Reading, encoding and writing overlap; memory holds a few chunks only.
+
+    Raises CalledProcessError if ffmpeg fails. `sink` is never closed here:
+    closing a GCS writer finalizes the upload, the caller does it on success.
+    Returns the number of bytes written.
+    """
+    if input_args is None:
+        input_args = ["-i", "pipe:0"]
+
+    command = [
+        "ffmpeg",
+        "-y",
+        "-loglevel", "error",
+        *input_args,
+        *output_args,
+        "-movflags", FRAGMENTED_MOVFLAGS,
+        "-f", "mp4",
+        "pipe:1"
+    ]
+
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE if source is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE
+    )
+
+    feed_errors = []
+
+    def feed():
+        try:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                process.stdin.write(chunk)
+
+        except BrokenPipeError:
+            # ffmpeg exited early, its return code reports the reason
+            pass
+
+        except Exception as e:
+            feed_errors.append(e)
+
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    feeder = None
+    if source is not None:
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+
+    written = 0
+
+    try:
+        while True:
+            chunk = process.stdout.read(chunk_size)
+            if not chunk:
+                break
+            sink.write(chunk)
+            written += len(chunk)
+
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+
+        if feeder is not None:
+            feeder.join()
+
+    if feed_errors:
+        raise feed_errors[0]
+
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command)
+
+    return written
+
+
+if __name__ == "__main__":
+    # Local check without GCS: python streaming.py input.mp4 output.mp4
+    logging.basicConfig(level=logging.INFO)
+
+    input_path, output_path = sys.argv[1], sys.argv[2]
+
+    def read_local_range(start, end):
+        with open(input_path, "rb") as f:
+            f.seek(start)
+            return f.read(end - start + 1)
+
+    output_args = encode_args("veryfast")
+
+    with open(output_path, "wb") as sink:
+        if moov_before_mdat(read_local_range):
+            with open(input_path, "rb") as source:
+                size = transcode_stream(source, sink, output_args)
+        else:
+            size = transcode_stream(None, sink, output_args, input_args=["-i", input_path])
+
+    logging.info(f"Wrote {size} bytes to {output_path}")
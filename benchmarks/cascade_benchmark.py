@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import argparse
+
+import cv2
+import numpy as np
+import torch
+
+from metrics import metrics
+from config import MODEL_PATH, POSSUM_THRESHOLD, GATE_MODEL_PATH, GATE_REJECT_SCORE
+from inference.model_loader import load_model
+from inference.detector import predict_batch, load_gate, POSSUM_CLASS
+from inference.transforms import build_test_transform
+from benchmarks.run_benchmarks import summarize, environment
+from benchmarks.encoding_report import IMAGE_EXTENSIONS
+
+
+def load_labelled_rois(folder):
+    """
+    ROIs of an ImageFolder split (<folder>/<class>/*.jpg) read as BGR like
+    the pipeline sees them. The label is True for the possum class.
+    """
+    classes = sorted(d for d in os.listdir(folder) if os.path.isdir(os.path.join(folder, d)))
+    rois, labels = [], []
+
+    for index, name in enumerate(classes):
+        for file_name in sorted(os.listdir(os.path.join(folder, name))):
+            if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                image = cv2.imread(os.path.join(folder, name, file_name))
+                if image is not None:
+                    rois.append(image)
+                    labels.append(index == POSSUM_CLASS)
+
+    return rois, np.array(labels, dtype=bool), classes
+
+
+def run(rois, model, transform, device, gate, batch_size):
+    """
+    Scores of all ROIs in batches of `batch_size` (about one busy frame)
+    plus the time per batch.
+    """
+    scores, samples = [], []
+
+    for start in range(0, len(rois), batch_size):
+        batch = rois[start:start + batch_size]
+        began = time.perf_counter()
+        scores.extend(predict_batch(batch, model, transform, device, gate))
+        samples.append(time.perf_counter() - began)
+
+    return np.array(scores), samples
+
+
+def quality(scores, labels, threshold):
+    predicted = scores >= threshold
+    tp = int(np.sum(predicted & labels))
+    fp = int(np.sum(predicted & ~labels))
+    fn = int(np.sum(~predicted & labels))
+
+    return {
+        "recall": round(tp / (tp + fn), 4) if tp + fn else 0.0,
+        "precision": round(tp / (tp + fp), 4) if tp + fp else 1.0,
+        "false_negatives": fn,
+        "false_positives": fp
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ResNet-18 alone vs tiny CNN gate + ResNet-18")
+    parser.add_argument("--data", default="crops/choice/test", help="Labelled ROI folder (ImageFolder layout)")
+    parser.add_argument("--weights", default=MODEL_PATH)
+    parser.add_argument("--gate", default=GATE_MODEL_PATH or os.path.join("models", "gate_weight.pt"))
+    parser.add_argument("--reject-score", type=float, default=GATE_REJECT_SCORE)
+    parser.add_argument("--threshold", type=float, default=POSSUM_THRESHOLD)
+    parser.add_argument("--batch-size", type=int, default=8, help="ROIs per call (ROIs of one frame)")
+    parser.add_argument("--output", default="cascade_benchmark.json")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # Counters tell how many ROIs reached the ResNet
+    metrics.enable(log_interval_sec=0)
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = load_model(args.weights, device)
+    transform = build_test_transform()
+    gate = load_gate(args.gate, device, args.reject_score)
+
+    rois, labels, classes = load_labelled_rois(args.data)
+    print(f"{len(rois)} ROIs ({int(labels.sum())} {classes[POSSUM_CLASS]}), classes: {classes}")
+
+    # Warm-up so the first configuration is not charged for allocator and kernel start-up
+    run(rois[:args.batch_size], model, transform, device, gate, args.batch_size)
+
+    report = {"environment": environment(), "samples": len(rois), "possums": int(labels.sum())}
+
+    for name, stage_gate in (("resnet", None), ("cascade", gate)):
+        metrics.counters.clear()
+        scores, samples = run(rois, model, transform, device, stage_gate, args.batch_size)
+        resnet_rois = metrics.snapshot()["counters"].get("cnn_rois", 0)
+
+        result = quality(scores, labels, args.threshold)
+        result["resnet_rois"] = resnet_rois
+        result["resnet_calls_avoided"] = round(1 - resnet_rois / max(len(rois), 1), 4)
+        result["per_roi_ms"] = round(sum(samples) * 1000 / max(len(rois), 1), 3)
+        result["batch"] = summarize(samples)
+        report[name] = result
+
+        print(
+            f"{name:8s} recall {result['recall']:.4f}  precision {result['precision']:.4f}  "
+            f"ResNet ROIs {resnet_rois} ({result['resnet_calls_avoided']:.1%} avoided)  "
+            f"{result['per_roi_ms']} ms/ROI"
+        )
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
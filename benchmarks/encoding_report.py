@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+from video_utils.image_encoding import ImageEncoding, encode_image
+from benchmarks.synthetic import generate_frames
+from benchmarks.run_benchmarks import summarize, environment
+
+# Candidate tiers: (format, quality, max_dim). The first one is the reference:
+# cv2.imwrite(".jpg") default quality used before the encoding policy existed.
+TIERS = [
+    ("jpeg", 95, 0),
+    ("jpeg", 90, 0),
+    ("jpeg", 85, 0),
+    ("jpeg", 75, 0),
+    ("webp", 90, 0),
+    ("webp", 80, 0),
+    ("webp", 70, 0),
+    ("jpeg", 85, 960),
+    ("webp", 80, 960)
+]
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def load_images(folder, limit):
+    """
+    Reads up to `limit` images from a folder (e.g. saved visit frames or rois).
+    """
+    images = []
+
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                image = cv2.imread(os.path.join(root, name))
+                if image is not None:
+                    images.append(image)
+            if len(images) >= limit:
+                return images
+
+    return images
+
+
+def synthetic_samples(count, width, height):
+    """
+    Synthetic night frames and possum-sized crops around the moving blobs.
+    Real samples (--frames / --rois) give more meaningful numbers.
+    """
+    frames = list(generate_frames(count, width=width, height=height, num_blobs=1))
+
+    rois = []
+    for frame in frames:
+        # Brightest area is the blob
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        _, _, _, (x, y) = cv2.minMaxLoc(cv2.GaussianBlur(gray, (31, 31), 0))
+        rois.append(frame[max(0, y - 90):y + 90, max(0, x - 120):x + 120])
+
+    return frames, rois
+
+
+def measure(images, encoding):
+    sizes = []
+    samples = []
+
+    for image in images:
+        start = time.perf_counter()
+        data = encode_image(image, encoding)
+        samples.append(time.perf_counter() - start)
+        sizes.append(len(data))
+
+    return {
+        "mean_bytes": int(np.mean(sizes)),
+        "encode": summarize(samples)
+    }
+
+
+def report_artefact(name, images):
+    results = {}
+    reference = None
+
+    for image_format, quality, max_dim in TIERS:
+        tier = f"{image_format}_q{quality}" + (f"_max{max_dim}" if max_dim else "")
+        result = measure(images, ImageEncoding(image_format, quality, max_dim))
+
+        if reference is None:
+            reference = result["mean_bytes"]
+        result["size_vs_reference"] = round(result["mean_bytes"] / reference, 3)
+        results[tier] = result
+
+        print(
+            f"{name:6s} {tier:18s} {result['mean_bytes'] / 1024:8.1f} KiB "
+            f"({result['size_vs_reference'] * 100:5.1f}%)  "
+            f"encode p50={result['encode']['p50_ms']} ms"
+        )
+
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Size and encode time of image encoding tiers")
+    parser.add_argument("--frames", help="Folder with sample full frames (synthetic if not given)")
+    parser.add_argument("--rois", help="Folder with sample ROIs (synthetic if not given)")
+    parser.add_argument("--count", type=int, default=50, help="Images per artefact type")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--output", default="encoding_report.json")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    frames, rois = synthetic_samples(args.count, args.width, args.height)
+    if args.frames:
+        frames = load_images(args.frames, args.count)
+    if args.rois:
+        rois = load_images(args.rois, args.count)
+
+    report = {
+        "environment": environment(),
+        "samples": {"frames": len(frames), "rois": len(rois), "synthetic": not (args.frames and args.rois)},
+        "frame": report_artefact("frame", frames),
+        "roi": report_artefact("roi", rois)
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+from datetime import datetime
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+
+from metrics import metrics, VALUE_HISTOGRAMS
+from vision.crops_for_videos import MotionDetector
+from inference.model_loader import build_model, load_model
+from inference.detector import detect_possums, PossumClassifier
+from inference.batching import InferenceServer
+from inference.transforms import build_test_transform
+from video_utils.trimming import trim_video
+from video_utils.video_capture import VideoFileSource
+from visits.statistics import compute_visit_statistics
+from pipeline.engine import Pipeline, PipelineConfig
+from pipeline.sinks import LocalVisitSink
+from benchmarks.synthetic import generate_frames, write_video, random_rois, visit_roi_rows
+
+# Relative slowdown of p50 latency (or fps drop) reported as regression
+DEFAULT_TOLERANCE = 0.15
+
+
+def summarize(samples):
+    """
+    Latency summary of a list of durations in seconds.
+    """
+    values = np.array(samples) * 1000
+
+    return {
+        "n": len(samples),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "min_ms": round(float(values.min()), 3)
+    }
+
+
+def time_calls(func, repeats, warmup=3):
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+
+    return samples
+
+
+# BENCHMARKS
+def bench_motion(args):
+    detector = MotionDetector()
+    frames = generate_frames(args.frames + 50, width=args.width, height=args.height)
+
+    # Let the background model settle
+    for _ in range(50):
+        detector(next(frames))
+
+    samples = []
+    roi_counts = []
+    for frame in frames:
+        start = time.perf_counter()
+        rois, _ = detector(frame)
+        samples.append(time.perf_counter() - start)
+        roi_counts.append(len(rois))
+
+    result = summarize(samples)
+    result["fps"] = round(len(samples) / sum(samples), 1)
+    result["avg_rois"] = round(float(np.mean(roi_counts)), 2)
+
+    return {f"motion_{args.width}x{args.height}": result}
+
+
+def bench_transform(args):
+    transform = build_test_transform()
+    results = {}
+
+    for w, h in [(64, 64), (160, 120), (320, 240)]:
+        roi = random_rois(1, w, h)[0][0]
+
+        def run():
+            transform(Image.fromarray(cv2.cvtColor(roi, cv2.COLOR_BGR2RGB)))
+
+        results[f"transform_{w}x{h}"] = summarize(time_calls(run, args.repeats))
+
+    return results
+
+
+def bench_detect(args, model, device):
+    transform = build_test_transform()
+    results = {}
+
+    for count in args.roi_counts:
+        rois, bboxes = random_rois(count)
+
+        def run():
+            detect_possums(rois, bboxes, model, transform, device)
+
+        result = summarize(time_calls(run, args.repeats))
+        result["ms_per_roi"] = round(result["p50_ms"] / count, 3)
+        results[f"detect_possums_{count}_rois"] = result
+
+    return results
+
+
+def bench_batching(args, model, device):
+    """
+    ROI throughput of concurrent producers (2 ROIs per request) through the
+    micro-batching server, against the same producers calling the model directly.
+    """
+    transform = build_test_transform()
+    rois, bboxes = random_rois(2)
+    results = {}
+
+    for producers in (1, 4):
+        server = InferenceServer(model, transform, device, producers=producers)
+
+        for name, classify in [
+            ("direct", lambda: detect_possums(rois, bboxes, model, transform, device)),
+            ("batched", lambda: detect_possums(rois, bboxes, model, transform, device, server))
+        ]:
+            threads = [
+                threading.Thread(target=lambda: [classify() for _ in range(args.repeats)])
+                for _ in range(producers)
+            ]
+
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            total_rois = producers * args.repeats * len(rois)
+            results[f"batching_{name}_{producers}_producers"] = {
+                "rois_per_sec": round(total_rois / elapsed, 1),
+                "p50_ms": round(elapsed / (args.repeats * producers) * 1000, 3)
+            }
+
+    return results
+
+
+def bench_trim(args, work_dir):
+    source = write_video(
+        os.path.join(work_dir, "trim_source.mp4"),
+        args.trim_frames,
+        width=args.width,
+        height=args.height
+    )
+    video_path = os.path.join(work_dir, "trim.mp4")
+
+    samples = []
+    for _ in range(3):
+        # trim_video replaces the file in place, start from a fresh copy every time
+        shutil.copy(source, video_path)
+        start = time.perf_counter()
+        trim_video(video_path, 0, args.trim_frames, 25)
+        samples.append(time.perf_counter() - start)
+
+    result = summarize(samples)
+    result["fps"] = round(args.trim_frames / (result["p50_ms"] / 1000), 1)
+
+    return {f"trim_video_{args.trim_frames}_frames": result}
+
+
+def bench_statistics(args):
+    results = {}
+
+    for count in [100, 1000, 10000]:
+        rows = visit_roi_rows(count)
+        repeats = max(3, args.repeats // 10) if count >= 10000 else args.repeats
+        results[f"visit_statistics_{count}_rois"] = summarize(
+            time_calls(lambda: compute_visit_statistics(rows), repeats, warmup=1)
+        )
+
+    return results
+
+
+def bench_pipeline(args, model, device, work_dir):
+    """
+    End-to-end frames/s and per-stage latency over synthetic or recorded clips.
+    """
+    if args.clips:
+        clips = args.clips
+    else:
+        clips = [write_video(
+            os.path.join(work_dir, "pipeline_synthetic.mp4"),
+            args.frames,
+            width=args.width,
+            height=args.height
+        )]
+
+    classifier = PossumClassifier(model, build_test_transform(), device)
+    # Offline settings: sampling does not depend on processing speed
+    config = PipelineConfig(headless=True, realtime=False, log_interval_sec=3600)
+
+    results = {}
+
+    for clip in clips:
+        metrics.enable(log_interval_sec=0)
+        metrics.histograms.clear()
+        metrics.counters.clear()
+
+        source = VideoFileSource(clip, start_time=datetime(2026, 1, 1))
+        sink = LocalVisitSink(os.path.join(work_dir, "pipeline_out"), save_images=False)
+
+        stats = Pipeline(config, source, MotionDetector(), classifier, sink).run()
+        snapshot = metrics.snapshot()
+
+        name = os.path.splitext(os.path.basename(clip))[0]
+        results[f"pipeline_{name}"] = {
+            "frames": stats["frames"],
+            "samples": stats["samples"],
+            "fps": round(stats["frames"] / stats["elapsed_sec"], 1),
+            "p50_ms": round(stats["elapsed_sec"] / max(1, stats["frames"]) * 1000, 3),
+            "cnn_calls": snapshot["counters"].get("cnn_calls", 0),
+            "stages": {
+                stage: {
+                    "p50_ms": round(h["percentiles"][0.5] * 1000, 3),
+                    "p95_ms": round(h["percentiles"][0.95] * 1000, 3),
+                    "p99_ms": round(h["percentiles"][0.99] * 1000, 3),
+                    "n": h["count"]
+                }
+                for stage, h in snapshot["histograms"].items()
+                if stage not in VALUE_HISTOGRAMS and h["percentiles"][0.5] is not None
+            }
+        }
+
+    metrics.enabled = False
+
+    return results
+
+
+# REPORTING
+def compare(results, baseline, tolerance):
+    """
+    Returns list of regressions: p50 latency up or fps down by more than tolerance.
+    """
+    regressions = []
+
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+
+        if current.get("p50_ms") and previous.get("p50_ms"):
+            change = current["p50_ms"] / previous["p50_ms"] - 1
+            if change > tolerance:
+                regressions.append(f"{name}: p50 {previous['p50_ms']} -> {current['p50_ms']} ms (+{change:.0%})")
+
+        if current.get("fps") and previous.get("fps"):
+            change = 1 - current["fps"] / previous["fps"]
+            if change > tolerance:
+                regressions.append(f"{name}: fps {previous['fps']} -> {current['fps']} (-{change:.0%})")
+
+    return regressions
+
+
+def environment():
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "opencv": cv2.__version__
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="CPU benchmarks of the possum detection pipeline")
+    parser.add_argument("--only", nargs="+",
+                        choices=["motion", "transform", "detect", "batching", "trim", "statistics", "pipeline"],
+                        help="Run only selected benchmarks")
+    parser.add_argument("--frames", type=int, default=300, help="Synthetic frames for motion/pipeline")
+    parser.add_argument("--trim-frames", type=int, default=250)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--roi-counts", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--weights", help="Real model weights (random weights by default)")
+    parser.add_argument("--clips", nargs="+", help="Recorded clips for the pipeline benchmark")
+    parser.add_argument("--threads", type=int, help="torch.set_num_threads")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    selected = set(args.only or ["motion", "transform", "detect", "batching", "trim", "statistics", "pipeline"])
+
+    device = torch.device("cpu")
+    if args.weights:
+        model = load_model(args.weights, device)
+    else:
+        # Latency does not depend on weight values
+        torch.manual_seed(0)
+        model = build_model().to(device).eval()
+
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="possum_bench_")
+
+    try:
+        if "motion" in selected:
+            results.update(bench_motion(args))
+        if "transform" in selected:
+            results.update(bench_transform(args))
+        if "detect" in selected:
+            results.update(bench_detect(args, model, device))
+        if "batching" in selected:
+            results.update(bench_batching(args, model, device))
+        if "trim" in selected:
+            results.update(bench_trim(args, work_dir))
+        if "statistics" in selected:
+            results.update(bench_statistics(args))
+        if "pipeline" in selected:
+            results.update(bench_pipeline(args, model, device, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for name, result in results.items():
+        print(f"{name:40s} p50={result.get('p50_ms')} ms  fps={result.get('fps', '-')}")
+
+    report = {"environment": environment(), "results": results}
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
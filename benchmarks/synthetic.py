@@ -0,0 +1,101 @@
+import cv2
+import numpy as np
+from datetime import datetime, timedelta
+
+
+def generate_frames(num_frames, width=1280, height=720, num_blobs=2, noise_level=12, seed=0):
+    """
+    Yields synthetic night-camera-like frames: dark noisy background
+    with bright blobs moving across it (possum-sized moving objects).
+    """
+    rng = np.random.default_rng(seed)
+
+    background = rng.integers(20, 60, (height, width, 3), dtype=np.uint8)
+    # A few precomputed noise patterns keep frame generation cheap
+    noise_patterns = [
+        rng.integers(0, noise_level, (height, width, 3), dtype=np.uint8)
+        for _ in range(8)
+    ]
+
+    blobs = []
+    for _ in range(num_blobs):
+        blobs.append({
+            "x": float(rng.uniform(0.1, 0.9) * width),
+            "y": float(rng.uniform(0.3, 0.8) * height),
+            "vx": float(rng.uniform(-8, 8)),
+            "vy": float(rng.uniform(-2, 2)),
+            "axes": (int(rng.integers(40, 90)), int(rng.integers(25, 50)))
+        })
+
+    for i in range(num_frames):
+        frame = cv2.add(background, noise_patterns[i % len(noise_patterns)])
+
+        for blob in blobs:
+            center = (int(blob["x"]), int(blob["y"]))
+            cv2.ellipse(frame, center, blob["axes"], 0, 0, 360, (190, 190, 190), -1)
+
+            # Move and bounce at frame borders
+            blob["x"] += blob["vx"]
+            blob["y"] += blob["vy"]
+            if not 0 < blob["x"] < width:
+                blob["vx"] = -blob["vx"]
+            if not 0 < blob["y"] < height:
+                blob["vy"] = -blob["vy"]
+
+        yield frame
+
+
+def write_video(path, num_frames, fps=25, **kwargs):
+    """
+    Writes a synthetic video file (mp4v) and returns its path.
+    """
+    writer = None
+
+    for frame in generate_frames(num_frames, **kwargs):
+        if writer is None:
+            h, w = frame.shape[:2]
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+        writer.write(frame)
+
+    if writer is not None:
+        writer.release()
+
+    return path
+
+
+def random_rois(count, width=160, height=120, seed=0):
+    """
+    Returns random BGR crops with matching bounding boxes.
+    """
+    rng = np.random.default_rng(seed)
+
+    rois = [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(count)]
+    bboxes = [(0, 0, width, height)] * count
+
+    return rois, bboxes
+
+
+def visit_roi_rows(count, seed=0):
+    """
+    Returns rows shaped like the recalculate_visit_statistics query:
+    (roi_id, roi_timestamp, cx, cy, bbox_width) sorted by timestamp,
+    with occasional long gaps and several ROIs per timestamp.
+    """
+    rng = np.random.default_rng(seed)
+
+    rows = []
+    ts = datetime(2026, 1, 1, 22, 0, 0)
+    cx, cy = 400.0, 500.0
+
+    roi_id = 1
+    while len(rows) < count:
+        # Normal interval between saved frames, sometimes a long static gap
+        ts += timedelta(seconds=10 if rng.random() < 0.05 else 0.4)
+        cx = float(np.clip(cx + rng.normal(0, 15), 120, 1060))
+        cy = float(np.clip(cy + rng.normal(0, 5), 360, 800))
+
+        for _ in range(2 if rng.random() < 0.2 else 1):
+            rows.append((roi_id, ts, cx + float(rng.normal(0, 30)), cy, float(rng.uniform(80, 160))))
+            roi_id += 1
+
+    return rows[:count]
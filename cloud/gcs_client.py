@@ -1,7 +1,15 @@
 from google.cloud import storage
 import mimetypes
 import os
+import json
+import time
 import logging
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from metrics import metrics
+from config import STATE_SUFFIX
+from .upload_scheduler import ThrottledReader
 
 # Name of Google Cloud Storage bucket where media files are stored
 GCS_BUCKET = "possum-tracker-media-sveta"
@@ -15,24 +23,231 @@ storage_client = storage.Client.from_service_account_json(KEY_PATH)
 # Reference to the target storage bucket
 bucket = storage_client.bucket(GCS_BUCKET)
 
-def upload_file(local_path, gcs_path):
+# Not known to mimetypes on every platform, WebP images would be stored
+# as application/octet-stream and downloaded instead of displayed
+mimetypes.add_type("image/webp", ".webp")
+
+# RESUMABLE UPLOADS
+# Chunk size must be a multiple of 256 KiB, smaller files use a single request
+CHUNK_SIZE = 8 * 1024 * 1024
+RESUMABLE_THRESHOLD = CHUNK_SIZE
+# Retries of one chunk (exponential backoff) before the upload fails
+CHUNK_RETRIES = 6
+RETRY_BASE_DELAY = 1
+# Files of one visit uploaded in parallel
+UPLOAD_WORKERS = 4
+# Session URIs survive restarts so interrupted uploads continue where they stopped
+SESSIONS_PATH = os.path.join(BASE_DIR, "..", f"upload_sessions{STATE_SUFFIX}.json")
+# GCS keeps resumable sessions for a week
+SESSION_MAX_AGE_SEC = 6 * 24 * 3600
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Session URIs carry their own authorization, plain requests are enough
+http = requests.Session()
+sessions_lock = threading.Lock()
+
+
+class SessionExpired(Exception):
+    pass
+
+def upload_file(local_path, gcs_path, content_type=None):
     # Create a blob object representing destination file in GCS
     blob = bucket.blob(gcs_path)
     
     try:
         logging.info(f"Uploading {local_path} - {gcs_path}")
         # Automatically detect MIME type based on file extension
-        content_type, _ = mimetypes.guess_type(local_path)
+        if content_type is None:
+            content_type, _ = mimetypes.guess_type(local_path)
 
         # Upload file to GCS
-        blob.upload_from_filename(
-            local_path,
-            content_type=content_type
-)
+        with metrics.timer("gcs_upload"):
+            blob.upload_from_filename(
+                local_path,
+                content_type=content_type
+            )
+        metrics.inc("gcs_uploaded_bytes", os.path.getsize(local_path))
 
     except Exception as e:
         print("Upload failed:", e)
         raise e  
 
     # Return canonical GCS URI for storing in database
-    return f"gs://{GCS_BUCKET}/{gcs_path}"
\ No newline at end of file
+    return f"gs://{GCS_BUCKET}/{gcs_path}"
+
+
+def _load_sessions():
+    try:
+        with open(SESSIONS_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _store_session(key, uri):
+    """
+    Saves (uri) or removes (None) a session URI, atomically rewriting the file.
+    """
+    with sessions_lock:
+        sessions = _load_sessions()
+
+        if uri is None:
+            sessions.pop(key, None)
+        else:
+            sessions[key] = {"uri": uri, "created": time.time()}
+
+        temp_path = SESSIONS_PATH + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(sessions, f)
+        os.replace(temp_path, SESSIONS_PATH)
+
+
+def _saved_session(key):
+    with sessions_lock:
+        session = _load_sessions().get(key)
+
+    if session and time.time() - session["created"] < SESSION_MAX_AGE_SEC:
+        return session["uri"]
+    return None
+
+
+def _next_offset(response, size):
+    """
+    Interprets a resumable upload response: bytes persisted by GCS so far.
+    """
+    if response.status_code in (200, 201):
+        return size
+
+    if response.status_code == 308:
+        # Range: bytes=0-N, missing when nothing was stored yet
+        persisted = response.headers.get("Range")
+        return int(persisted.split("-")[1]) + 1 if persisted else 0
+
+    if response.status_code in (404, 410):
+        raise SessionExpired()
+
+    if response.status_code in RETRYABLE_STATUS:
+        raise requests.HTTPError(f"GCS returned {response.status_code}", response=response)
+
+    raise RuntimeError(f"Resumable upload failed: {response.status_code} {response.text}")
+
+
+def _query_offset(uri, size):
+    response = http.put(uri, headers={"Content-Range": f"bytes */{size}"}, timeout=30)
+    return _next_offset(response, size)
+
+
+def _put_chunk(uri, f, offset, size, throttle=None):
+    f.seek(offset)
+    length = min(CHUNK_SIZE, size - offset)
+    end = offset + length - 1
+
+    if throttle is None:
+        data = f.read(length)
+    else:
+        # Streamed while it is read: the cap holds within the chunk, not only on average
+        data = ThrottledReader(f, length, throttle)
+
+    response = http.put(
+        uri,
+        data=data,
+        headers={"Content-Range": f"bytes {offset}-{end}/{size}"},
+        timeout=120
+    )
+    return _next_offset(response, size)
+
+
+def upload_file_resumable(local_path, gcs_path, content_type=None, throttle=None):
+    """
+    Uploads large files in chunks through a resumable session.
+
+    - the session URI is persisted, after a crash or restart the upload
+      continues from the bytes GCS already has
+    - a failed chunk is retried with exponential backoff, the offset is
+      re-read from GCS before retrying
+    - expired sessions start over with a new one
+
+    Small files are uploaded with a single request.
+    `throttle` (TokenBucket) limits the upload bandwidth; throttled files
+    always use the resumable session, whose request bodies are metered.
+    """
+    size = os.path.getsize(local_path)
+
+    if size < RESUMABLE_THRESHOLD and throttle is None:
+        return upload_file(local_path, gcs_path, content_type)
+
+    if content_type is None:
+        content_type, _ = mimetypes.guess_type(local_path)
+
+    # A changed local file must not continue an old session
+    key = f"{gcs_path}|{size}|{int(os.path.getmtime(local_path))}"
+
+    uri = _saved_session(key)
+    if uri is None:
+        uri = bucket.blob(gcs_path).create_resumable_upload_session(content_type=content_type, size=size)
+        _store_session(key, uri)
+    else:
+        logging.info(f"Resuming upload of {local_path}")
+
+    logging.info(f"Uploading {local_path} - {gcs_path} ({size} bytes, resumable)")
+
+    offset = None
+    failures = 0
+
+    with metrics.timer("gcs_upload"), open(local_path, "rb") as f:
+        while offset is None or offset < size:
+            try:
+                if offset is None:
+                    offset = _query_offset(uri, size)
+                    continue
+
+                offset = _put_chunk(uri, f, offset, size, throttle)
+                failures = 0
+
+            except SessionExpired:
+                logging.warning(f"Upload session of {gcs_path} expired, starting over")
+                uri = bucket.blob(gcs_path).create_resumable_upload_session(content_type=content_type, size=size)
+                _store_session(key, uri)
+                offset = 0
+
+            except requests.RequestException as e:
+                failures += 1
+                if failures > CHUNK_RETRIES:
+                    logging.error(f"Upload of {gcs_path} failed after {CHUNK_RETRIES} retries: {e}")
+                    raise
+
+                delay = RETRY_BASE_DELAY * (2 ** (failures - 1))
+                logging.warning(f"Chunk upload of {gcs_path} failed ({e}), retry in {delay}s")
+                time.sleep(delay)
+                # Ask GCS how much arrived before resending
+                offset = None
+
+    _store_session(key, None)
+    metrics.inc("gcs_uploaded_bytes", size)
+
+    return f"gs://{GCS_BUCKET}/{gcs_path}"
+
+
+def upload_files(uploads, max_workers=UPLOAD_WORKERS):
+    """
+    Uploads [(local_path, gcs_path, content_type)] concurrently.
+    Returns {local_path: gcs_url}, None for files that failed.
+    """
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(upload_file_resumable, local_path, gcs_path, content_type): local_path
+            for local_path, gcs_path, content_type in uploads
+        }
+
+        for future in as_completed(futures):
+            local_path = futures[future]
+            try:
+                results[local_path] = future.result()
+            except Exception:
+                logging.exception(f"Upload of {local_path} failed")
+                results[local_path] = None
+
+    return results
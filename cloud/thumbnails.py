@@ -0,0 +1,80 @@
+import os
+import cv2
+import numpy as np
+
+# PARAMETERS
+# Poster: one frame from the middle of the visit
+POSTER_MAX_WIDTH = 480
+# Sprite sheet: evenly spaced frames in a grid, used for hover previews
+SPRITE_COLUMNS = 5
+SPRITE_ROWS = 2
+SPRITE_TILE_WIDTH = 160
+# WebP is several times smaller than the MP4 or full size JPEG frames
+PREVIEW_EXT = ".webp"
+PREVIEW_QUALITY = 70
+
+
+def _read_frame(cap, frame_idx):
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+    ret, frame = cap.read()
+    return frame if ret else None
+
+
+def _resize_to_width(frame, width):
+    h, w = frame.shape[:2]
+    if w <= width:
+        return frame
+    return cv2.resize(frame, (width, int(h * width / w)), interpolation=cv2.INTER_AREA)
+
+
+def _write_preview(path, image):
+    ok = cv2.imwrite(path, image, [cv2.IMWRITE_WEBP_QUALITY, PREVIEW_QUALITY])
+    if not ok:
+        raise RuntimeError(f"Failed to write preview {path}")
+
+
+def create_previews(video_path, output_dir):
+    """
+    Creates poster.webp and sprite_<columns>x<rows>.webp for a visit video.
+    The sprite layout is part of the file name so the frontend can slice it.
+    Returns (poster_path, sprite_path), None for images that could not be made.
+    """
+    cap = cv2.VideoCapture(video_path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    poster_path = None
+    sprite_path = None
+
+    try:
+        if total <= 0:
+            return None, None
+
+        frame = _read_frame(cap, total // 2)
+        if frame is not None:
+            poster_path = os.path.join(output_dir, f"poster{PREVIEW_EXT}")
+            _write_preview(poster_path, _resize_to_width(frame, POSTER_MAX_WIDTH))
+
+        tiles = []
+        count = SPRITE_COLUMNS * SPRITE_ROWS
+        for i in range(count):
+            # Centre of each of the `count` equal parts of the video
+            frame = _read_frame(cap, int((i + 0.5) * total / count))
+            if frame is None:
+                break
+            tiles.append(_resize_to_width(frame, SPRITE_TILE_WIDTH))
+
+        if tiles:
+            tile_h, tile_w = tiles[0].shape[:2]
+            sprite = np.zeros((tile_h * SPRITE_ROWS, tile_w * SPRITE_COLUMNS, 3), dtype=np.uint8)
+
+            for i, tile in enumerate(tiles):
+                row, col = divmod(i, SPRITE_COLUMNS)
+                sprite[row * tile_h:(row + 1) * tile_h, col * tile_w:(col + 1) * tile_w] = tile[:tile_h, :tile_w]
+
+            sprite_path = os.path.join(output_dir, f"sprite_{SPRITE_COLUMNS}x{SPRITE_ROWS}{PREVIEW_EXT}")
+            _write_preview(sprite_path, sprite)
+
+    finally:
+        cap.release()
+
+    return poster_path, sprite_path
@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from metrics import metrics
+
+# Throttled uploads are metered per block of this size
+THROTTLE_BLOCK_SIZE = 64 * 1024
+
+
+class TokenBucket:
+    """
+    Bandwidth cap: consume(n) blocks until n bytes may be sent.
+    rate_bytes_per_sec = 0 disables the cap.
+    """
+
+    def __init__(self, rate_bytes_per_sec, burst_bytes=None):
+        self.rate = rate_bytes_per_sec
+        self.capacity = burst_bytes or rate_bytes_per_sec
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, amount):
+        if not self.rate:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            # Larger requests than the burst go into debt, the wait pays it back
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ThrottledReader:
+    """
+    File-like view of the next `length` bytes of `f` for an HTTP request body.
+    Every read returns at most `block_size` bytes and waits for the token
+    bucket first, so the body goes out at the capped rate instead of as one
+    burst at line rate.
+    """
+
+    def __init__(self, f, length, throttle, block_size=THROTTLE_BLOCK_SIZE):
+        self.f = f
+        self.remaining = length
+        self.throttle = throttle
+        self.block_size = block_size
+
+    def __len__(self):
+        # Lets requests send a Content-Length instead of chunked encoding
+        return self.remaining
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            # Whole rest at once (not used by the HTTP client), still metered per block
+            return b"".join(iter(lambda: self.read(self.block_size), b""))
+
+        amount = min(size, self.block_size, self.remaining)
+        if amount <= 0:
+            return b""
+
+        self.throttle.consume(amount)
+        data = self.f.read(amount)
+        self.remaining -= len(data)
+
+        return data
+
+
+def parse_windows(spec):
+    """
+    "07:00-20:00,23:30-01:00" -> [((7, 0), (20, 0)), ((23, 30), (1, 0))]
+    """
+    windows = []
+
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        start, end = part.split("-")
+        windows.append(tuple(tuple(int(x) for x in t.split(":")) for t in (start, end)))
+
+    return windows
+
+
+def in_windows(windows, now=None):
+    """
+    True if `now` is inside any window (windows may wrap past midnight).
+    No windows means always allowed.
+    """
+    if not windows:
+        return True
+
+    now = now or datetime.now()
+    current = (now.hour, now.minute)
+
+    for start, end in windows:
+        if start <= end:
+            if start <= current < end:
+                return True
+        elif current >= start or current < end:
+            return True
+
+    return False
+
+
+class VideoUploadScheduler:
+    """
+    Defers large visit video uploads so they don't compete with the RTSP
+    stream for the uplink while possums are active.
+
+    - videos are uploaded one at a time, only inside quiet windows
+    - uploads are throttled by a token bucket
+    - pending videos are persisted and picked up again after a restart
+    - failed uploads stay queued and are retried after `retry_delay_sec`
+
+    Small work (DB records, ROIs, previews) does not go through here and is
+    uploaded immediately by the upload worker.
+    """
+
+    def __init__(self, upload_func, state_path, quiet_windows="", bandwidth_kbps=0,
+                 check_interval_sec=60, retry_delay_sec=300):
+        # upload_func(visit_id, video_path, throttle) uploads one video
+        self.upload_func = upload_func
+        self.state_path = state_path
+        self.windows = parse_windows(quiet_windows)
+        # kbit/s -> bytes/s; a burst of one block keeps the cap at sub-second scale
+        self.throttle = TokenBucket(bandwidth_kbps * 1000 / 8, THROTTLE_BLOCK_SIZE) if bandwidth_kbps else None
+        self.check_interval_sec = check_interval_sec
+        self.retry_delay_sec = retry_delay_sec
+
+        self.condition = threading.Condition()
+        self.pending = self._load()
+        # Set by drain(): upload everything now, ignoring quiet windows
+        self.draining = False
+        self.busy = False
+
+        if self.pending:
+            logging.info(f"{len(self.pending)} deferred video uploads restored")
+
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def submit(self, visit_id, video_path):
+        with self.condition:
+            self.pending.append({"visit_id": visit_id, "video_path": video_path, "not_before": 0})
+            self._save()
+            self.condition.notify_all()
+
+    def queue_depth(self):
+        return len(self.pending)
+
+    def drain(self, timeout=None):
+        """
+        Uploads all pending videos regardless of quiet windows and waits.
+        Used when processing a recorded video file before exit.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self.condition:
+            self.draining = True
+            self.condition.notify_all()
+
+            while self.pending or self.busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    logging.warning(f"{len(self.pending)} video uploads still pending")
+                    break
+                self.condition.wait(timeout=remaining)
+
+            self.draining = False
+
+    def _next_job(self):
+        """
+        Oldest job whose retry delay passed, if uploads are currently allowed.
+        """
+        if not (self.draining or in_windows(self.windows)):
+            return None
+
+        now = time.time()
+        return next((job for job in self.pending if job["not_before"] <= now), None)
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                job = self._next_job()
+                while job is None:
+                    self.condition.wait(timeout=self.check_interval_sec)
+                    job = self._next_job()
+                self.busy = True
+
+            try:
+                if os.path.exists(job["video_path"]):
+                    self.upload_func(job["visit_id"], job["video_path"], self.throttle)
+                else:
+                    logging.error(f"Video of visit {job['visit_id']} is missing: {job['video_path']}")
+
+                with self.condition:
+                    self.pending.remove(job)
+
+            except Exception:
+                logging.exception(f"Video upload of visit {job['visit_id']} failed, retrying later")
+                metrics.inc("video_upload_failures")
+
+                with self.condition:
+                    job["not_before"] = time.time() + self.retry_delay_sec
+
+            finally:
+                with self.condition:
+                    self.busy = False
+                    self._save()
+                    self.condition.notify_all()
+
+    def _load(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save(self):
+        temp_path = self.state_path + ".tmp"
+
+        with open(temp_path, "w") as f:
+            json.dump(self.pending, f)
+        os.replace(temp_path, self.state_path)
+
+
+class UploadRetryQueue:
+    """
+    Persisted uploads that failed, retried in the background every
+    `retry_delay_sec` until `upload_func(job)` returns True (also after a
+    restart). Jobs are JSON dicts; used for the small media of visits,
+    which is otherwise uploaded once by the upload worker.
+    """
+
+    def __init__(self, upload_func, state_path, retry_delay_sec=300):
+        self.upload_func = upload_func
+        self.state_path = state_path
+        self.retry_delay_sec = retry_delay_sec
+
+        self.condition = threading.Condition()
+        self.pending = self._load()
+
+        if self.pending:
+            logging.info(f"{len(self.pending)} failed uploads restored for retry")
+
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def add(self, job):
+        with self.condition:
+            job["not_before"] = time.time() + self.retry_delay_sec
+            self.pending.append(job)
+            self._save()
+            self.condition.notify_all()
+
+    def queue_depth(self):
+        return len(self.pending)
+
+    def _next_job(self):
+        now = time.time()
+        return next((job for job in self.pending if job["not_before"] <= now), None)
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                job = self._next_job()
+                while job is None:
+                    # Sleep until the earliest retry is due or a job is added
+                    due = min((j["not_before"] for j in self.pending), default=None)
+                    self.condition.wait(timeout=None if due is None else max(due - time.time(), 0))
+                    job = self._next_job()
+
+            try:
+                uploaded = self.upload_func(job)
+            except Exception:
+                logging.exception("Upload retry failed")
+                uploaded = False
+
+            with self.condition:
+                if uploaded:
+                    self.pending.remove(job)
+                else:
+                    metrics.inc("upload_retry_failures")
+                    job["not_before"] = time.time() + self.retry_delay_sec
+                self._save()
+
+    def _load(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save(self):
+        temp_path = self.state_path + ".tmp"
+
+        with open(temp_path, "w") as f:
+            json.dump(self.pending, f)
+        os.replace(temp_path, self.state_path)
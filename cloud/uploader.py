@@ -1,11 +1,14 @@
 import logging
 import os
 from .encoder import convert_to_h264
-from .gcs_client import upload_file
+from .gcs_client import upload_files, upload_file_resumable
+from .thumbnails import create_previews
 from db.visit_repository import (
     update_visit_video,
+    update_visit_previews,
     insert_frame,
     insert_roi,
+    delete_visit_media,
     update_roi_url,
     compute_representative_roi,
     update_representative_roi,
@@ -16,29 +19,43 @@ from db.visit_repository import (
 
 def upload_visit_media(visit):
     """
-    Uploads all media related to a possum visit:
-    - Converts and uploads video to GCS
-    - Uploads frames and ROIs to GCS
+    Uploads all small media related to a possum visit:
+    - Uploads previews and selected ROIs to GCS
     - Stores metadata in database
     - Computes representative ROI for the visit
+
+    The video itself is uploaded later by upload_visit_video
+    (deferred to quiet windows by the video upload scheduler).
+
+    Returns True if everything was stored and uploaded, local media
+    may be deleted only then. A retry (visit["retry"]) first removes the
+    frames and ROIs stored by the failed attempt.
     """
         
     try:
         visit_id = visit["visit_id"]
 
+        if visit.get("retry"):
+            with_db_retry(delete_visit_media, visit_id)
+
         # VIDEO
         # Convert recorded visit video to H264 format for better compatibility and streaming
         #video_local = convert_to_h264(visit["video_path"])
         video_local = visit["video_path"]
-        # Define destination path in Google Cloud Storage
-        gcs_video_path = f"visits/visit_{visit_id}/visit.mp4"
 
-        # Upload video file to GCS and store returned URL
-        video_url = upload_file(video_local, gcs_video_path)
-        # Save video URL into visits table in the database
-        with_db_retry(update_visit_video, visit_id, video_url)
-        #if os.path.exists(video_local):
-            #os.remove(video_local)
+        # Small files of the visit are uploaded together at the end (in parallel)
+        uploads = []
+
+        # PREVIEWS
+        # Small poster and sprite sheet so gallery pages don't load the MP4
+        previews = create_visit_previews(video_local)
+        for preview_path in previews:
+            if preview_path is not None:
+                uploads.append((
+                    preview_path,
+                    f"visits/visit_{visit_id}/{os.path.basename(preview_path)}",
+                    "image/webp"
+                ))
 
         # FRAMES
         # Dictionary to map local frame paths to DB frame IDs
@@ -89,12 +106,13 @@ def upload_visit_media(visit):
         n = len(all_roi_records)
 
         if n == 0:
+            uploaded = upload_and_store_urls(visit_id, uploads, previews, [])
             with_db_retry(update_representative_roi, visit_id, None)
             try:
                 with_db_retry(recalculate_visit_statistics, visit_id)
             except Exception:
                 logging.exception("Statistics recalculation failed")
-            return
+            return uploaded
 
         if n < 5:
             selected = all_roi_records
@@ -116,9 +134,9 @@ def upload_visit_media(visit):
             filename = os.path.basename(roi_path)
             gcs_path = f"visits/visit_{visit_id}/rois/{filename}"
 
-            roi_url = upload_file(roi_path, gcs_path)
+            uploads.append((roi_path, gcs_path, None))
 
-            with_db_retry(update_roi_url, roi_id, roi_url)
+        uploaded = upload_and_store_urls(visit_id, uploads, previews, selected)
 
         representative_roi_id = all_roi_records[min(n - 1, int(n * 0.50))][0]
 
@@ -147,9 +165,53 @@ def upload_visit_media(visit):
             #if os.path.exists(roi_path):
                 #os.remove(roi_path)
 
+        return uploaded
+
     except Exception as e:
         logging.exception("Upload failed")
+        return False
+
+
+def create_visit_previews(video_path):
+    """
+    Creates poster and sprite sheet next to the visit video.
+    Failures are logged only, previews are optional for the website.
+    """
+    try:
+        return create_previews(video_path, os.path.dirname(video_path))
+    except Exception:
+        logging.exception(f"Preview generation failed for {video_path}")
+        return None, None
+
+
+def upload_and_store_urls(visit_id, uploads, previews, selected_rois):
+    """
+    Uploads previews and selected ROIs concurrently and stores the resulting URLs.
+    Returns True if all uploads succeeded.
+    """
+    urls = upload_files(uploads)
 
+    # Save URLs into the database
+    poster_path, sprite_path = previews
+    if urls.get(poster_path) or urls.get(sprite_path):
+        with_db_retry(update_visit_previews, visit_id, urls.get(poster_path), urls.get(sprite_path))
 
+    for roi_id, roi_path in selected_rois:
+        if urls.get(roi_path):
+            with_db_retry(update_roi_url, roi_id, urls[roi_path])
 
+    return all(urls.values())
+
+
+def upload_visit_video(visit_id, video_path, throttle=None):
+    """
+    Uploads the visit video (resumable, optionally bandwidth limited)
+    and stores its URL. Raises on failure so the scheduler retries.
+    """
+    # Define destination path in Google Cloud Storage
+    gcs_video_path = f"visits/visit_{visit_id}/visit.mp4"
 
+    # Upload video file to GCS and store returned URL
+    video_url = upload_file_resumable(video_path, gcs_video_path, "video/mp4", throttle)
+    # Save video URL into visits table in the database
+    with_db_retry(update_visit_video, visit_id, video_url)
@@ -4,13 +4,15 @@ import shutil
 
 load_dotenv()
 
+# Only needed by the live pipeline: offline tools (replay, training, benchmarks)
+# import this module without a database or camera configured
 DB_CONFIG = {
-    "host": os.environ["DB_HOST"],
-    "user": os.environ["DB_USER"],
-    "password": os.environ["DB_PASS"],
-    "database": os.environ["DB_NAME"]
+    "host": os.getenv("DB_HOST"),
+    "user": os.getenv("DB_USER"),
+    "password": os.getenv("DB_PASS"),
+    "database": os.getenv("DB_NAME")
 }
-RTSP_URL = os.environ["RTSP_URL"]
+RTSP_URL = os.getenv("RTSP_URL")
 
 def get_ffmpeg_path():
 
@@ -26,4 +28,59 @@ def get_ffmpeg_path():
 BASE_DIR = os.path.dirname(__file__)
 MODEL_PATH = os.path.join(BASE_DIR, "models", "full_model_weight.pt")
 
-ESP32_IP = "192.168.5.200"
\ No newline at end of file
+ESP32_IP = "192.168.5.200"
+
+# Headless mode: no drawing, no GUI window (default for production)
+HEADLESS = os.getenv("HEADLESS", "true").lower() == "true"
+# Optional MJPEG debug preview served on localhost (0 = disabled)
+PREVIEW_PORT = int(os.getenv("PREVIEW_PORT", "0"))
+PREVIEW_FPS = float(os.getenv("PREVIEW_FPS", "2"))
+# Local Prometheus-style metrics endpoint (0 = metrics disabled)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_LOG_INTERVAL_SEC = int(os.getenv("METRICS_LOG_INTERVAL_SEC", "60"))
+# Encoding of saved images ("jpeg" or "webp"), quality per artefact type
+# (see benchmarks/encoding_report.py for size vs encode time of each tier)
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "jpeg")
+FRAME_QUALITY = int(os.getenv("FRAME_QUALITY", "85"))
+ROI_QUALITY = int(os.getenv("ROI_QUALITY", "90"))
+CROP_QUALITY = int(os.getenv("CROP_QUALITY", "95"))
+# Longest side of saved full frames in pixels (0 = original size)
+FRAME_MAX_DIM = int(os.getenv("FRAME_MAX_DIM", "0"))
+# Multi-camera supervisor (multi_feed.py): "id=rtsp://...,id2=rtsp://..."
+# (empty = RTSP_URL as the only camera "main") and cores it may use in total
+CAMERAS = os.getenv("CAMERAS", "")
+CPU_BUDGET = int(os.getenv("CPU_BUDGET", str(os.cpu_count() or 1)))
+# Possum probability needed to count a ROI as possum (inference/calibrate_threshold.py)
+POSSUM_THRESHOLD = float(os.getenv("POSSUM_THRESHOLD", "0.5"))
+# Optional confidence short-circuits of the visit rules (0 = off). Only set them from the
+# "above"/"below" columns of inference/calibrate_threshold.py for the deployed model
+EARLY_ACCEPT_SCORE = float(os.getenv("EARLY_ACCEPT_SCORE", "0"))
+EARLY_REJECT_SCORE = float(os.getenv("EARLY_REJECT_SCORE", "0"))
+# Optional cascade: tiny CNN (model_training/train_gate.py) in front of the ResNet.
+# ROIs it scores below GATE_REJECT_SCORE are rejected without the ResNet (empty path = off)
+GATE_MODEL_PATH = os.getenv("GATE_MODEL_PATH", "")
+GATE_REJECT_SCORE = float(os.getenv("GATE_REJECT_SCORE", "0.05"))
+# Torch thread pools of the inference process (0 = torch default: one per core).
+# On a shared edge host leave cores for capture, motion detection and uploads.
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", "0"))
+TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", "0"))
+# Dummy batch sizes run through the model at startup (empty = no warm-up)
+WARMUP_BATCH_SIZES = os.getenv("WARMUP_BATCH_SIZES", "1,2,4,8")
+# Camera of this process, set per camera process by the multi-camera supervisor
+# (multi_feed.py). Other cameras keep their upload state in separate files.
+CAMERA_ID = os.getenv("CAMERA_ID", "main")
+STATE_SUFFIX = "" if CAMERA_ID == "main" else f"_{CAMERA_ID}"
+# Large video uploads are deferred to quiet windows ("HH:MM-HH:MM,...", empty = any time)
+# so they don't compete with the RTSP stream while possums are active
+UPLOAD_QUIET_WINDOWS = os.getenv("UPLOAD_QUIET_WINDOWS", "")
+# Bandwidth cap for video uploads in kbit/s (0 = unlimited)
+UPLOAD_BANDWIDTH_KBPS = int(os.getenv("UPLOAD_BANDWIDTH_KBPS", "0"))
+UPLOAD_STATE_PATH = os.path.join(BASE_DIR, f"pending_video_uploads{STATE_SUFFIX}.json")
+# Visit media (DB records, ROIs, previews) whose upload failed, retried in the background
+MEDIA_RETRY_STATE_PATH = os.path.join(BASE_DIR, f"pending_media_uploads{STATE_SUFFIX}.json")
+MEDIA_RETRY_DELAY_SEC = int(os.getenv("MEDIA_RETRY_DELAY_SEC", "300"))
+# Local media quota: uploaded visits are evicted (least recently modified first)
+# above this size, below the minimum free disk space or after the maximum age
+STORAGE_MAX_GB = float(os.getenv("STORAGE_MAX_GB", "20"))
+STORAGE_MIN_FREE_GB = float(os.getenv("STORAGE_MIN_FREE_GB", "2"))
+STORAGE_MAX_AGE_DAYS = int(os.getenv("STORAGE_MAX_AGE_DAYS", "30"))   # 0 = no age limit
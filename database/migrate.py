@@ -0,0 +1,126 @@
+import os
+import re
+import logging
+import argparse
+
+import mysql.connector
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d{3})_[\w-]+\.sql$")
+
+
+def split_statements(sql):
+    """
+    Splits an SQL file into statements (no procedures or string literals containing ';').
+    """
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [s.strip() for s in "\n".join(lines).split(";") if s.strip()]
+
+
+def list_migrations():
+    """
+    Returns [(version, path)] sorted by version.
+    """
+    migrations = []
+
+    for name in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = MIGRATION_FILE.match(name)
+        if match:
+            migrations.append((match.group(1), os.path.join(MIGRATIONS_DIR, name)))
+
+    return migrations
+
+
+def applied_versions(conn):
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version varchar(16) NOT NULL,
+            applied_at datetime NOT NULL,
+            PRIMARY KEY (version)
+        )
+    """)
+    cur.execute("SELECT version FROM schema_migrations")
+    versions = {row[0] for row in cur.fetchall()}
+    cur.close()
+    return versions
+
+
+def apply_migrations(conn, fake_through=None):
+    """
+    Applies pending migrations in version order. Returns applied versions.
+
+    MySQL commits DDL implicitly, so a migration failing halfway is not rolled
+    back: fix the database by hand and rerun, the version is only recorded
+    after all its statements succeeded.
+
+    Migrations up to `fake_through` are recorded without running (databases
+    created before migrations existed).
+    """
+    done = applied_versions(conn)
+    applied = []
+
+    cur = conn.cursor()
+
+    for version, path in list_migrations():
+        if version in done:
+            continue
+
+        if fake_through is not None and version <= fake_through:
+            logging.info(f"Marking migration {version} as applied")
+        else:
+            logging.info(f"Applying migration {os.path.basename(path)}")
+            with open(path) as f:
+                for statement in split_statements(f.read()):
+                    cur.execute(statement)
+
+        cur.execute(
+            "INSERT INTO schema_migrations (version, applied_at) VALUES (%s, NOW())",
+            (version,)
+        )
+        conn.commit()
+        applied.append(version)
+
+    cur.close()
+
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations")
+    parser.add_argument("--host", default=os.environ.get("DB_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("DB_PORT", 3306)))
+    parser.add_argument("--user", default=os.environ.get("DB_USER"))
+    parser.add_argument("--password", default=os.environ.get("DB_PASS"))
+    parser.add_argument("--database", default=os.environ.get("DB_NAME"))
+    parser.add_argument("--fake-through", help="Record migrations up to this version without running them")
+    parser.add_argument("--status", action="store_true", help="Only list applied and pending migrations")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    conn = mysql.connector.connect(
+        host=args.host,
+        port=args.port,
+        user=args.user,
+        password=args.password,
+        database=args.database
+    )
+
+    try:
+        if args.status:
+            done = applied_versions(conn)
+            for version, path in list_migrations():
+                state = "applied" if version in done else "pending"
+                print(f"{version} {state:8s} {os.path.basename(path)}")
+            return
+
+        applied = apply_migrations(conn, args.fake_through)
+        logging.info(f"Applied migrations: {applied or 'none'}")
+
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+-- 001: columns and tables used by possum_api and the edge uploader
+-- that are not part of database/schema.sql.
+-- Already present in production: mark as applied with
+--   python database/migrate.py --fake-through 001
+
+ALTER TABLE `visits`
+  ADD COLUMN `night_date` date DEFAULT NULL,
+  ADD COLUMN `approved` tinyint(1) NOT NULL DEFAULT 0,
+  ADD COLUMN `representative_roi_id` int DEFAULT NULL;
+
+ALTER TABLE `rois`
+  ADD COLUMN `roi_timestamp` datetime DEFAULT NULL;
+
+CREATE TABLE IF NOT EXISTS `visit_statistics` (
+  `visit_id` int NOT NULL,
+  `visit_duration_sec_stored` double DEFAULT NULL,
+  `visit_duration_sec_calculated` double DEFAULT NULL,
+  `moving_time_sec` double DEFAULT NULL,
+  `idle_time_sec` double DEFAULT NULL,
+  `activity_ratio` double DEFAULT NULL,
+  `total_distance_px` double DEFAULT NULL,
+  `avg_speed_px_per_sec` double DEFAULT NULL,
+  `max_speed_px_per_sec` double DEFAULT NULL,
+  `calculated_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`visit_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+CREATE TABLE IF NOT EXISTS `records` (
+  `record_id` int NOT NULL AUTO_INCREMENT,
+  `record_link` varchar(500) DEFAULT NULL,
+  PRIMARY KEY (`record_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
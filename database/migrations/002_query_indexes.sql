@@ -0,0 +1,17 @@
+-- 002: indexes for the API and per-visit query paths.
+
+-- /visits (night_date range), /videos_rois (night_date = ? AND approved = 1 ORDER BY start_time)
+-- /recent_activity (approved = 1 ORDER BY start_time DESC LIMIT 6)
+ALTER TABLE `visits`
+  ADD KEY `idx_visits_night_approved` (`night_date`, `approved`, `start_time`),
+  ADD KEY `idx_visits_approved_start` (`approved`, `start_time`);
+
+-- Explicit (visit_id, frame_id) for per-visit joins ordered by frame,
+-- replaces visit_id_idx (the foreign key uses the new index)
+ALTER TABLE `frames`
+  ADD KEY `idx_frames_visit_frame` (`visit_id`, `frame_id`),
+  DROP KEY `visit_id_idx`;
+
+-- Per-visit ROI lists ordered by time (recalculate_visit_statistics)
+ALTER TABLE `rois`
+  ADD KEY `idx_rois_frame_timestamp` (`frame_id`, `roi_timestamp`);
@@ -0,0 +1,14 @@
+-- 003: stored bounding box centre and width for the position queries.
+-- Fence zone, heatmap and visit statistics queries read these instead of
+-- computing (bbox_x1 + bbox_x2) / 2 from full rows.
+
+ALTER TABLE `rois`
+  ADD COLUMN `bbox_center_x` double GENERATED ALWAYS AS ((`bbox_x1` + `bbox_x2`) / 2) STORED,
+  ADD COLUMN `bbox_center_y` double GENERATED ALWAYS AS ((`bbox_y1` + `bbox_y2`) / 2) STORED,
+  ADD COLUMN `bbox_width` double GENERATED ALWAYS AS (`bbox_x2` - `bbox_x1`) STORED;
+
+-- Covering index for fence zone and heatmap queries (roi_id is implicit),
+-- replaces frames_idx (the foreign key uses the new index)
+ALTER TABLE `rois`
+  ADD KEY `idx_rois_frame_center` (`frame_id`, `bbox_center_x`),
+  DROP KEY `frames_idx`;
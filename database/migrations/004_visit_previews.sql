@@ -0,0 +1,5 @@
+-- 004: poster image and sprite sheet generated at upload (cloud/thumbnails.py).
+
+ALTER TABLE `visits`
+  ADD COLUMN `poster_url` varchar(500) DEFAULT NULL,
+  ADD COLUMN `sprite_url` varchar(500) DEFAULT NULL;
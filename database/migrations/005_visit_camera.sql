@@ -0,0 +1,5 @@
+-- 005: camera of a visit (multi-camera supervisor, multi_feed.py).
+-- Existing visits come from the original fence camera.
+
+ALTER TABLE `visits`
+  ADD COLUMN `camera_id` varchar(32) NOT NULL DEFAULT 'main';
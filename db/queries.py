@@ -0,0 +1,42 @@
+# SQL of the hot repository queries, shared with the EXPLAIN check (api/loadtest/explain_check.py).
+# No imports: the check loads this without the MySQL pool of visit_repository.
+
+# Middle ROI of a visit (by frame, then ROI id)
+REPRESENTATIVE_ROI_QUERY = """
+    SELECT roi_id
+    FROM (
+        SELECT
+            r.roi_id,
+            ROW_NUMBER() OVER (
+                PARTITION BY v.visit_id
+                ORDER BY f.frame_id, r.roi_id
+            ) AS rn,
+            COUNT(*) OVER (
+                PARTITION BY v.visit_id
+            ) AS total
+        FROM visits v
+        JOIN frames f ON f.visit_id = v.visit_id
+        JOIN rois r ON r.frame_id = f.frame_id
+        WHERE v.visit_id = %s
+    ) t
+    WHERE rn = FLOOR((total + 1) / 2)
+"""
+
+# ROI centres of a visit for the movement statistics
+VISIT_ROIS_FOR_STATISTICS_QUERY = """
+    SELECT
+        r.roi_id,
+        r.roi_timestamp,
+        r.bbox_center_x AS cx,
+        r.bbox_center_y AS cy,
+        r.bbox_width
+    FROM rois r
+    JOIN frames f ON r.frame_id = f.frame_id
+    WHERE f.visit_id = %s
+    AND r.bbox_center_x IS NOT NULL
+    AND r.bbox_center_y IS NOT NULL
+    ORDER BY r.roi_timestamp, r.roi_id
+"""
+
+# Latest applied migration (database/migrate.py records versions in schema_migrations)
+SCHEMA_VERSION_QUERY = "SELECT MAX(version) FROM schema_migrations"
@@ -0,0 +1,112 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+from inference.detector import predict_batch
+from metrics import metrics
+
+
+class InferenceServer:
+    """
+    Micro-batching wrapper around the loaded model.
+
+    Any producer (pipeline classify stage, no-motion re-check, other
+    pipelines in the same process) calls submit(rois) and gets a Future
+    of the possum probability per ROI. A worker thread accumulates requests
+    into one batch until `max_batch` ROIs are collected or `max_wait_ms`
+    passed since the first request, runs one forward pass and resolves all
+    futures.
+
+    With `producers` callers that block on their result, the batch is sent
+    as soon as all of them are waiting: a single pipeline never pays the
+    wait, it only pays off when several producers run concurrently.
+    An optional CascadeGate is applied to every batch.
+    """
+
+    def __init__(self, model, transform, device, max_batch=32, max_wait_ms=5, producers=1, gate=None):
+        self.model = model
+        self.transform = transform
+        self.device = device
+        self.gate = gate
+        self.max_batch = max_batch
+        self.max_wait_sec = max_wait_ms / 1000
+        self.producers = producers
+
+        self.requests = queue.Queue()
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def submit(self, rois):
+        future = Future()
+
+        if len(rois) == 0:
+            future.set_result([])
+            return future
+
+        self.requests.put((list(rois), future, time.perf_counter()))
+        return future
+
+    def classify(self, rois, timeout=None):
+        """
+        Blocking helper: returns the possum probability per ROI.
+        """
+        return self.submit(rois).result(timeout=timeout)
+
+    def _collect(self):
+        """
+        Blocks for the first request, then gathers more until the batch is
+        full, the wait is over or every producer has a request in the batch.
+        """
+        batch = [self.requests.get()]
+        size = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait_sec
+
+        while size < self.max_batch and len(batch) < self.producers:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+
+            try:
+                request = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+            batch.append(request)
+            size += len(request[0])
+
+        # Requests already queued are taken without waiting (up to max_batch)
+        while size < self.max_batch:
+            try:
+                request = self.requests.get_nowait()
+            except queue.Empty:
+                break
+
+            batch.append(request)
+            size += len(request[0])
+
+        return batch
+
+    def _worker(self):
+        while True:
+            batch = self._collect()
+            dispatched = time.perf_counter()
+
+            for _, _, submitted in batch:
+                metrics.observe("inference_queue_delay", dispatched - submitted)
+            metrics.observe("inference_requests_per_batch", len(batch))
+
+            rois = [roi for request_rois, _, _ in batch for roi in request_rois]
+
+            try:
+                scores = predict_batch(rois, self.model, self.transform, self.device, self.gate)
+            except Exception as e:
+                logging.exception(f"Batch inference failed ({len(rois)} ROIs)")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for request_rois, future, _ in batch:
+                future.set_result(scores[offset:offset + len(request_rois)])
+                offset += len(request_rois)
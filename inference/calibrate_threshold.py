@@ -0,0 +1,111 @@
+import json
+import argparse
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from torchvision import datasets
+
+from config import MODEL_PATH
+from inference.model_loader import load_model
+from inference.transforms import build_test_transform
+from inference.detector import POSSUM_CLASS
+
+# PARAMETERS
+THRESHOLDS = [round(t, 2) for t in np.arange(0.05, 1.0, 0.05)] + [0.97, 0.98, 0.99]
+
+
+def collect_scores(model, data_dir, device, batch_size=64, workers=2):
+    """
+    Possum probabilities and labels of a labelled crop folder
+    (ImageFolder layout, same as training: <data_dir>/<class>/*.jpg).
+    """
+    dataset = datasets.ImageFolder(data_dir, build_test_transform())
+    loader = DataLoader(dataset, batch_size=batch_size, num_workers=workers)
+
+    scores = []
+    labels = []
+
+    with torch.no_grad():
+        for inputs, targets in loader:
+            probs = torch.softmax(model(inputs.to(device)), dim=1)[:, POSSUM_CLASS]
+            scores.extend(probs.cpu().tolist())
+            labels.extend((targets == POSSUM_CLASS).tolist())
+
+    return np.array(scores), np.array(labels, dtype=bool), dataset.classes
+
+
+def threshold_table(scores, labels, thresholds=THRESHOLDS):
+    """
+    Precision, recall and F1 of the possum class for every threshold, plus the
+    share of ROIs that the early accept / early reject rules would settle.
+    """
+    rows = []
+
+    for threshold in thresholds:
+        predicted = scores >= threshold
+        tp = int(np.sum(predicted & labels))
+        fp = int(np.sum(predicted & ~labels))
+        fn = int(np.sum(~predicted & labels))
+
+        precision = tp / (tp + fp) if tp + fp else 1.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+        rows.append({
+            "threshold": threshold,
+            "precision": round(precision, 4),
+            "recall": round(recall, 4),
+            "f1": round(f1, 4),
+            "false_positives": fp,
+            "false_negatives": fn,
+            # As early_accept_score: share of ROIs at or above this score
+            "share_above": round(float(np.mean(scores >= threshold)), 4),
+            # As early_reject_score: share of ROIs below it and how many of them are possums
+            "share_below": round(float(np.mean(scores < threshold)), 4),
+            "possums_below": int(np.sum((scores < threshold) & labels))
+        })
+
+    return rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Precision/recall per possum probability threshold")
+    parser.add_argument("data", help="Labelled crop folder (e.g. crops/choice/validation)")
+    parser.add_argument("--weights", default=MODEL_PATH)
+    parser.add_argument("--min-recall", type=float, default=0.99, help="Recall the suggested threshold must keep")
+    parser.add_argument("--output", help="Write the table as JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = load_model(args.weights, device)
+
+    scores, labels, classes = collect_scores(model, args.data, device)
+    print(f"{len(scores)} crops ({int(labels.sum())} {classes[POSSUM_CLASS]}), classes: {classes}")
+
+    rows = threshold_table(scores, labels)
+
+    print(f"{'threshold':>9} {'precision':>9} {'recall':>7} {'f1':>7} {'FP':>5} {'FN':>5} {'above':>7} {'below':>7}")
+    for row in rows:
+        print(
+            f"{row['threshold']:>9.2f} {row['precision']:>9.4f} {row['recall']:>7.4f} {row['f1']:>7.4f} "
+            f"{row['false_positives']:>5} {row['false_negatives']:>5} {row['share_above']:>7.2%} {row['share_below']:>7.2%}"
+        )
+
+    # Best F1 among thresholds that keep the required recall
+    candidates = [row for row in rows if row["recall"] >= args.min_recall] or rows
+    best = max(candidates, key=lambda row: row["f1"])
+    print(f"Suggested POSSUM_THRESHOLD={best['threshold']} (precision {best['precision']}, recall {best['recall']})")
+    print("EARLY_ACCEPT_SCORE / EARLY_REJECT_SCORE: pick from the 'above' / 'below' columns (precision near 1, no possums below)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"classes": classes, "suggested": best["threshold"], "thresholds": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
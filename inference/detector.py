@@ -1,39 +1,150 @@
 import cv2
- # Pillow library used for image format conversion compatible with torchv
-from PIL import Image
-import torch
+# Stage latency and CNN call counters
+from metrics import metrics
+# torch, Pillow and the model modules are imported where they are used:
+# camera processes of multi_feed.py only need select_possums
+
+# PARAMETERS
+# Index of the possum class in the model output (ImageFolder order: not_possum, possum)
+POSSUM_CLASS = 1
+# Possum probability needed to count a ROI as possum (0.5 = former argmax decision);
+# choose a calibrated value with inference/calibrate_threshold.py
+DEFAULT_THRESHOLD = 0.5
+# Cascade: ROIs the gate scores below this never reach the ResNet
+# (suggested per trained gate by model_training/train_gate.py)
+DEFAULT_GATE_REJECT_SCORE = 0.05
 
 # Function to classify ROIs and identify possums using trained model
-def detect_possums(rois, bboxes, model, transform, device):
-
-    possum_detected = False
-    possum_rois = []
-    possum_bboxes = []
-    possum_indices = []
-
-    for i, roi in enumerate(rois):
-         # Converts ROI from OpenCV BGR format to RGB and converts numpy array to PIL image
-        img = Image.fromarray(cv2.cvtColor(roi, cv2.COLOR_BGR2RGB))
-        # Applies preprocessing transform, adds batch dimension, and moves tensor to device
-        input_tensor = transform(img).unsqueeze(0).to(device)
-
-        with torch.no_grad():
-            # Runs forward pass through model
-            outputs = model(input_tensor)
-            # Selects class with highest prediction score
-            _, pred = torch.max(outputs, 1)
-
-        if pred.item() == 1:
-            # Marks that at least one possum was detected
-            possum_detected = True
-            # Keep only possum ROIs
-            possum_rois.append(roi)
-            possum_bboxes.append(bboxes[i])
-            possum_indices.append(i)
+def detect_possums(rois, bboxes, model, transform, device, server=None, threshold=DEFAULT_THRESHOLD, gate=None):
+    """
+    Classifies the ROIs of a frame in one batch, through the micro-batching
+    server (inference.batching.InferenceServer) if one is given.
+    An optional CascadeGate rejects obvious negatives before the model.
+
+    Returns (possum_detected, possum_rois, possum_bboxes, possum_indices, scores)
+    where scores holds the possum probability of every ROI.
+    """
+    if server is not None:
+        scores = server.classify(rois)
+    else:
+        scores = predict_batch(rois, model, transform, device, gate)
+
+    return select_possums(rois, bboxes, scores, threshold)
+
+
+def select_possums(rois, bboxes, scores, threshold=DEFAULT_THRESHOLD):
+    """
+    Applies the decision threshold to possum probabilities.
+    """
+    # Keep only possum ROIs
+    possum_indices = [i for i, score in enumerate(scores) if score >= threshold]
 
     return (
-        possum_detected,
-        possum_rois,
-        possum_bboxes,
-        possum_indices
-    )
\ No newline at end of file
+        len(possum_indices) > 0,
+        [rois[i] for i in possum_indices],
+        [bboxes[i] for i in possum_indices],
+        possum_indices,
+        scores
+    )
+
+
+def predict_batch(rois, model, transform, device, gate=None):
+    """
+    Classifies many ROIs with one forward pass.
+    Returns the softmax possum probability of every ROI.
+
+    With a gate, ROIs it rejects keep the gate score (below the reject
+    score) and only the rest is passed to the model.
+    """
+    if not rois:
+        return []
+
+    if gate is None:
+        return model_scores(rois, model, transform, device)
+
+    scores = gate.scores(rois)
+    forwarded = [i for i, score in enumerate(scores) if score >= gate.reject_score]
+    metrics.inc("gate_rejected_rois", len(rois) - len(forwarded))
+
+    if forwarded:
+        model_results = model_scores([rois[i] for i in forwarded], model, transform, device)
+        for i, score in zip(forwarded, model_results):
+            scores[i] = score
+
+    return scores
+
+
+def model_scores(rois, model, transform, device, prefix=""):
+    """
+    One batched forward pass. Returns the possum probability of every ROI.
+    Metrics of the cascade gate are recorded with prefix "gate_".
+    """
+    import torch
+    # Pillow library used for image format conversion compatible with torchvision
+    from PIL import Image
+
+    with metrics.timer(f"{prefix}preprocess"):
+        batch = torch.stack([
+            transform(Image.fromarray(cv2.cvtColor(roi, cv2.COLOR_BGR2RGB)))
+            for roi in rois
+        ]).to(device)
+
+    metrics.inc(f"{prefix}cnn_calls")
+    metrics.inc(f"{prefix}cnn_rois", len(rois))
+    metrics.observe(f"{prefix}batch_size", len(rois))
+
+    with metrics.timer(f"{prefix}model_forward"), torch.no_grad():
+        scores = torch.softmax(model(batch), dim=1)[:, POSSUM_CLASS]
+
+    return scores.tolist()
+
+
+class CascadeGate:
+    """
+    First stage of the cascade: a tiny CNN (inference.model_loader.GateNet)
+    scoring ROIs at 64x64. ROIs below `reject_score` are settled as
+    negatives, the rest is forwarded to the ResNet.
+    """
+
+    def __init__(self, model, transform, device, reject_score=DEFAULT_GATE_REJECT_SCORE):
+        self.model = model
+        self.transform = transform
+        self.device = device
+        self.reject_score = reject_score
+
+    def scores(self, rois):
+        return model_scores(rois, self.model, self.transform, self.device, prefix="gate_")
+
+
+def load_gate(model_path, device, reject_score=DEFAULT_GATE_REJECT_SCORE):
+    """
+    CascadeGate from trained gate weights, or None (no cascade) without a path.
+    """
+    if not model_path:
+        return None
+
+    from inference.model_loader import load_gate_model
+    from inference.transforms import build_gate_transform
+
+    return CascadeGate(load_gate_model(model_path, device), build_gate_transform(), device, reject_score)
+
+
+class PossumClassifier:
+    """
+    Classification stage: wraps the loaded model, transform and device.
+    Calling it with (rois, bboxes) returns the same tuple as detect_possums.
+    With a `server` all calls (moving and no-motion re-check) share its micro-batches.
+    """
+
+    def __init__(self, model, transform, device, server=None, threshold=DEFAULT_THRESHOLD, gate=None):
+        self.model = model
+        self.transform = transform
+        self.device = device
+        self.server = server
+        self.threshold = threshold
+        self.gate = gate
+
+    def __call__(self, rois, bboxes):
+        return detect_possums(
+            rois, bboxes, self.model, self.transform, self.device, self.server, self.threshold, self.gate
+        )
@@ -3,8 +3,8 @@ from torchvision.models import resnet18
 import torch.nn as nn
 import torch
 
-# Loads model weights and prepares model for inference.
-def load_model(model_path, device):
+# Builds the possum classifier architecture (ResNet-18 with 2 output classes).
+def build_model():
     # Creates ResNet-18 model without pretrained weights
     model = resnet18(weights=None)
 
@@ -12,6 +12,12 @@ def load_model(model_path, device):
     num_ftrs = model.fc.in_features
     model.fc = nn.Linear(num_ftrs, 2)
 
+    return model
+
+# Loads model weights and prepares model for inference.
+def load_model(model_path, device):
+    model = build_model()
+
     # Load saved weights
     state_dict = torch.load(model_path, map_location=device)
     model.load_state_dict(state_dict)
@@ -19,4 +25,41 @@ def load_model(model_path, device):
     model = model.to(device)
     model.eval()
 
-    return model
\ No newline at end of file
+    return model
+
+
+# Tiny CNN used as the first stage of the cascade (64x64 input, ~60k parameters).
+# Rejects obvious non-possums (leaves, shadows, insects) before the ResNet.
+class GateNet(nn.Module):
+    def __init__(self):
+        super().__init__()
+
+        def block(in_channels, out_channels):
+            # Each block halves the resolution: 64 -> 32 -> 16 -> 8 -> 4
+            return nn.Sequential(
+                nn.Conv2d(in_channels, out_channels, 3, stride=2, padding=1, bias=False),
+                nn.BatchNorm2d(out_channels),
+                nn.ReLU(inplace=True)
+            )
+
+        self.features = nn.Sequential(
+            block(3, 16),
+            block(16, 32),
+            block(32, 64),
+            block(64, 64),
+            nn.AdaptiveAvgPool2d(1)
+        )
+        self.fc = nn.Linear(64, 2)
+
+    def forward(self, x):
+        return self.fc(torch.flatten(self.features(x), 1))
+
+# Loads gate weights trained by model_training/train_gate.py
+def load_gate_model(model_path, device):
+    model = GateNet()
+    model.load_state_dict(torch.load(model_path, map_location=device))
+
+    model = model.to(device)
+    model.eval()
+
+    return model
@@ -0,0 +1,140 @@
+import time
+import queue
+import logging
+import itertools
+
+from config import TORCH_INTEROP_THREADS, WARMUP_BATCH_SIZES
+from startup import StartupTimer
+from inference.detector import predict_batch, select_possums, load_gate, DEFAULT_THRESHOLD, DEFAULT_GATE_REJECT_SCORE
+from metrics import metrics
+
+
+def inference_worker(weights_path, request_queue, response_queues, max_batch=32, max_wait_sec=0.01, threads=None,
+                     gate_path="", gate_reject_score=DEFAULT_GATE_REJECT_SCORE):
+    """
+    Process entry point of the shared inference worker.
+
+    Camera processes put (camera_id, request_id, rois) on `request_queue`.
+    Requests arriving within `max_wait_sec` of the first one are classified
+    together (up to `max_batch` ROIs, across cameras) with one forward pass.
+    Results go back as (request_id, [possum probability] or None on failure)
+    on the camera's response queue. A None request stops the worker.
+    With `gate_path` the tiny CNN cascade gate runs before the model.
+    """
+    startup = StartupTimer()
+
+    # Imported here: the camera processes import this module for RemoteClassifier
+    import torch
+    from inference.model_loader import load_model
+    from inference.transforms import build_test_transform
+    from inference.warmup import configure_threads, parse_batch_sizes, warm_up
+
+    configure_threads(threads, TORCH_INTEROP_THREADS)
+    startup.mark("torch_import")
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = load_model(weights_path, device)
+    transform = build_test_transform()
+    gate = load_gate(gate_path, device, gate_reject_score)
+    startup.mark("model_load")
+
+    first, _ = warm_up(model, transform, device, parse_batch_sizes(WARMUP_BATCH_SIZES, max_batch), gate)
+    if first is not None:
+        startup.record("first_inference", first)
+    startup.mark("warm_up")
+    startup.report("Inference worker startup")
+
+    logging.info(
+        f"Inference worker ready ({torch.get_num_threads()} threads, batches up to {max_batch} ROIs, "
+        f"cascade gate {'on' if gate else 'off'})"
+    )
+
+    running = True
+
+    while running:
+        first = request_queue.get()
+        if first is None:
+            break
+
+        requests = [first]
+        batch_size = len(first[2])
+        deadline = time.monotonic() + max_wait_sec
+
+        # Collect more requests for the same batch until it is full or the wait is over
+        while batch_size < max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            try:
+                request = request_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+            if request is None:
+                running = False
+                break
+
+            requests.append(request)
+            batch_size += len(request[2])
+
+        rois = [roi for _, _, request_rois in requests for roi in request_rois]
+
+        try:
+            scores = predict_batch(rois, model, transform, device, gate)
+        except Exception:
+            logging.exception(f"Batch inference failed ({len(rois)} ROIs)")
+            scores = None
+
+        offset = 0
+        for camera_id, request_id, request_rois in requests:
+            result = None if scores is None else scores[offset:offset + len(request_rois)]
+            offset += len(request_rois)
+            response_queues[camera_id].put((request_id, result))
+
+
+class RemoteClassifier:
+    """
+    Classification stage of a camera process backed by the shared inference worker.
+    Calling it with (rois, bboxes) returns the same tuple as detect_possums.
+    """
+
+    def __init__(self, camera_id, request_queue, response_queue, timeout=5, threshold=DEFAULT_THRESHOLD):
+        self.camera_id = camera_id
+        self.threshold = threshold
+        self.request_queue = request_queue
+        self.response_queue = response_queue
+        self.timeout = timeout
+        self.request_ids = itertools.count()
+
+    def __call__(self, rois, bboxes):
+        if len(rois) == 0:
+            return False, [], [], [], []
+
+        request_id = next(self.request_ids)
+
+        with metrics.timer("inference_roundtrip"):
+            self.request_queue.put((self.camera_id, request_id, list(rois)))
+            scores = self._wait_for(request_id)
+
+        if scores is None:
+            raise RuntimeError("Shared inference worker failed to classify ROIs")
+
+        return select_possums(rois, bboxes, scores, self.threshold)
+
+    def _wait_for(self, request_id):
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"No inference result within {self.timeout} s")
+
+            try:
+                response_id, scores = self.response_queue.get(timeout=remaining)
+            except queue.Empty:
+                continue
+
+            # Late answers of requests that already timed out are dropped
+            if response_id == request_id:
+                return scores
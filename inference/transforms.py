@@ -1,10 +1,16 @@
-from torchvision import transforms
+# torchvision is imported where it is used: the detection engine only needs
+# expand_bbox, and camera processes of multi_feed.py never load torch
 
 # Custom transform that resizes image while preserving aspect ratio
 class ResizeWithPadding:
     def __init__(self, size=224, fill=0):
+        from torchvision.transforms import functional
+
         self.size = size
         self.fill = fill
+        # Looked up once here: __call__ runs for every ROI
+        self.resize = functional.resize
+        self.pad = functional.pad
 
     def __call__(self, img):
         # Original image size
@@ -15,7 +21,7 @@ class ResizeWithPadding:
         new_w, new_h = int(w * scale), int(h * scale)
 
         # Resizes image while maintaining aspect ratio
-        img = transforms.functional.resize(img, (new_h, new_w))
+        img = self.resize(img, (new_h, new_w))
 
         pad_w = self.size - new_w
         pad_h = self.size - new_h
@@ -27,10 +33,12 @@ class ResizeWithPadding:
             pad_h - pad_h // 2
         )
 
-        return transforms.functional.pad(img, padding, fill=self.fill)
+        return self.pad(img, padding, fill=self.fill)
 
 # Transform for inference
 def build_test_transform():
+    from torchvision import transforms
+
     mean = [0.485, 0.456, 0.406]
     std = [0.229, 0.224, 0.225]
 
@@ -40,6 +48,19 @@ def build_test_transform():
         transforms.Normalize(mean, std)
     ])
 
+# Transform for the cascade gate (same normalisation, small input)
+def build_gate_transform(size=64):
+    from torchvision import transforms
+
+    mean = [0.485, 0.456, 0.406]
+    std = [0.229, 0.224, 0.225]
+
+    return transforms.Compose([
+        ResizeWithPadding(size),
+        transforms.ToTensor(),
+        transforms.Normalize(mean, std)
+    ])
+
 def expand_bbox(bbox, frame_shape, scale=1.8):
     """
     Expands bounding box by a scale factor while keeping it inside frame boundaries.
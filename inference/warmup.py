@@ -0,0 +1,80 @@
+import time
+import logging
+
+import numpy as np
+import torch
+
+from inference.detector import model_scores
+
+# PARAMETERS
+# Dummy ROI size, about a possum crop from the 1280x720 stream
+WARMUP_ROI_SHAPE = (180, 240, 3)
+# Passes per batch size: the first one pays allocator and kernel set-up
+WARMUP_PASSES = 2
+
+
+def configure_threads(num_threads=0, interop_threads=0):
+    """
+    Sets torch intra-op and inter-op thread pools (0 = torch default).
+    Must run right after importing torch: the inter-op pool can't be
+    resized once any parallel work has started.
+    """
+    if num_threads:
+        torch.set_num_threads(num_threads)
+
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            logging.warning("Inter-op threads already started, TORCH_INTEROP_THREADS ignored")
+
+    logging.info(f"Torch threads: {torch.get_num_threads()} intra-op, {torch.get_num_interop_threads()} inter-op")
+
+
+def parse_batch_sizes(spec, max_batch=None):
+    """
+    "1,4,8" -> [1, 4, 8], capped at the batch limit of the inference server.
+    """
+    sizes = sorted({int(part) for part in spec.split(",") if part.strip()})
+
+    if max_batch:
+        sizes = [size for size in sizes if size <= max_batch]
+
+    return sizes
+
+
+def warm_up(model, transform, device, batch_sizes, gate=None, passes=WARMUP_PASSES):
+    """
+    Runs the model (and the cascade gate) over dummy batches of the
+    expected sizes so the first real ROIs don't pay for allocator and
+    kernel start-up. Returns (first inference latency, {batch size: latency
+    of the last pass}) in seconds.
+    """
+    rng = np.random.default_rng(0)
+    first = None
+    steady = {}
+
+    for size in batch_sizes:
+        rois = [rng.integers(0, 255, WARMUP_ROI_SHAPE, dtype=np.uint8) for _ in range(size)]
+
+        for _ in range(passes):
+            start = time.perf_counter()
+
+            # Both stages directly: the gate would reject noise before the model sees it
+            if gate is not None:
+                gate.scores(rois)
+            model_scores(rois, model, transform, device)
+
+            elapsed = time.perf_counter() - start
+            if first is None:
+                first = elapsed
+
+        steady[size] = elapsed
+
+    if batch_sizes:
+        logging.info(
+            f"Warm-up: first inference {first * 1000:.0f} ms, then "
+            + ", ".join(f"batch {size} {seconds * 1000:.0f} ms" for size, seconds in steady.items())
+        )
+
+    return first, steady
@@ -3,7 +3,7 @@ import logging
 import os
 from datetime import datetime
 
-def setup_logger():
+def setup_logger(name="possum_run"):
     today = datetime.now().strftime("%Y-%m-%d")
     run_time = datetime.now().strftime("%H-%M-%S")
 
@@ -11,7 +11,8 @@ def setup_logger():
     log_dir = os.path.join("logs", today)
     os.makedirs(log_dir, exist_ok=True)
     # Creates unique log file name for each run
-    log_file = os.path.join(log_dir, f"possum_run_{run_time}.log")
+    # (one per process when several cameras run side by side)
+    log_file = os.path.join(log_dir, f"{name}_{run_time}.log")
 
     logging.basicConfig(
         level=logging.INFO, # Sets minimum logging level to INFO
@@ -1,404 +1,198 @@
-# OpenCV for video stream processing and drawing bounding boxes
-import cv2
-import os
-import time
-# Logging system for debugging and monitoring runtime behaviour
-import logging
-import numpy as np
+# Startup timing report (import time, model load, first inference)
+from startup import StartupTimer
+startup_timer = StartupTimer()
 
+import os
+import argparse
 from datetime import datetime
-# Sliding window implementation for stabilising detection signals
-from collections import deque
-# PyTorch for model inference and device handling
-import torch
 # Project configuration
-from config import RTSP_URL, MODEL_PATH
+from config import RTSP_URL, MODEL_PATH, HEADLESS, PREVIEW_PORT, PREVIEW_FPS, METRICS_PORT, METRICS_LOG_INTERVAL_SEC
+from config import IMAGE_FORMAT, FRAME_QUALITY, ROI_QUALITY, CROP_QUALITY, FRAME_MAX_DIM
+from config import STORAGE_MAX_GB, STORAGE_MIN_FREE_GB, STORAGE_MAX_AGE_DAYS, POSSUM_THRESHOLD
+from config import EARLY_ACCEPT_SCORE, EARLY_REJECT_SCORE
+from config import GATE_MODEL_PATH, GATE_REJECT_SCORE, TORCH_THREADS, TORCH_INTEROP_THREADS, WARMUP_BATCH_SIZES
 # Custom logging setup
 from logger import setup_logger
-# Motion detection module returning Regions of Interest (ROIs) and bounding boxes
-from vision.crops_for_videos import get_crops_from_frame
-# Model loading logic
-from inference.model_loader import load_model
-# Core ML inference logic (possum classification)
-from inference.detector import detect_possums
-# Image preprocessing pipeline used before feeding ROIs into model
-from inference.transforms import build_test_transform, expand_bbox
-# Video capture initialisation with auto-reconnect logic
-from video_utils.video_capture import initialise_video_capture
-# Visit lifecycle management
-from visits.visit_manager import create_new_visit, close_visit, upload_queue
-from hardware.feeder import trigger_feeder
-
-# Initialise project-wide logging
-setup_logger()
+# Stage latency instrumentation
+from metrics import metrics
+# Motion detection stage returning Regions of Interest (ROIs) and bounding boxes
+from vision.crops_for_videos import MotionDetector
+# PyTorch, the model and the inference server are imported in main():
+# --help and the camera processes of multi_feed.py don't load torch
+# Video sources: RTSP camera with auto-reconnect or recorded file
+from video_utils.video_capture import RtspSource, VideoFileSource
+# Optional debug output: MJPEG preview over HTTP
+from video_utils.preview_server import PreviewServer
+# Background image encoding and writing
+from visits.media_writer import MediaWriter
+# Format and quality of saved frames, ROIs and training crops
+from video_utils.image_encoding import build_policy
+# Detection engine; production persistence (MySQL + GCS + feeder) is imported in run_detection():
+# the visit manager opens the DB pool, so importing this module needs no database
+from pipeline.engine import Pipeline, PipelineConfig
+# Local disk quota with eviction of uploaded visits
+from visits.storage_manager import StorageManager
 
 # PARAMETERS
-# Skip frames to reduce computational load and latency
-SKIP_FRAMES = 5                  # Only process every N-th frame
-STATIC_SAVE_INTERVAL_SEC = 10
-# Generate folder per day
-today = datetime.now().strftime("%Y-%m-%d")
-# Directory for storing possum-related media files
-POSSUM_DIR = os.path.join("possum_detected", today)   
-os.makedirs(POSSUM_DIR, exist_ok=True)
-# Select GPU if available, otherwise fallback to CPU
-DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-# Save only every N-th confirmed possum frame 
-FRAME_SAVE_INTERVAL = 2
-
-# ML PREPARATION
-# Transform for inference
-test_transform = build_test_transform()
-# LOAD TRAINED MODEL
-model = load_model(MODEL_PATH, DEVICE)
-             
-# VIDEO CAPTURE INITIALISATION
-USE_VIDEO_FILE = True
-#VIDEO_PATH = "test_video.mp4"
-VIDEO_PATH = r"C:\Users\Home\Desktop\for_git\video_project\possum_detected\2026-02-26\visit_0181\visit.mp4"
-# Opens RTSP camera stream and retrieves FPS
-if USE_VIDEO_FILE:
-    cap = cv2.VideoCapture(VIDEO_PATH)
-    v_fps = cap.get(cv2.CAP_PROP_FPS)
-else:
-    cap, v_fps = initialise_video_capture(RTSP_URL)
-
-
-# PIPELINE STATE VARIABLES
-# Global frame counter
-frame_idx = 0
-# Timer for periodic log
-start_time = time.time()    
-    
-# Stores last N detection results to reduce false positives         
-safe_fps = v_fps if v_fps and v_fps > 0 else 25
-inference_fps = safe_fps / SKIP_FRAMES
-window_size = int(inference_fps * 4)
-
-possum_window = deque(maxlen=5)      
-possum_absence_window = deque(maxlen=20)
-no_motion_window = deque(maxlen=window_size)
-still_window = deque(maxlen=5)
-
-
-# Current possum visit
-current_visit = None  
-
-# MOTION DETECTION PARAMETERS
-PADDING_RATIO = 0.3
-MIN_AREA = 400
-# Kernel used to clean motion masks
-KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (9, 9))
-
-# Background subtractor used to detect moving objects
-BG_SUBTRACTOR = cv2.createBackgroundSubtractorMOG2(
-    history=500,
-    varThreshold=25,
-    detectShadows=False
-)
-
-# MAIN VIDEO PROCESSING LOOP
-while True:
-    # Read frame from camera stream
-    ret, frame = cap.read()
-    frame_timestamp = datetime.now()
-
-    # Camera reconnect logic
-    if not ret:
-        if USE_VIDEO_FILE:
-            logging.info("Video ended.")
-            if current_visit is not None:
-                logging.info("Closing active visit before exit.")
-                close_visit(current_visit, v_fps)
-
-            break
-            
-        else:
-
-            logging.info("Frame not received. Reconnecting...")
-
-            try:
-                cap.release()
-            except:
-                pass
-            # Wait before reconnect attempt
-            time.sleep(2)
-            cap, v_fps = initialise_video_capture(RTSP_URL)
-
-            continue
-
-    # Frame integrity checks (protect pipeline from corrupted frames)
-    if frame is None:
-        logging.warning("Frame is None")
-        time.sleep(1)
-        continue
-
-    if not isinstance(frame, np.ndarray):
-        logging.warning("Frame is not ndarray")
-        time.sleep(1)
-        continue
-
-
-    if frame.size == 0:
-        logging.warning("Frame is empty")
-        time.sleep(1)
-        continue
-
-    # # Visit timeout logic
-    # if current_visit is not None:
-    #     if (datetime.now() - current_visit["last_seen_time"]).total_seconds() > VISIT_TIMEOUT:
-
-    #         # Close visit session and trigger upload asynchronously
-    #         close_visit(current_visit, v_fps)
- 
-    #         current_visit = None
-    #         possum_window.clear()
-
-    # Save raw video if visit is active
-    if current_visit is not None and current_visit["video_writer"] is not None:
-        current_visit["video_writer"].write(frame)   
-        #current_visit["frame_timestamps"].append(frame_idx)
-
-
-    # Only process every SKIP_FRAMES-th frame
-    if frame_idx % SKIP_FRAMES == 0:
-        # Motion detection: get ROIs and bounding boxes
-        rois, bboxes = get_crops_from_frame(frame, bg_subtractor=BG_SUBTRACTOR, min_area=MIN_AREA, padding_ratio=PADDING_RATIO, kernel=KERNEL)
-
-        if len(rois) > 0:
-            no_motion_window.clear()
-            still_window.clear()
-        #  Initialize flag for possum detection in this frame
-        # ML inference block
-        try:
-            # Run CNN classification on ROIs
-            possum_detected_in_frame, possum_rois_in_frame, possum_bboxes_in_frame, possum_indices = detect_possums(
-                rois,
-                bboxes,
-                model,
-                test_transform,
-                DEVICE
-            )
-        except Exception:
-            # Fault-tolerance: prevents full pipeline crash if ML inference fails
-            logging.exception("Inference failed")
-            frame_idx += 1
-            # Assume no possum detected
-            possum_window.append(False)
-            possum_absence_window.append(False)
-            continue
-        # Draw bounding boxes on frame
-        display_frame = frame.copy()
-
-        for i, bbox in enumerate(bboxes):
-            x1, y1, x2, y2 = bbox
-            # Green = possum, Red = other motion
-            color = (0, 255, 0) if i in possum_indices else (0, 0, 255)
-            cv2.rectangle(display_frame, (x1, y1), (x2, y2), color, 2)
-
-        cv2.imshow("Video Feed", display_frame)
-
-
-        # Save possum ROIs in separate folder
-        if possum_detected_in_frame:
-
-            for roi_num, roi in enumerate(possum_rois_in_frame):
-                # Add timestamp to filename
-                timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-                roi_path = os.path.join(POSSUM_DIR, f"roi_{frame_idx:06d}_{roi_num:03d}_{timestamp_str}.jpg")
-                cv2.imwrite(roi_path, roi)
-
-            
-        # Update sliding window
-        possum_window.append(possum_detected_in_frame)
-        if len(rois) > 0:
-            possum_absence_window.append(possum_detected_in_frame)
-
-        if current_visit is not None:
-            if len(possum_absence_window) == 20 and sum(possum_absence_window) == 0:
-                logging.info("Closing visit (model negative for 15 inference frames)")
-                close_visit(current_visit, v_fps)
-                current_visit = None
-
-                possum_window.clear()
-                possum_absence_window.clear()
-                no_motion_window.clear()
-                still_window.clear()
-
-                continue
-
-         # NEW: Handle no-motion but active visit ---
-        if current_visit is not None and len(rois) == 0:
-
-            if current_visit.get("last_bbox") is not None:
-
-                expanded_bbox = expand_bbox(
-                    current_visit["last_bbox"],
-                    frame.shape,
-                    scale=1.5
-                )
-
-                x1, y1, x2, y2 = expanded_bbox
-
-                roi = frame[y1:y2, x1:x2]
-
-                if roi.size > 0:
-                    try:
-                        possum_detected, _, _, _ = detect_possums(
-                            [roi],
-                            [(x1, y1, x2, y2)],
-                            model,
-                            test_transform,
-                            DEVICE
-                        )
-
-                        no_motion_window.append(possum_detected)
-                        still_window.append(possum_detected)
-                        possum_absence_window.append(possum_detected)
-
-                    except Exception:
-                        logging.exception("Inference failed in no-motion mode")
-                        no_motion_window.append(False)
-                        still_window.append(False)
-
-                else:
-                    no_motion_window.append(False)
-                    still_window.append(False)
-
-                # Continue visit if still enough positives
-                if len(still_window) == 5 and sum(still_window) >= 3:
-                    logging.info("No motion but possum still detected - continuing visit")
-                    # Still possum - continue visit
-                    current_visit["last_seen_time"] = frame_timestamp
-                    current_visit["last_seen_frame"] = frame_idx
-
-
-                    # Save frame periodically
-                    #if frame_idx % FRAME_SAVE_INTERVAL == 0:
-                    now = frame_timestamp
-
-                    last_saved = current_visit.get("last_static_saved_time")
-
-                    should_save_static = (
-                        last_saved is None or
-                        (now - last_saved).total_seconds() >= STATIC_SAVE_INTERVAL_SEC
-                    )
-
-                    if should_save_static:    
-
-                        frame_path = os.path.join(
-                            current_visit["frames_dir"],
-                            f"frame_{frame_idx:06d}.jpg"
-                        )
-
-                        cv2.imwrite(frame_path, frame)
-
-                        current_visit["frame_upload_queue"].append(
-                            (frame_path, frame_timestamp)
-                        )
-
-                        # Save ROI
-                        roi_path = os.path.join(
-                            current_visit["rois_dir"],
-                            f"roi_{frame_idx:06d}_static.jpg"
-                        )
-
-                        cv2.imwrite(roi_path, roi)
-
-                        current_visit["roi_upload_queue"].append(
-                            (roi_path, (x1, y1, x2, y2), frame_path, frame_timestamp)
-                        )
-
-                        current_visit["last_static_saved_time"] = now
-
-                # Close visit only if strong negative evidence
-                elif len(no_motion_window) == window_size and sum(no_motion_window) == 0:
-                    # elif sum(no_motion_window) == 0:
-                    logging.info("Closing visit (no motion + no possum confirmed)")
-                    close_visit(current_visit, v_fps)
-                    current_visit = None
-                    no_motion_window.clear()
-                    still_window.clear()
-
-        # Check if 3 out of 5 last frames have possum
-        if len(possum_window) == 5 and sum(possum_window) >= 3:
-            logging.info(f"POSSUM DETECTED at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            # Update existing visit timestamp
-            #now_time = datetime.now()
-
-            if current_visit is not None and possum_detected_in_frame:
-                #current_visit["last_seen_time"] = now_time
-                current_visit["last_seen_time"] = frame_timestamp
-                current_visit["last_seen_frame"] = frame_idx
-                if possum_detected_in_frame and len(possum_bboxes_in_frame) > 0:
-                    current_visit["last_bbox"] = possum_bboxes_in_frame[0]
-
-            # Create new visit if none active
-            if current_visit is None:
-                current_visit = create_new_visit(frame, POSSUM_DIR, frame_idx, v_fps)
-                trigger_feeder()
-                no_motion_window.clear()
-                possum_absence_window.clear()
-                current_visit["last_static_saved_time"] = None
-                if possum_detected_in_frame and len(possum_bboxes_in_frame) > 0:
-                    current_visit["last_bbox"] = possum_bboxes_in_frame[0]
-           
-
-            # Save visit frames and ROIs
-            if frame_idx % FRAME_SAVE_INTERVAL == 0 and possum_detected_in_frame:
-                #current_visit["last_seen_time"] = now_time
-                current_visit["last_seen_time"] = frame_timestamp
-                current_visit["last_seen_frame"] = frame_idx
-                
-
-                frame_path = os.path.join(current_visit["frames_dir"], f"frame_{frame_idx:06d}.jpg")
-                cv2.imwrite(frame_path, frame)
-                visit_id = current_visit["visit_id"]
-                current_visit["frame_upload_queue"].append(
-
-                    #(frame_path, now_time)
-                    (frame_path, frame_timestamp)
-                )
- 
-                for roi_num, roi in enumerate(possum_rois_in_frame):
-
-                    roi_path = os.path.join(
-                        current_visit["rois_dir"],
-                        f"roi_{frame_idx:06d}_{roi_num:03d}.jpg"
-                    )
-
-                    cv2.imwrite(roi_path, roi)
-
-
-                    current_visit["roi_upload_queue"].append(
-                        #(roi_path, possum_bboxes_in_frame[roi_num], frame_path, now_time)
-                        (roi_path, possum_bboxes_in_frame[roi_num], frame_path, frame_timestamp)
-                    )
-
-    frame_idx += 1
-
-    # Periodic logging every 60 seconds if no possum
-    if time.time() - start_time > 60:
-        if not any(possum_window):
-            now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            logging.info(f"[{now_str}] 1 minute passed, processing continues. No possums detected so far.")
-        start_time = time.time()
-
-    # Manual exit handler
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        logging.info("Exiting by user request.")
-        break
-
-# CLEANUP
-if USE_VIDEO_FILE:
-    logging.info("Waiting for uploads to finish (video mode)...")
-    upload_queue.join()
-    logging.info("All uploads completed.")
-
-cap.release()
-cv2.destroyAllWindows()
-logging.info("Video feed processing stopped, all resources released.")
-
-
-
-
+# Root of the local media folders (one subfolder per day)
+POSSUM_ROOT = "possum_detected"
+# Background image writer
+MEDIA_WRITER_WORKERS = 2
+MEDIA_WRITER_QUEUE_SIZE = 64
+# Inference micro-batching: ROIs per forward pass and longest wait for more requests
+INFERENCE_MAX_BATCH = 32
+INFERENCE_MAX_WAIT_MS = 5
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Real-time possum detection")
+    parser.add_argument("--video", help="Process a recorded video file instead of the RTSP stream")
+    parser.add_argument("--gui", action="store_true", help="Show detections in an OpenCV window")
+    parser.add_argument("--preview-port", type=int, default=PREVIEW_PORT, help="Serve MJPEG debug preview on this port (0 = off)")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT, help="Serve /metrics on this port (0 = off)")
+    return parser.parse_args()
+
+
+def run_detection(source, classifier, possum_root=POSSUM_ROOT, camera_id="main", headless=HEADLESS,
+                  preview_port=0, metrics_port=0, storage_max_bytes=STORAGE_MAX_GB * 1e9, startup=None):
+    """
+    Runs the detection pipeline of one camera until the source ends.
+    Used by main() and by the camera processes of multi_feed.py.
+    The startup timer, if given, is reported just before the first frame.
+    """
+    # Generate folder per day
+    today = datetime.now().strftime("%Y-%m-%d")
+    # Directory for storing possum-related media files
+    possum_dir = os.path.join(possum_root, today)
+    os.makedirs(possum_dir, exist_ok=True)
+
+    # METRICS
+    # Disabled metrics cost nothing: timers become a shared no-op context
+    if metrics_port:
+        metrics.enable(log_interval_sec=METRICS_LOG_INTERVAL_SEC)
+        metrics.start_server(metrics_port)
+
+    # Writes frames and ROIs off the capture thread
+    media_writer = MediaWriter(workers=MEDIA_WRITER_WORKERS, max_queue=MEDIA_WRITER_QUEUE_SIZE)
+    metrics.register_gauge("media_writer_queue_depth", media_writer.queue_depth)
+
+    # Keeps the media folder within its quota, only uploaded visits are deleted
+    storage = StorageManager(
+        possum_root,
+        max_bytes=storage_max_bytes,
+        max_age_days=STORAGE_MAX_AGE_DAYS,
+        min_free_bytes=STORAGE_MIN_FREE_GB * 1e9
+    )
+    storage.start()
+    metrics.register_gauge("storage_used_bytes", lambda: storage.used_bytes)
+    metrics.register_gauge("storage_unuploaded_bytes", lambda: storage.unuploaded_bytes)
+
+    # MySQL pool on import, upload threads with the first sink
+    from pipeline.live_sink import LiveVisitSink
+    from visits.visit_manager import upload_queue
+
+    # In video mode wait for uploads before exit
+    encoding = build_policy(IMAGE_FORMAT, FRAME_QUALITY, ROI_QUALITY, CROP_QUALITY, FRAME_MAX_DIM)
+    sink = LiveVisitSink(
+        possum_dir,
+        media_writer,
+        wait_for_uploads=not source.is_live,
+        encoding=encoding,
+        camera_id=camera_id
+    )
+    metrics.register_gauge("upload_queue_depth", upload_queue.qsize)
+    metrics.register_gauge("deferred_video_uploads", sink.video_scheduler.queue_depth)
+    metrics.register_gauge("media_upload_retries", sink.media_retries.queue_depth)
+
+    # DEBUG PREVIEW
+    # In headless mode nothing is drawn unless a preview client is connected
+    preview = PreviewServer(preview_port, max_fps=PREVIEW_FPS) if preview_port else None
+
+    config = PipelineConfig(
+        headless=headless,
+        early_accept_score=EARLY_ACCEPT_SCORE,
+        early_reject_score=EARLY_REJECT_SCORE
+    )
+
+    pipeline = Pipeline(config, source, MotionDetector(), classifier, sink, preview)
+
+    if startup is not None:
+        startup.mark("pipeline_setup")
+        startup.report()
+
+    return pipeline.run()
+
+
+def main():
+    args = parse_args()
+
+    if not args.video and not RTSP_URL:
+        raise SystemExit("RTSP_URL is not set (or pass --video)")
+
+    # Initialise project-wide logging
+    setup_logger()
+    startup_timer.mark("imports")
+
+    # PyTorch for model inference and device handling
+    import torch
+    # Model loading logic
+    from inference.model_loader import load_model
+    # Core ML inference logic (possum classification)
+    from inference.detector import PossumClassifier, load_gate
+    # Micro-batches ROIs of all classify calls into shared forward passes
+    from inference.batching import InferenceServer
+    # Image preprocessing pipeline used before feeding ROIs into model
+    from inference.transforms import build_test_transform
+    # Thread pools and warm-up passes
+    from inference.warmup import configure_threads, parse_batch_sizes, warm_up
+
+    # Before any inference: the inter-op pool can't be resized later
+    configure_threads(TORCH_THREADS, TORCH_INTEROP_THREADS)
+    startup_timer.mark("torch_import")
+
+    # Select GPU if available, otherwise fallback to CPU
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    # ML PREPARATION
+    # LOAD TRAINED MODEL
+    model = load_model(MODEL_PATH, device)
+    transform = build_test_transform()
+    # Optional tiny CNN in front of the model (GATE_MODEL_PATH)
+    gate = load_gate(GATE_MODEL_PATH, device, GATE_REJECT_SCORE)
+    startup_timer.mark("model_load")
+
+    # First real ROIs (often right after a crash restart) get steady-state latency
+    first, _ = warm_up(model, transform, device, parse_batch_sizes(WARMUP_BATCH_SIZES, INFERENCE_MAX_BATCH), gate)
+    if first is not None:
+        startup_timer.record("first_inference", first)
+    startup_timer.mark("warm_up")
+
+    # Both the motion path and the no-motion re-check go through the server
+    server = InferenceServer(
+        model,
+        transform,
+        device,
+        max_batch=INFERENCE_MAX_BATCH,
+        max_wait_ms=INFERENCE_MAX_WAIT_MS,
+        gate=gate
+    )
+    classifier = PossumClassifier(model, transform, device, server, threshold=POSSUM_THRESHOLD)
+
+    # VIDEO CAPTURE INITIALISATION
+    if args.video:
+        source = VideoFileSource(args.video)
+    else:
+        source = RtspSource(RTSP_URL)
+
+    run_detection(
+        source,
+        classifier,
+        headless=HEADLESS and not args.gui,
+        preview_port=args.preview_port,
+        metrics_port=args.metrics_port,
+        startup=startup_timer
+    )
+
+
+if __name__ == "__main__":
+    main()
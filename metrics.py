@@ -0,0 +1,217 @@
+# Lightweight runtime metrics: stage latencies, counters and queue depths
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Shared no-op context returned by timer() when metrics are disabled
+NULL_TIMER = nullcontext()
+
+QUANTILES = (0.5, 0.95, 0.99)
+# Histograms holding counts instead of seconds
+VALUE_HISTOGRAMS = {"rois_per_frame", "batch_size", "gate_batch_size", "inference_requests_per_batch"}
+
+
+class RollingHistogram:
+    """
+    Keeps the last `size` observations for percentiles plus total count and sum.
+    """
+
+    def __init__(self, size=2048):
+        self.values = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.values.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentiles(self, quantiles=QUANTILES):
+        values = sorted(self.values)
+        if not values:
+            return {q: None for q in quantiles}
+
+        return {
+            q: values[min(len(values) - 1, int(q * len(values)))]
+            for q in quantiles
+        }
+
+
+class Metrics:
+    """
+    Registry of stage timings (seconds), value distributions, counters and gauges.
+
+    Disabled by default: timer() then returns a shared no-op context and
+    observe()/inc() return immediately.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}
+        self.counters = {}
+        # Gauges are callables evaluated when metrics are rendered (e.g. queue sizes)
+        self.gauges = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+    def enable(self, log_interval_sec=60):
+        self.enabled = True
+
+        if log_interval_sec:
+            threading.Thread(
+                target=self._log_loop,
+                args=(log_interval_sec,),
+                daemon=True
+            ).start()
+
+    def timer(self, name):
+        """
+        Context manager measuring the duration of a stage.
+        """
+        if not self.enabled:
+            return NULL_TIMER
+        return self._timer(name)
+
+    @contextmanager
+    def _timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name, value):
+        if not self.enabled:
+            return
+
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = RollingHistogram()
+            histogram.observe(value)
+
+    def inc(self, name, amount=1):
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def register_gauge(self, name, func):
+        self.gauges[name] = func
+
+    def snapshot(self):
+        """
+        Returns current percentiles, counters and gauges as a dict.
+        """
+        with self.lock:
+            histograms = {
+                name: {
+                    "count": h.count,
+                    "sum": h.total,
+                    "percentiles": h.percentiles()
+                }
+                for name, h in self.histograms.items()
+            }
+            counters = dict(self.counters)
+
+        gauges = {}
+        for name, func in self.gauges.items():
+            try:
+                gauges[name] = func()
+            except Exception:
+                gauges[name] = None
+
+        return {"histograms": histograms, "counters": counters, "gauges": gauges}
+
+    def render_prometheus(self):
+        """
+        Renders metrics in Prometheus text exposition format.
+        Histograms are exposed as summaries with p50/p95/p99 quantiles.
+        """
+        data = self.snapshot()
+        lines = ["# TYPE possum_stage summary"]
+
+        for name, h in sorted(data["histograms"].items()):
+            for q, value in h["percentiles"].items():
+                if value is not None:
+                    lines.append(f'possum_stage{{name="{name}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'possum_stage_count{{name="{name}"}} {h["count"]}')
+            lines.append(f'possum_stage_sum{{name="{name}"}} {h["sum"]:.6f}')
+
+        for name, value in sorted(data["counters"].items()):
+            lines.append(f"# TYPE possum_{name}_total counter")
+            lines.append(f"possum_{name}_total {value}")
+
+        for name, value in sorted(data["gauges"].items()):
+            if value is not None:
+                lines.append(f"# TYPE possum_{name} gauge")
+                lines.append(f"possum_{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def start_server(self, port, host="127.0.0.1"):
+        """
+        Serves /metrics on a local HTTP port.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = registry.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        logging.info(f"Metrics available at http://{host}:{port}/metrics")
+
+    def log_summary(self):
+        data = self.snapshot()
+
+        stages = []
+        for name, h in sorted(data["histograms"].items()):
+            p = h["percentiles"]
+            if p[0.5] is None:
+                continue
+
+            if name in VALUE_HISTOGRAMS:
+                stages.append(f"{name} p50={p[0.5]:.1f} p95={p[0.95]:.1f} p99={p[0.99]:.1f} n={h['count']}")
+            else:
+                stages.append(
+                    f"{name} p50={p[0.5] * 1000:.1f}ms p95={p[0.95] * 1000:.1f}ms "
+                    f"p99={p[0.99] * 1000:.1f}ms n={h['count']}"
+                )
+
+        logging.info("Metrics | " + " | ".join(stages))
+
+        if data["counters"] or data["gauges"]:
+            values = {**data["counters"], **data["gauges"]}
+            logging.info("Metrics | " + ", ".join(f"{k}={v}" for k, v in sorted(values.items())))
+
+    def _log_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.log_summary()
+            except Exception:
+                logging.exception("Metrics summary failed")
+
+
+# Project-wide registry
+metrics = Metrics()
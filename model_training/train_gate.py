@@ -0,0 +1,220 @@
+import os
+import sys
+import copy
+import json
+import argparse
+
+import numpy as np
+import torch
+import torch.nn.functional as Fun
+import torch.optim as optim
+from torch.optim import lr_scheduler
+from torch.utils.data import DataLoader
+from torchvision import datasets, transforms
+
+# Run from the project root or from model_training/ like the notebook
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config import MODEL_PATH, BASE_DIR
+from inference.model_loader import load_model, GateNet
+from inference.transforms import ResizeWithPadding, build_gate_transform
+from inference.detector import POSSUM_CLASS
+
+# PARAMETERS
+GATE_PATH = os.path.join(BASE_DIR, "models", "gate_weight.pt")
+# Weight of the hard labels against the teacher's soft targets, and softmax temperature
+ALPHA = 0.5
+TEMPERATURE = 3.0
+# Share of possums the gate may reject on the validation set
+MIN_RECALL = 0.995
+REJECT_SCORES = [0.01, 0.02, 0.03, 0.05, 0.08, 0.1, 0.15, 0.2, 0.3]
+
+mean = [0.485, 0.456, 0.406]
+std = [0.229, 0.224, 0.225]
+
+
+class StudentTeacherTransform:
+    """
+    Same augmentation as the notebook, applied once to the image, then
+    returns (gate input 64x64, ResNet input 224x224) of the same crop.
+    """
+
+    def __init__(self, train, gate_size=64):
+        augment = [
+            transforms.RandomHorizontalFlip(p=0.3),
+            transforms.RandomApply([
+                transforms.ColorJitter(brightness=0.2, contrast=0.2)
+            ], p=0.3)
+        ] if train else []
+
+        self.augment = transforms.Compose(augment)
+        self.student = build_gate_transform(gate_size)
+        self.teacher = transforms.Compose([
+            ResizeWithPadding(224),
+            transforms.ToTensor(),
+            transforms.Normalize(mean, std)
+        ])
+
+    def __call__(self, img):
+        img = self.augment(img)
+        return self.student(img), self.teacher(img)
+
+
+def distillation_loss(student_logits, teacher_logits, labels, alpha=ALPHA, temperature=TEMPERATURE):
+    """
+    Cross-entropy on the labels plus KL divergence to the teacher's softened output.
+    """
+    hard = Fun.cross_entropy(student_logits, labels)
+    soft = Fun.kl_div(
+        Fun.log_softmax(student_logits / temperature, dim=1),
+        Fun.softmax(teacher_logits / temperature, dim=1),
+        reduction="batchmean"
+    ) * temperature ** 2
+
+    return alpha * hard + (1 - alpha) * soft
+
+
+def phase_train(student, teacher, loader, optimizer, device):
+    student.train()
+    running_loss = 0.0
+
+    for (gate_inputs, teacher_inputs), labels in loader:
+        gate_inputs = gate_inputs.to(device)
+        labels = labels.to(device)
+
+        with torch.no_grad():
+            teacher_logits = teacher(teacher_inputs.to(device))
+
+        optimizer.zero_grad()
+        loss = distillation_loss(student(gate_inputs), teacher_logits, labels)
+        loss.backward()
+        optimizer.step()
+
+        running_loss += loss.item() * gate_inputs.size(0)
+
+    return running_loss / len(loader.dataset)
+
+
+def collect_gate_scores(student, teacher, loader, device):
+    """
+    Gate and teacher possum probabilities plus labels of a whole split.
+    """
+    student.eval()
+    gate_scores, teacher_scores, labels = [], [], []
+
+    with torch.no_grad():
+        for (gate_inputs, teacher_inputs), targets in loader:
+            gate_scores.extend(torch.softmax(student(gate_inputs.to(device)), dim=1)[:, POSSUM_CLASS].cpu().tolist())
+            teacher_scores.extend(torch.softmax(teacher(teacher_inputs.to(device)), dim=1)[:, POSSUM_CLASS].cpu().tolist())
+            labels.extend((targets == POSSUM_CLASS).tolist())
+
+    return np.array(gate_scores), np.array(teacher_scores), np.array(labels, dtype=bool)
+
+
+def choose_reject_score(gate_scores, labels, min_recall=MIN_RECALL, candidates=REJECT_SCORES):
+    """
+    Largest reject score whose rejected ROIs keep `min_recall` of the possums,
+    with the share of ROIs it saves from the ResNet.
+    """
+    possums = max(int(labels.sum()), 1)
+    best = None
+
+    for reject_score in candidates:
+        rejected = gate_scores < reject_score
+        recall = 1 - np.sum(rejected & labels) / possums
+
+        row = {"reject_score": reject_score, "recall": round(float(recall), 4),
+               "rejected": round(float(np.mean(rejected)), 4)}
+
+        if recall >= min_recall:
+            best = row
+
+    return best
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Distil the ResNet-18 into the cascade gate")
+    parser.add_argument("--data", default="crops/choice", help="Folder with train/validation/test (ImageFolder layout)")
+    parser.add_argument("--teacher", default=MODEL_PATH)
+    parser.add_argument("--output", default=GATE_PATH)
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--patience", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--min-recall", type=float, default=MIN_RECALL)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    images = {
+        "train": datasets.ImageFolder(os.path.join(args.data, "train"), StudentTeacherTransform(train=True)),
+        "val": datasets.ImageFolder(os.path.join(args.data, "validation"), StudentTeacherTransform(train=False))
+    }
+    dataloaders = {
+        "train": DataLoader(images["train"], batch_size=args.batch_size, shuffle=True, num_workers=2),
+        "val": DataLoader(images["val"], batch_size=args.batch_size, num_workers=2)
+    }
+    print(f"Training data size - {len(images['train'])}, validation data size - {len(images['val'])}")
+
+    teacher = load_model(args.teacher, device)
+    student = GateNet().to(device)
+
+    optimizer = optim.Adam(student.parameters(), lr=1e-3)
+    scheduler = lr_scheduler.StepLR(optimizer, step_size=10, gamma=0.1)
+
+    best_model_wts = copy.deepcopy(student.state_dict())
+    best_loss = float("inf")
+    early_stop_counter = 0
+
+    for epoch in range(args.epochs):
+        train_loss = phase_train(student, teacher, dataloaders["train"], optimizer, device)
+
+        # Validation loss against labels only: that is what the gate is judged on
+        gate_scores, _, labels = collect_gate_scores(student, teacher, dataloaders["val"], device)
+        val_loss = float(np.mean(-np.log(np.clip(np.where(labels, gate_scores, 1 - gate_scores), 1e-7, 1))))
+
+        print(f"Epoch {epoch + 1}/{args.epochs} train loss {train_loss:.4f} val loss {val_loss:.4f}")
+
+        if val_loss < best_loss:
+            best_loss = val_loss
+            best_model_wts = copy.deepcopy(student.state_dict())
+            early_stop_counter = 0
+        else:
+            early_stop_counter += 1
+            if early_stop_counter >= args.patience:
+                print("Early stopping triggered")
+                break
+
+        scheduler.step()
+
+    student.load_state_dict(best_model_wts)
+
+    gate_scores, teacher_scores, labels = collect_gate_scores(student, teacher, dataloaders["val"], device)
+    best = choose_reject_score(gate_scores, labels, args.min_recall)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    torch.save(student.state_dict(), args.output)
+
+    if best is None:
+        print(f"No reject score keeps recall {args.min_recall}; the gate should not be enabled")
+    else:
+        print(
+            f"Suggested GATE_REJECT_SCORE={best['reject_score']} "
+            f"(rejects {best['rejected']:.1%} of validation ROIs, gate recall {best['recall']})"
+        )
+
+    with open(os.path.splitext(args.output)[0] + ".json", "w") as f:
+        json.dump({
+            "classes": images["train"].classes,
+            "validation_loss": best_loss,
+            "suggested": best,
+            "teacher_agreement": round(float(np.mean((gate_scores >= 0.5) == (teacher_scores >= 0.5))), 4)
+        }, f, indent=2)
+
+    print(f"Saved gate weights to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import os
+import time
+import logging
+import argparse
+import multiprocessing as mp
+# Project configuration (light imports only: this module is re-imported by every child process)
+from config import CAMERAS, RTSP_URL, MODEL_PATH, CPU_BUDGET, METRICS_PORT, STORAGE_MAX_GB
+from config import GATE_MODEL_PATH, GATE_REJECT_SCORE
+# Custom logging setup
+from logger import setup_logger
+
+# PARAMETERS
+# Shared inference worker: ROIs of all cameras arriving within the wait are classified together
+MAX_BATCH = 32
+MAX_WAIT_MS = 10
+# Supervisor checks its processes and restarts dead ones
+SUPERVISE_INTERVAL_SEC = 5
+RESTART_DELAY_SEC = 10
+
+
+def parse_cameras(spec):
+    """
+    "main=rtsp://a,fence2=rtsp://b" -> {"main": "rtsp://a", "fence2": "rtsp://b"}
+    """
+    cameras = {}
+
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        camera_id, url = part.split("=", 1)
+        cameras[camera_id.strip()] = url.strip()
+
+    return cameras
+
+
+def inference_process(weights_path, request_queue, response_queues, max_batch, max_wait_sec, threads,
+                      gate_path, gate_reject_score):
+    setup_logger("possum_inference")
+
+    from inference.shared_worker import inference_worker
+    inference_worker(
+        weights_path, request_queue, response_queues, max_batch, max_wait_sec, threads, gate_path, gate_reject_score
+    )
+
+
+def camera_process(camera_id, url, request_queue, response_queue, metrics_port, storage_max_bytes):
+    """
+    Capture, motion detection, visit state and uploads of one camera.
+    CAMERA_ID is set in the environment by the supervisor, so config gives
+    this process its own upload state files.
+    """
+    setup_logger(f"possum_{camera_id}")
+
+    from startup import StartupTimer
+    startup = StartupTimer()
+
+    import cv2
+    # Motion detection of one stream needs about one core, the rest is left to inference
+    cv2.setNumThreads(1)
+
+    # Imported here: config reads the camera's environment, the supervisor
+    # itself needs neither OpenCV nor the pipeline
+    from config import STATE_SUFFIX, POSSUM_THRESHOLD
+    from main_feed import run_detection, POSSUM_ROOT
+    from video_utils.video_capture import RtspSource
+    from inference.shared_worker import RemoteClassifier
+
+    logging.info(f"Camera {camera_id} started")
+    startup.mark("imports")
+
+    run_detection(
+        RtspSource(url),
+        RemoteClassifier(camera_id, request_queue, response_queue, threshold=POSSUM_THRESHOLD),
+        possum_root=POSSUM_ROOT + STATE_SUFFIX,
+        camera_id=camera_id,
+        metrics_port=metrics_port,
+        storage_max_bytes=storage_max_bytes,
+        startup=startup
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Possum detection on several cameras with a shared model")
+    parser.add_argument("--cpu-budget", type=int, default=CPU_BUDGET, help="Cores for cameras and inference together")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="First /metrics port, camera i uses port + i (0 = off)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    setup_logger("possum_supervisor")
+
+    cameras = parse_cameras(CAMERAS) or {"main": RTSP_URL}
+    if not all(cameras.values()):
+        raise SystemExit("No camera configured, set CAMERAS or RTSP_URL")
+
+    # spawn: children must not inherit torch/OpenCV thread pools or DB connections
+    ctx = mp.get_context("spawn")
+
+    request_queue = ctx.Queue()
+    response_queues = {camera_id: ctx.Queue() for camera_id in cameras}
+
+    # One core per camera for capture and motion, the rest for the model
+    inference_threads = max(1, args.cpu_budget - len(cameras))
+
+    def start_inference():
+        process = ctx.Process(
+            target=inference_process,
+            args=(
+                MODEL_PATH,
+                request_queue,
+                response_queues,
+                args.max_batch,
+                args.max_wait_ms / 1000,
+                inference_threads,
+                GATE_MODEL_PATH,
+                GATE_REJECT_SCORE
+            ),
+            name="inference",
+            daemon=True
+        )
+        process.start()
+        return process
+
+    def start_camera(index, camera_id):
+        # Inherited by the spawned process before it imports config
+        os.environ["CAMERA_ID"] = camera_id
+
+        process = ctx.Process(
+            target=camera_process,
+            args=(
+                camera_id,
+                cameras[camera_id],
+                request_queue,
+                response_queues[camera_id],
+                args.metrics_port + index if args.metrics_port else 0,
+                # Local storage quota is shared equally
+                STORAGE_MAX_GB * 1e9 / len(cameras)
+            ),
+            name=f"camera_{camera_id}",
+            daemon=True
+        )
+        process.start()
+        return process
+
+    logging.info(f"Starting {len(cameras)} cameras ({', '.join(cameras)}), inference with {inference_threads} threads")
+
+    processes = {"inference": start_inference()}
+    for index, camera_id in enumerate(cameras):
+        processes[camera_id] = start_camera(index, camera_id)
+
+    try:
+        while True:
+            time.sleep(SUPERVISE_INTERVAL_SEC)
+
+            for name, process in list(processes.items()):
+                if process.is_alive():
+                    continue
+
+                logging.warning(f"Process {process.name} exited with code {process.exitcode}, restarting")
+                time.sleep(RESTART_DELAY_SEC)
+
+                if name == "inference":
+                    processes[name] = start_inference()
+                else:
+                    processes[name] = start_camera(list(cameras).index(name), name)
+
+    except KeyboardInterrupt:
+        logging.info("Stopping cameras and inference worker")
+
+    finally:
+        for name, process in processes.items():
+            if name != "inference":
+                process.terminate()
+
+        request_queue.put(None)
+
+        for process in processes.values():
+            process.join(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,515 @@
+import cv2
+import time
+import logging
+import numpy as np
+from dataclasses import dataclass
+from datetime import datetime
+
+# Sliding windows defined in seconds of stream time
+from visits.sliding_window import SlidingTimeWindow
+# Adaptive choice of frames to process depending on activity and processing time
+from video_utils.frame_sampler import AdaptiveFrameSampler
+# Bounding box drawing for GUI window / MJPEG preview
+from video_utils.preview_server import draw_detections
+# Bounding box expansion used for the no-motion re-check
+from inference.transforms import expand_bbox
+# Perceptual hashes to skip near-identical saves of a sitting possum
+from visits.image_dedup import dhash, RecentImageHashes
+# Stage latencies and counters
+from metrics import metrics
+
+
+@dataclass
+class PipelineConfig:
+    # Frame sampling: process every N-th frame, N adapts to activity and processing time
+    base_skip: int = 5                  # Default step (5 fps on a 25 fps stream)
+    active_skip: int = 1                # Step while motion or a visit is active
+    idle_skip: int = 12                 # Step after a quiet period
+    max_skip: int = 25                  # Upper bound when processing is too slow
+    idle_after_sec: float = 10          # Seconds without motion before switching to idle step
+
+    # Sliding windows (seconds of stream time)
+    possum_window_sec: float = 1.0      # Window for visit confirmation
+    possum_confirm_ratio: float = 0.6   # Time share of positive samples to confirm a possum (3 of 5)
+    absence_window_sec: float = 4.0     # Negative evidence required to close a visit
+    no_motion_window_sec: float = 4.0   # No-motion negative evidence required to close a visit
+    still_window_sec: float = 1.0       # Window for static possum re-check
+    still_confirm_ratio: float = 0.6
+    # Expansion of the last possum bbox for the no-motion re-check
+    still_bbox_scale: float = 1.5
+
+    # Confidence short-circuits on the possum probability of the best ROI (score 0 = disabled).
+    # Off by default: enable only with scores calibrated for the model (inference/calibrate_threshold.py)
+    early_accept_score: float = 0       # This many confident samples confirm a visit
+    early_accept_samples: int = 2       # before the possum window is full
+    early_reject_score: float = 0       # Samples with all ROIs below this are strong negatives,
+    early_reject_sec: float = 2.0       # strong negatives for this long close a visit early
+
+    # Saving
+    frame_save_interval_sec: float = 0.4    # Minimum time between saved confirmed possum frames
+    static_save_interval_sec: float = 10    # Minimum time between saved static possum frames
+    # Near-duplicate saves are skipped: ROI dHash within this many bits (of 64)
+    # of one of the last dedup_history saved ROIs of the visit (-1 = disabled)
+    dedup_max_distance: int = 5
+    dedup_history: int = 8
+    max_saved_frames_per_visit: int = 300   # Cap on saved frames per visit (0 = unlimited)
+
+    # Display
+    headless: bool = True               # No drawing, no GUI window
+    # Live stream: increase sampling step when processing falls behind.
+    # Offline replay disables it so results do not depend on CPU speed.
+    realtime: bool = True
+    log_interval_sec: float = 60        # Periodic "still running" log
+
+
+class Pipeline:
+    """
+    Real-time possum detection engine.
+
+    Stages for every frame:
+    capture (source) -> motion (motion_detector) -> classify (classifier)
+    -> visit state machine -> persistence (sink)
+
+    - source: object with read(), frame_timestamp(frame_idx), reconnect(), release(), fps, is_live
+    - motion_detector: callable(frame) -> (rois, bboxes)
+    - classifier: callable(rois, bboxes) -> (possum_detected, possum_rois, possum_bboxes, possum_indices, scores)
+    - sink: pipeline.sinks.VisitSink
+    - preview: optional video_utils.preview_server.PreviewServer
+    """
+
+    def __init__(self, config, source, motion_detector, classifier, sink, preview=None):
+        self.config = config
+        self.source = source
+        self.motion_detector = motion_detector
+        self.classifier = classifier
+        self.sink = sink
+        self.preview = preview
+
+        self.sampler = AdaptiveFrameSampler(
+            source.fps,
+            base_skip=config.base_skip,
+            active_skip=config.active_skip,
+            idle_skip=config.idle_skip,
+            max_skip=config.max_skip,
+            idle_after_sec=config.idle_after_sec,
+            backoff=config.realtime
+        )
+
+        self.possum_window = SlidingTimeWindow(config.possum_window_sec, min_samples=3)
+        self.possum_absence_window = SlidingTimeWindow(config.absence_window_sec, min_samples=5)
+        self.no_motion_window = SlidingTimeWindow(config.no_motion_window_sec, min_samples=5)
+        self.still_window = SlidingTimeWindow(config.still_window_sec, min_samples=3)
+        # Samples with a very confident possum / very confident absence
+        self.confident_window = SlidingTimeWindow(config.possum_window_sec)
+        self.strong_negative_window = SlidingTimeWindow(config.early_reject_sec, min_samples=3)
+
+        # Current possum visit
+        self.current_visit = None
+        # Global frame counter
+        self.frame_idx = 0
+        self.running = False
+
+        self.stats = {
+            "frames": 0,
+            "samples": 0,
+            "visits": 0
+        }
+
+    # MAIN LOOP
+    def run(self):
+        """
+        Processes the source until it ends or stop() is called. Returns stats.
+        """
+        self.running = True
+        start = time.perf_counter()
+        # Timer for periodic log
+        last_log = time.time()
+
+        try:
+            while self.running:
+                ok, frame = self.capture()
+
+                if not ok:
+                    if self.source.reconnect():
+                        self.sampler.set_fps(self.source.fps)
+                        continue
+                    break
+
+                self.process_frame(frame)
+
+                # Periodic logging if no possum
+                if time.time() - last_log > self.config.log_interval_sec:
+                    if not any(self.possum_window):
+                        logging.info("Processing continues. No possums detected so far.")
+                    last_log = time.time()
+
+                # Manual exit handler (GUI mode only, waitKey pumps window events and sleeps 1 ms)
+                if not self.config.headless and cv2.waitKey(1) & 0xFF == ord('q'):
+                    logging.info("Exiting by user request.")
+                    break
+
+        finally:
+            self.shutdown()
+
+        self.stats["elapsed_sec"] = time.perf_counter() - start
+
+        return self.stats
+
+    def stop(self):
+        self.running = False
+
+    def shutdown(self):
+        """
+        Closes the active visit and releases all resources.
+        """
+        if self.current_visit is not None:
+            logging.info("Closing active visit before exit.")
+            self.close_visit()
+
+        self.sink.finish()
+        self.source.release()
+
+        if self.preview is not None:
+            self.preview.stop()
+        if not self.config.headless:
+            cv2.destroyAllWindows()
+
+        logging.info("Video feed processing stopped, all resources released.")
+
+    # STAGES
+    def capture(self):
+        """
+        Reads the next frame. Returns (False, None) if the source has to reconnect or ended.
+        """
+        with metrics.timer("capture"):
+            ret, frame = self.source.read()
+
+        if not ret:
+            return False, None
+
+        return True, frame
+
+    def process_frame(self, frame):
+        """
+        Runs one frame through the pipeline.
+        """
+        # Frame integrity checks (protect pipeline from corrupted frames)
+        if frame is None or not isinstance(frame, np.ndarray) or frame.size == 0:
+            logging.warning("Invalid frame received")
+            if self.source.is_live:
+                time.sleep(1)
+            return
+
+        frame_timestamp = self.source.frame_timestamp(self.frame_idx)
+
+        # Save raw video if visit is active
+        if self.current_visit is not None:
+            self.sink.record_frame(self.current_visit, frame)
+
+        # Only process frames selected by the adaptive sampler
+        if self.sampler.should_process(self.frame_idx):
+            # Processing time of this sample drives the sampling step
+            with self.sampler.measure(), metrics.timer("sample_total"):
+                self.process_sample(frame, frame_timestamp)
+            self.stats["samples"] += 1
+            metrics.inc("samples")
+
+        metrics.inc("frames")
+
+        self.frame_idx += 1
+        self.stats["frames"] += 1
+
+    def detect_motion(self, frame):
+        with metrics.timer("motion"):
+            rois, bboxes = self.motion_detector(frame)
+
+        metrics.observe("rois_per_frame", len(rois))
+
+        return rois, bboxes
+
+    def classify(self, rois, bboxes):
+        with metrics.timer("classify"):
+            return self.classifier(rois, bboxes)
+
+    def process_sample(self, frame, frame_timestamp):
+        """
+        Motion detection, classification and visit state machine for a sampled frame.
+        """
+        frame_idx = self.frame_idx
+        # Stream time of this frame used by the sliding windows
+        sample_time = self.sampler.frame_time(frame_idx)
+
+        # Motion detection: get ROIs and bounding boxes
+        rois, bboxes = self.detect_motion(frame)
+
+        # Motion or an open visit keeps the sampler at the active rate
+        self.sampler.set_activity(len(rois) > 0 or self.current_visit is not None)
+
+        if len(rois) > 0:
+            self.no_motion_window.clear()
+            self.still_window.clear()
+
+        # ML inference block
+        try:
+            # Run CNN classification on ROIs
+            possum_detected_in_frame, possum_rois_in_frame, possum_bboxes_in_frame, possum_indices, scores = self.classify(rois, bboxes)
+        except Exception:
+            # Fault-tolerance: prevents full pipeline crash if ML inference fails
+            logging.exception("Inference failed")
+            # Assume no possum detected
+            self.possum_window.append(sample_time, False)
+            self.possum_absence_window.append(sample_time, False)
+            return
+
+        self.show(frame, bboxes, possum_indices)
+
+        # Save possum ROIs in separate folder
+        if possum_detected_in_frame:
+            for roi_num, roi in enumerate(possum_rois_in_frame):
+                self.sink.save_detection_roi(roi, frame_idx, roi_num)
+
+        # Update sliding window
+        best_score = max(scores, default=0.0)
+        self.possum_window.append(sample_time, possum_detected_in_frame)
+        self.confident_window.append(sample_time, self.is_confident(best_score))
+        if len(rois) > 0:
+            self.possum_absence_window.append(sample_time, possum_detected_in_frame)
+            self.strong_negative_window.append(sample_time, best_score < self.config.early_reject_score)
+
+        if self.current_visit is not None:
+            if self.possum_absence_window.is_full() and sum(self.possum_absence_window) == 0:
+                logging.info(f"Closing visit (model negative for {self.config.absence_window_sec} seconds)")
+                self.close_visit()
+                return
+
+            if self.strong_negative_window.is_full() and all(self.strong_negative_window):
+                logging.info(f"Closing visit (confidently negative for {self.config.early_reject_sec} seconds)")
+                metrics.inc("early_rejects")
+                self.close_visit()
+                return
+
+        # Handle no-motion but active visit
+        if self.current_visit is not None and len(rois) == 0:
+            self.check_still_possum(frame, frame_idx, frame_timestamp, sample_time)
+
+        # Check if enough frames of the last second have possum (3 out of 5 at 5 fps)
+        confirmed = self.possum_window.is_full() and self.possum_window.ratio() >= self.config.possum_confirm_ratio
+        # or a few very confident samples
+        confident = sum(self.confident_window) >= self.config.early_accept_samples
+
+        if confident and not confirmed and self.current_visit is None:
+            metrics.inc("early_accepts")
+
+        if confirmed or confident:
+            self.on_possum_confirmed(
+                frame,
+                frame_idx,
+                frame_timestamp,
+                sample_time,
+                possum_detected_in_frame,
+                possum_rois_in_frame,
+                possum_bboxes_in_frame
+            )
+
+    def is_confident(self, score):
+        return self.config.early_accept_score > 0 and score >= self.config.early_accept_score
+
+    def show(self, frame, bboxes, possum_indices):
+        """
+        Draws bounding boxes only if someone is watching.
+        """
+        if not self.config.headless:
+            cv2.imshow("Video Feed", draw_detections(frame, bboxes, possum_indices))
+
+        if self.preview is not None and self.preview.wants_frame():
+            self.preview.publish(draw_detections(frame, bboxes, possum_indices))
+
+    # VISIT STATE MACHINE
+    def check_still_possum(self, frame, frame_idx, frame_timestamp, sample_time):
+        """
+        Re-checks the area of the last possum bbox when there is no motion.
+        """
+        visit = self.current_visit
+
+        if visit.get("last_bbox") is None:
+            return
+
+        x1, y1, x2, y2 = expand_bbox(
+            visit["last_bbox"],
+            frame.shape,
+            scale=self.config.still_bbox_scale
+        )
+
+        roi = frame[y1:y2, x1:x2]
+        still_confident = False
+
+        if roi.size > 0:
+            try:
+                possum_detected, _, _, _, scores = self.classify([roi], [(x1, y1, x2, y2)])
+
+                self.no_motion_window.append(sample_time, possum_detected)
+                self.still_window.append(sample_time, possum_detected)
+                self.possum_absence_window.append(sample_time, possum_detected)
+                self.strong_negative_window.append(sample_time, scores[0] < self.config.early_reject_score)
+                still_confident = self.is_confident(scores[0])
+
+            except Exception:
+                logging.exception("Inference failed in no-motion mode")
+                self.no_motion_window.append(sample_time, False)
+                self.still_window.append(sample_time, False)
+
+        else:
+            self.no_motion_window.append(sample_time, False)
+            self.still_window.append(sample_time, False)
+
+        # Continue visit if still enough positives (or one very confident re-check)
+        still_confirmed = self.still_window.is_full() and self.still_window.ratio() >= self.config.still_confirm_ratio
+
+        if still_confirmed or still_confident:
+            logging.info("No motion but possum still detected - continuing visit")
+            visit["last_seen_time"] = frame_timestamp
+            visit["last_seen_frame"] = frame_idx
+
+            # Save frame periodically
+            last_saved = visit.get("last_static_saved_time")
+
+            should_save_static = (
+                last_saved is None or
+                (frame_timestamp - last_saved).total_seconds() >= self.config.static_save_interval_sec
+            )
+
+            if should_save_static and self.should_save_images(visit, roi):
+                frame_path = self.sink.save_visit_frame(
+                    visit,
+                    frame,
+                    f"frame_{frame_idx:06d}.jpg",
+                    frame_timestamp
+                )
+
+                self.sink.save_visit_roi(
+                    visit,
+                    roi,
+                    f"roi_{frame_idx:06d}_static.jpg",
+                    (x1, y1, x2, y2),
+                    frame_path,
+                    frame_timestamp
+                )
+
+            if should_save_static:
+                visit["last_static_saved_time"] = frame_timestamp
+
+        # Close visit only if strong negative evidence
+        elif self.no_motion_window.is_full() and sum(self.no_motion_window) == 0:
+            logging.info("Closing visit (no motion + no possum confirmed)")
+            self.close_visit()
+
+    def on_possum_confirmed(
+        self,
+        frame,
+        frame_idx,
+        frame_timestamp,
+        sample_time,
+        possum_detected_in_frame,
+        possum_rois_in_frame,
+        possum_bboxes_in_frame
+    ):
+        """
+        Opens or extends the visit and saves confirmed possum frames and ROIs.
+        """
+        logging.info(f"POSSUM DETECTED at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+        # Update existing visit timestamp
+        if self.current_visit is not None and possum_detected_in_frame:
+            self.current_visit["last_seen_time"] = frame_timestamp
+            self.current_visit["last_seen_frame"] = frame_idx
+            if len(possum_bboxes_in_frame) > 0:
+                self.current_visit["last_bbox"] = possum_bboxes_in_frame[0]
+
+        # Create new visit if none active
+        if self.current_visit is None:
+            self.open_visit(frame, frame_idx, frame_timestamp)
+            if possum_detected_in_frame and len(possum_bboxes_in_frame) > 0:
+                self.current_visit["last_bbox"] = possum_bboxes_in_frame[0]
+
+        visit = self.current_visit
+
+        # Save visit frames and ROIs not more often than frame_save_interval_sec
+        last_frame_saved = visit.get("last_frame_saved_time")
+        should_save_frame = (
+            last_frame_saved is None or
+            sample_time - last_frame_saved >= self.config.frame_save_interval_sec
+        )
+
+        if should_save_frame and possum_detected_in_frame:
+            visit["last_seen_time"] = frame_timestamp
+            visit["last_seen_frame"] = frame_idx
+            visit["last_frame_saved_time"] = sample_time
+
+            if not self.should_save_images(visit, possum_rois_in_frame[0]):
+                return
+
+            frame_path = self.sink.save_visit_frame(
+                visit,
+                frame,
+                f"frame_{frame_idx:06d}.jpg",
+                frame_timestamp
+            )
+
+            for roi_num, roi in enumerate(possum_rois_in_frame):
+                self.sink.save_visit_roi(
+                    visit,
+                    roi,
+                    f"roi_{frame_idx:06d}_{roi_num:03d}.jpg",
+                    possum_bboxes_in_frame[roi_num],
+                    frame_path,
+                    frame_timestamp
+                )
+
+    def should_save_images(self, visit, roi):
+        """
+        False if the visit reached its image cap or `roi` is a near-duplicate
+        of a recently saved ROI. The frame and its ROIs are skipped together
+        (no file write, DB row or upload).
+        """
+        cap = self.config.max_saved_frames_per_visit
+        if cap and visit["saved_frames"] >= cap:
+            metrics.inc("saves_skipped_cap")
+            return False
+
+        if self.config.dedup_max_distance >= 0 and roi.size > 0:
+            roi_hash = dhash(roi)
+
+            if visit["saved_hashes"].is_duplicate(roi_hash):
+                metrics.inc("saves_skipped_duplicate")
+                return False
+
+            visit["saved_hashes"].add(roi_hash)
+
+        visit["saved_frames"] += 1
+        return True
+
+    def open_visit(self, frame, frame_idx, frame_timestamp):
+        self.current_visit = self.sink.create_visit(frame, frame_idx, self.source.fps, frame_timestamp)
+        self.current_visit["last_static_saved_time"] = None
+        self.current_visit["last_frame_saved_time"] = None
+        self.current_visit["saved_frames"] = 0
+        self.current_visit["saved_hashes"] = RecentImageHashes(
+            self.config.dedup_max_distance,
+            self.config.dedup_history
+        )
+        self.stats["visits"] += 1
+
+        self.no_motion_window.clear()
+        self.possum_absence_window.clear()
+        self.strong_negative_window.clear()
+
+    def close_visit(self):
+        self.sink.close_visit(self.current_visit, self.source.fps)
+        self.current_visit = None
+
+        self.possum_window.clear()
+        self.possum_absence_window.clear()
+        self.no_motion_window.clear()
+        self.still_window.clear()
+        self.confident_window.clear()
+        self.strong_negative_window.clear()
@@ -0,0 +1,54 @@
+import logging
+
+from pipeline.sinks import VisitSink
+# Visit lifecycle management (MySQL + Google Cloud Storage)
+from visits.visit_manager import create_new_visit, close_visit, upload_queue, start_upload_workers
+from hardware.feeder import trigger_feeder
+
+# Upper bound for uploading deferred videos on shutdown (video file mode)
+VIDEO_DRAIN_TIMEOUT_SEC = 3600
+
+
+class LiveVisitSink(VisitSink):
+    """
+    Production persistence: visits are stored in MySQL, media uploaded to GCS
+    by the background upload worker, and the feeder is triggered on visit start.
+    """
+
+    def __init__(self, base_dir, media_writer=None, wait_for_uploads=False, trigger_feeder_on_visit=True, encoding=None,
+                 camera_id="main"):
+        super().__init__(base_dir, media_writer, encoding=encoding)
+        # Stored with every visit, selects the fence calibration for statistics
+        self.camera_id = camera_id
+        # Block on shutdown until queued uploads are finished (video file mode)
+        self.wait_for_uploads = wait_for_uploads
+        self.trigger_feeder_on_visit = trigger_feeder_on_visit
+        # Upload threads start with the first live sink, not at import
+        self.video_scheduler, self.media_retries = start_upload_workers()
+
+    def create_visit(self, frame, frame_idx, fps, timestamp):
+        visit = create_new_visit(frame, self.base_dir, frame_idx, fps, self.camera_id)
+
+        if self.trigger_feeder_on_visit:
+            trigger_feeder()
+
+        return visit
+
+    def close_visit(self, visit, fps):
+        close_visit(visit, fps, self.media_writer)
+
+    def finish(self):
+        # Finish pending image writes before waiting for uploads
+        super().finish()
+
+        if self.wait_for_uploads:
+            logging.info("Waiting for uploads to finish (video mode)...")
+            upload_queue.join()
+            # Deferred videos are uploaded now, quiet windows don't apply before exit
+            self.video_scheduler.drain(timeout=VIDEO_DRAIN_TIMEOUT_SEC)
+
+            failed = self.media_retries.queue_depth()
+            if failed:
+                # Persisted, retried on the next start
+                logging.warning(f"{failed} visit media uploads failed and are left for retry")
+            logging.info("All uploads completed.")
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+import torch
+
+from config import MODEL_PATH, POSSUM_THRESHOLD, IMAGE_FORMAT, FRAME_QUALITY, ROI_QUALITY, CROP_QUALITY, FRAME_MAX_DIM
+from logger import setup_logger
+from vision.crops_for_videos import MotionDetector
+from inference.model_loader import load_model
+from inference.detector import PossumClassifier
+from inference.transforms import build_test_transform
+from video_utils.video_capture import VideoFileSource
+from visits.media_writer import MediaWriter
+from video_utils.image_encoding import build_policy
+from pipeline.engine import Pipeline, PipelineConfig
+from pipeline.sinks import LocalVisitSink, SQLiteVisitSink
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov")
+
+
+def collect_videos(paths):
+    """
+    Expands directories into sorted lists of video files.
+    """
+    videos = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith(VIDEO_EXTENSIONS):
+                        videos.append(os.path.join(root, name))
+        else:
+            videos.append(path)
+
+    return videos
+
+
+def replay_video(video_path, classifier, config, args):
+    """
+    Runs the detection pipeline over one recorded video as fast as possible.
+    Returns a report dict with throughput and detected visits.
+    """
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    output_dir = os.path.join(args.output, video_name)
+
+    # Timestamps follow stream time so visit durations are measured in video time,
+    # not in (much shorter) processing time
+    source = VideoFileSource(video_path)
+    # The file is last modified when the recording ended: it started one video length earlier
+    source.start_time = args.start_time or (
+        datetime.fromtimestamp(os.path.getmtime(video_path)) - timedelta(seconds=source.duration_sec())
+    )
+
+    media_writer = MediaWriter(workers=args.writers) if not args.no_images else None
+    # Same image encoding as the live pipeline
+    encoding = build_policy(IMAGE_FORMAT, FRAME_QUALITY, ROI_QUALITY, CROP_QUALITY, FRAME_MAX_DIM)
+
+    if args.sqlite:
+        sink = SQLiteVisitSink(
+            args.sqlite,
+            output_dir,
+            media_writer,
+            save_images=not args.no_images,
+            record_video=args.record_video,
+            source_name=video_path,
+            encoding=encoding
+        )
+    else:
+        sink = LocalVisitSink(
+            output_dir,
+            media_writer,
+            save_images=not args.no_images,
+            record_video=args.record_video,
+            source_name=video_path,
+            encoding=encoding
+        )
+
+    # Each video gets a fresh background subtractor
+    pipeline = Pipeline(config, source, MotionDetector(), classifier, sink)
+    stats = pipeline.run()
+
+    elapsed = stats["elapsed_sec"]
+
+    return {
+        "video": video_path,
+        "frames": stats["frames"],
+        "samples": stats["samples"],
+        "elapsed_sec": round(elapsed, 2),
+        "fps": round(stats["frames"] / elapsed, 1) if elapsed > 0 else None,
+        "video_duration_sec": round(stats["frames"] / source.fps, 1),
+        "visits": sink.visits
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Replay recorded videos through the detection pipeline faster than real time"
+    )
+    parser.add_argument("videos", nargs="+", help="Video files or folders with videos")
+    parser.add_argument("--output", default="replay_output", help="Folder for visits, frames and ROIs")
+    parser.add_argument("--sqlite", help="Also store visits/frames/rois in this SQLite file")
+    parser.add_argument("--weights", default=MODEL_PATH, help="Model weights to evaluate")
+    parser.add_argument("--threshold", type=float, default=POSSUM_THRESHOLD, help="Possum probability threshold")
+    parser.add_argument("--report", help="Write JSON report to this file")
+    parser.add_argument("--start-time", type=datetime.fromisoformat,
+                        help="Recording start of a single video (ISO, e.g. 2026-01-01T21:30:00); "
+                             "default: file modification time minus video length")
+    parser.add_argument("--no-images", action="store_true", help="Do not write frames and ROIs (fastest)")
+    parser.add_argument("--record-video", action="store_true", help="Write visit.mp4 for every visit")
+    parser.add_argument("--writers", type=int, default=2, help="Image writer threads")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    setup_logger()
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = load_model(args.weights, device)
+    classifier = PossumClassifier(model, build_test_transform(), device, threshold=args.threshold)
+
+    # Offline: no display, sampling does not depend on processing speed
+    config = PipelineConfig(headless=True, realtime=False)
+
+    videos = collect_videos(args.videos)
+    if args.start_time is not None and len(videos) > 1:
+        raise SystemExit("--start-time applies to a single video")
+    logging.info(f"Replaying {len(videos)} videos with weights {args.weights}")
+
+    reports = []
+    total_start = time.perf_counter()
+
+    for video_path in videos:
+        try:
+            report = replay_video(video_path, classifier, config, args)
+        except Exception:
+            logging.exception(f"Replay failed for {video_path}")
+            continue
+
+        reports.append(report)
+        logging.info(
+            f"{video_path}: {report['frames']} frames in {report['elapsed_sec']} s "
+            f"({report['fps']} frames/s), {len(report['visits'])} visits"
+        )
+
+    total_elapsed = time.perf_counter() - total_start
+    total_frames = sum(r["frames"] for r in reports)
+    total_video_sec = sum(r["video_duration_sec"] for r in reports)
+
+    summary = {
+        "weights": args.weights,
+        "videos": len(reports),
+        "frames": total_frames,
+        "elapsed_sec": round(total_elapsed, 2),
+        "fps": round(total_frames / total_elapsed, 1) if total_elapsed > 0 else None,
+        "realtime_factor": round(total_video_sec / total_elapsed, 1) if total_elapsed > 0 else None,
+        "visits": sum(len(r["visits"]) for r in reports),
+        "per_video": reports
+    }
+
+    logging.info(
+        f"Replay finished: {summary['videos']} videos, {summary['frames']} frames, "
+        f"{summary['fps']} frames/s ({summary['realtime_factor']}x real time), "
+        f"{summary['visits']} visits"
+    )
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
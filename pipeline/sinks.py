@@ -0,0 +1,334 @@
+import cv2
+import os
+import json
+import logging
+import sqlite3
+from datetime import datetime
+
+from visits.media_writer import write_image_durably
+from video_utils.image_encoding import build_policy
+
+
+class VisitSink:
+    """
+    Persistence stage of the pipeline.
+
+    Subclasses decide how visits are created and closed (DB + cloud, local
+    folder, ...). Image saving is shared: files go through a MediaWriter if
+    one is given, otherwise they are written synchronously. Upload records
+    are appended to the visit queues only after the file is written.
+
+    `encoding` maps artefact type ("frame", "roi", "crop") to an ImageEncoding
+    (see video_utils.image_encoding.build_policy). File extensions follow it.
+    """
+
+    def __init__(self, base_dir, media_writer=None, save_detection_rois=True, save_images=True, encoding=None):
+        self.base_dir = base_dir
+        self.media_writer = media_writer
+        self.encoding = encoding or build_policy()
+        # Keep copies of every possum ROI outside visits (debugging / new training data)
+        self.save_detection_rois = save_detection_rois
+        # If False only upload records are kept (fast offline evaluation)
+        self.save_images = save_images
+        os.makedirs(base_dir, exist_ok=True)
+
+    def create_visit(self, frame, frame_idx, fps, timestamp):
+        """
+        Starts a visit and returns the visit dict (see visits.visit_manager.create_new_visit).
+        """
+        raise NotImplementedError
+
+    def close_visit(self, visit, fps):
+        raise NotImplementedError
+
+    def record_frame(self, visit, frame):
+        """
+        Appends a raw frame to the visit video.
+        """
+        if visit["video_writer"] is not None:
+            visit["video_writer"].write(frame)
+
+    def save_visit_frame(self, visit, frame, name, timestamp):
+        """
+        Saves a full frame of the visit. Returns the local path.
+        """
+        encoding = self.encoding["frame"]
+        frame_path = os.path.join(visit["frames_dir"], encoding.filename(name))
+
+        self._write(
+            frame_path,
+            frame,
+            encoding,
+            record=(visit["frame_upload_queue"], (frame_path, timestamp)),
+            tag=visit["visit_id"]
+        )
+
+        return frame_path
+
+    def save_visit_roi(self, visit, roi, name, bbox, frame_path, timestamp):
+        """
+        Saves a possum ROI of the visit linked to its full frame.
+        """
+        encoding = self.encoding["roi"]
+        roi_path = os.path.join(visit["rois_dir"], encoding.filename(name))
+
+        self._write(
+            roi_path,
+            roi,
+            encoding,
+            record=(visit["roi_upload_queue"], (roi_path, bbox, frame_path, timestamp)),
+            tag=visit["visit_id"]
+        )
+
+        return roi_path
+
+    def save_detection_roi(self, roi, frame_idx, roi_num):
+        """
+        Saves a possum ROI outside of visit folders (optional, dropped first under load).
+        """
+        if not self.save_detection_rois or not self.save_images:
+            return None
+
+        # Add timestamp to filename
+        timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+        encoding = self.encoding["crop"]
+        roi_path = os.path.join(self.base_dir, encoding.filename(f"roi_{frame_idx:06d}_{roi_num:03d}_{timestamp_str}"))
+
+        self._write(roi_path, roi, encoding, required=False)
+
+        return roi_path
+
+    def finish(self):
+        """
+        Flushes pending writes. Called once when the pipeline stops.
+        """
+        if self.media_writer is not None:
+            self.media_writer.stop()
+
+    def _write(self, path, image, encoding, record=None, tag=None, required=True):
+        if record is not None:
+            upload_queue, item = record
+            on_written = lambda: upload_queue.append(item)
+        else:
+            on_written = None
+
+        if not self.save_images:
+            if on_written is not None:
+                on_written()
+            return
+
+        if self.media_writer is not None:
+            self.media_writer.submit(path, image, on_written=on_written, tag=tag, required=required, encoding=encoding)
+            return
+
+        try:
+            write_image_durably(path, image, encoding)
+        except Exception:
+            logging.exception(f"Failed to write {path}")
+            return
+
+        if on_written is not None:
+            on_written()
+
+    def _wait_for_writes(self, visit):
+        if self.media_writer is not None:
+            self.media_writer.wait_for(visit["visit_id"])
+
+
+class LocalVisitSink(VisitSink):
+    """
+    Offline persistence: visits are stored as folders with a visit.json
+    summary instead of MySQL rows and GCS objects.
+    """
+
+    def __init__(self, base_dir, media_writer=None, save_images=True, record_video=False, source_name=None, encoding=None):
+        super().__init__(base_dir, media_writer, save_detection_rois=False, save_images=save_images, encoding=encoding)
+        # Writing visit.mp4 re-encodes every frame, off by default for replay speed
+        self.record_video = record_video
+        self.source_name = source_name
+        self.next_visit_id = 1
+        # Summaries of closed visits
+        self.visits = []
+
+    def create_visit(self, frame, frame_idx, fps, timestamp):
+        visit_id = self._next_id()
+
+        visit_folder = os.path.join(self.base_dir, f"visit_{visit_id:04d}")
+        frames_dir = os.path.join(visit_folder, "frames")
+        rois_dir = os.path.join(visit_folder, "rois")
+
+        os.makedirs(frames_dir, exist_ok=True)
+        os.makedirs(rois_dir, exist_ok=True)
+
+        video_path = os.path.join(visit_folder, "visit.mp4")
+        video_writer = None
+
+        if self.record_video:
+            h, w = frame.shape[:2]
+            video_writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+
+        logging.info(f"Visit {visit_id} started at {timestamp.strftime('%Y-%m-%d %H:%M:%S')}")
+
+        return {
+            "visit_id": visit_id,
+            "visit_folder": visit_folder,
+            "start_time": timestamp,
+            "last_seen_time": timestamp,
+            "last_seen_frame": frame_idx,
+            "frames_dir": frames_dir,
+            "rois_dir": rois_dir,
+            "start_frame": frame_idx,
+            "video_path": video_path if self.record_video else None,
+            "video_writer": video_writer,
+            "frame_upload_queue": [],
+            "roi_upload_queue": []
+        }
+
+    def close_visit(self, visit, fps):
+        if visit["video_writer"] is not None:
+            visit["video_writer"].release()
+
+        self._wait_for_writes(visit)
+
+        summary = self._summary(visit)
+        self.visits.append(summary)
+
+        with open(os.path.join(visit["visit_folder"], "visit.json"), "w") as f:
+            json.dump(
+                {
+                    **summary,
+                    "frames": [
+                        {"path": path, "timestamp": ts.isoformat()}
+                        for path, ts in sorted(visit["frame_upload_queue"], key=lambda item: item[1])
+                    ],
+                    "rois": [
+                        {"path": path, "bbox": list(bbox), "frame_path": frame_path, "timestamp": ts.isoformat()}
+                        for path, bbox, frame_path, ts in sorted(visit["roi_upload_queue"], key=lambda item: item[3])
+                    ]
+                },
+                f,
+                indent=2
+            )
+
+        logging.info(f"Visit {visit['visit_id']} closed.")
+
+    def _next_id(self):
+        visit_id = self.next_visit_id
+        self.next_visit_id += 1
+        return visit_id
+
+    def _summary(self, visit):
+        return {
+            "visit_id": visit["visit_id"],
+            "source": self.source_name,
+            "start_time": visit["start_time"].isoformat(),
+            "end_time": visit["last_seen_time"].isoformat(),
+            "duration_seconds": round((visit["last_seen_time"] - visit["start_time"]).total_seconds(), 2),
+            "start_frame": visit["start_frame"],
+            "last_seen_frame": visit["last_seen_frame"],
+            "frames": len(visit["frame_upload_queue"]),
+            "rois": len(visit["roi_upload_queue"])
+        }
+
+
+class SQLiteVisitSink(LocalVisitSink):
+    """
+    Offline persistence into a SQLite file with the same visits/frames/rois
+    layout as the MySQL schema (plus the source video name).
+    Images are stored in visit folders next to the database.
+    """
+
+    def __init__(self, db_path, base_dir, media_writer=None, save_images=True, record_video=False, source_name=None, encoding=None):
+        super().__init__(base_dir, media_writer, save_images, record_video, source_name, encoding)
+        self.db_path = db_path
+        self.db = sqlite3.connect(db_path)
+
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS visits (
+                visit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source_video TEXT,
+                start_time TEXT,
+                end_time TEXT,
+                duration_seconds REAL,
+                start_frame INTEGER,
+                end_frame INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS frames (
+                frame_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                visit_id INTEGER REFERENCES visits (visit_id),
+                frame_timestamp TEXT,
+                frame_path TEXT
+            );
+            CREATE TABLE IF NOT EXISTS rois (
+                roi_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                frame_id INTEGER REFERENCES frames (frame_id),
+                roi_path TEXT,
+                bbox_x1 INTEGER,
+                bbox_y1 INTEGER,
+                bbox_x2 INTEGER,
+                bbox_y2 INTEGER,
+                roi_timestamp TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_frames_visit_id ON frames (visit_id);
+            CREATE INDEX IF NOT EXISTS idx_rois_frame_id ON rois (frame_id);
+        """)
+
+    def _next_id(self):
+        # Visit id comes from the database so several videos can share one file
+        cur = self.db.execute(
+            "INSERT INTO visits (source_video) VALUES (?)",
+            (self.source_name,)
+        )
+        self.db.commit()
+        return cur.lastrowid
+
+    def close_visit(self, visit, fps):
+        super().close_visit(visit, fps)
+
+        summary = self.visits[-1]
+
+        try:
+            self.db.execute("""
+                UPDATE visits
+                SET start_time = ?, end_time = ?, duration_seconds = ?, start_frame = ?, end_frame = ?
+                WHERE visit_id = ?
+            """, (
+                summary["start_time"],
+                summary["end_time"],
+                summary["duration_seconds"],
+                summary["start_frame"],
+                summary["last_seen_frame"],
+                visit["visit_id"]
+            ))
+
+            # Dictionary to map local frame paths to DB frame IDs
+            frame_id_map = {}
+
+            for frame_path, timestamp in sorted(visit["frame_upload_queue"], key=lambda item: item[1]):
+                cur = self.db.execute(
+                    "INSERT INTO frames (visit_id, frame_timestamp, frame_path) VALUES (?, ?, ?)",
+                    (visit["visit_id"], timestamp.isoformat(), frame_path)
+                )
+                frame_id_map[frame_path] = cur.lastrowid
+
+            for roi_path, bbox, frame_path, timestamp in sorted(visit["roi_upload_queue"], key=lambda item: item[3]):
+                if frame_path not in frame_id_map:
+                    logging.warning(f"ROI skipped, frame not found: {frame_path}")
+                    continue
+
+                x1, y1, x2, y2 = bbox
+                self.db.execute(
+                    "INSERT INTO rois (frame_id, roi_path, bbox_x1, bbox_y1, bbox_x2, bbox_y2, roi_timestamp) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (frame_id_map[frame_path], roi_path, x1, y1, x2, y2, timestamp.isoformat())
+                )
+
+            self.db.commit()
+
+        except Exception:
+            self.db.rollback()
+            logging.exception(f"Failed to store visit {visit['visit_id']} in {self.db_path}")
+
+    def finish(self):
+        super().finish()
+        self.db.close()
@@ -0,0 +1,42 @@
+import time
+import logging
+
+from metrics import metrics
+
+
+class StartupTimer:
+    """
+    Durations of the startup phases of a process (imports, model load,
+    first inference, ...). Logged as one report line when the process
+    is ready and exposed as startup_<phase>_seconds gauges on /metrics.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.phases = {}
+
+    def mark(self, name):
+        """
+        Records the time since the previous mark (or start) as phase `name`.
+        """
+        now = time.perf_counter()
+        self.phases[name] = now - self.last
+        self.last = now
+
+    def record(self, name, seconds):
+        """
+        Records a duration measured elsewhere (e.g. first inference during warm-up).
+        """
+        self.phases[name] = seconds
+
+    def report(self, label="Startup"):
+        total = time.perf_counter() - self.started
+        phases = ", ".join(f"{name} {seconds:.2f} s" for name, seconds in self.phases.items())
+        logging.info(f"{label}: {phases} (ready after {total:.2f} s)")
+
+        for name, seconds in self.phases.items():
+            metrics.register_gauge(f"startup_{name}_seconds", lambda seconds=seconds: round(seconds, 3))
+        metrics.register_gauge("startup_total_seconds", lambda: round(total, 3))
+
+        return total
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Tests import project modules the same way the entry points do (from the repo root)
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_ROOT)
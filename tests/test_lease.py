@@ -0,0 +1,197 @@
+"""
+Processing leases of the video processor (api/video_processor/lease.py)
+against an in-memory bucket with GCS generation preconditions.
+"""
+import os
+import sys
+import json
+import threading
+
+import pytest
+
+from conftest import REPO_ROOT
+
+exceptions = pytest.importorskip("google.api_core.exceptions")
+
+sys.path.append(os.path.join(REPO_ROOT, "api", "video_processor"))
+import lease as lease_module
+from lease import acquire_lease, release_lease, lease_name
+
+OBJECT = "2026-01-01/visit_12/video.mp4"
+GENERATION = 1700000000000001
+
+
+class FakeBucket:
+    """
+    Objects as name -> (generation, data). Every operation is atomic and
+    checks if_generation_match like GCS (0 = object must not exist).
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.next_generation = 1
+        self.lock = threading.Lock()
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def check(self, name, if_generation_match):
+        current = self.objects.get(name)
+
+        if if_generation_match is None:
+            return current
+        if if_generation_match == 0 and current is not None:
+            raise exceptions.PreconditionFailed(f"{name} exists")
+        if if_generation_match != 0 and (current is None or current[0] != if_generation_match):
+            raise exceptions.PreconditionFailed(f"{name} generation mismatch")
+
+        return current
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.generation = None
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None):
+        with self.bucket.lock:
+            self.bucket.check(self.name, if_generation_match)
+            self.generation = self.bucket.next_generation
+            self.bucket.next_generation += 1
+            self.bucket.objects[self.name] = (self.generation, data)
+
+    def reload(self):
+        with self.bucket.lock:
+            current = self.bucket.objects.get(self.name)
+            if current is None:
+                raise exceptions.NotFound(self.name)
+            self.generation = current[0]
+
+    def download_as_bytes(self, if_generation_match=None):
+        with self.bucket.lock:
+            current = self.bucket.check(self.name, if_generation_match)
+            if current is None:
+                raise exceptions.NotFound(self.name)
+            data = current[1]
+            return data.encode() if isinstance(data, str) else data
+
+    def delete(self, if_generation_match=None):
+        with self.bucket.lock:
+            if self.name not in self.bucket.objects:
+                raise exceptions.NotFound(self.name)
+            self.bucket.check(self.name, if_generation_match)
+            del self.bucket.objects[self.name]
+
+
+def stored_owner(bucket):
+    generation, data = bucket.objects[lease_name(OBJECT, GENERATION)]
+    return json.loads(data)["owner"]
+
+
+def test_first_contender_wins_second_is_refused():
+    bucket = FakeBucket()
+
+    first = acquire_lease(bucket, OBJECT, GENERATION)
+    second = acquire_lease(bucket, OBJECT, GENERATION)
+
+    assert first is not None
+    assert second is None
+
+
+def test_concurrent_contenders_only_one_wins():
+    bucket = FakeBucket()
+    contenders = 16
+    barrier = threading.Barrier(contenders)
+    results = []
+
+    def contend():
+        barrier.wait()
+        results.append(acquire_lease(bucket, OBJECT, GENERATION))
+
+    threads = [threading.Thread(target=contend) for _ in range(contenders)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(result is not None for result in results) == 1
+
+
+def test_other_generation_has_its_own_lease():
+    bucket = FakeBucket()
+
+    assert acquire_lease(bucket, OBJECT, GENERATION) is not None
+    assert acquire_lease(bucket, OBJECT, GENERATION + 1) is not None
+
+
+def test_expired_lease_is_taken_over(monkeypatch):
+    bucket = FakeBucket()
+
+    monkeypatch.setattr(lease_module, "OWNER", "crashed")
+    # Negative TTL: the lease is already expired when written
+    crashed = acquire_lease(bucket, OBJECT, GENERATION, ttl_sec=-1)
+
+    monkeypatch.setattr(lease_module, "OWNER", "successor")
+    successor = acquire_lease(bucket, OBJECT, GENERATION)
+
+    assert crashed is not None and successor is not None
+    assert successor.generation != crashed.generation
+    assert stored_owner(bucket) == "successor"
+
+
+def test_expired_lease_is_taken_over_only_once():
+    bucket = FakeBucket()
+    acquire_lease(bucket, OBJECT, GENERATION, ttl_sec=-1)
+
+    contenders = 16
+    barrier = threading.Barrier(contenders)
+    results = []
+
+    def contend():
+        barrier.wait()
+        results.append(acquire_lease(bucket, OBJECT, GENERATION))
+
+    threads = [threading.Thread(target=contend) for _ in range(contenders)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(result is not None for result in results) == 1
+
+
+def test_release_frees_the_lease():
+    bucket = FakeBucket()
+
+    release_lease(acquire_lease(bucket, OBJECT, GENERATION))
+
+    assert lease_name(OBJECT, GENERATION) not in bucket.objects
+    assert acquire_lease(bucket, OBJECT, GENERATION) is not None
+
+
+def test_release_by_previous_owner_keeps_new_lease(monkeypatch):
+    bucket = FakeBucket()
+
+    monkeypatch.setattr(lease_module, "OWNER", "slow")
+    slow = acquire_lease(bucket, OBJECT, GENERATION, ttl_sec=-1)
+
+    monkeypatch.setattr(lease_module, "OWNER", "successor")
+    successor = acquire_lease(bucket, OBJECT, GENERATION)
+
+    # The slow instance finishes after its lease was stolen: its release must not delete the new one
+    release_lease(slow)
+
+    assert successor is not None
+    assert stored_owner(bucket) == "successor"
+
+    release_lease(successor)
+    assert lease_name(OBJECT, GENERATION) not in bucket.objects
+
+
+def test_release_of_missing_lease_is_ignored():
+    bucket = FakeBucket()
+    held = acquire_lease(bucket, OBJECT, GENERATION)
+
+    del bucket.objects[lease_name(OBJECT, GENERATION)]
+    release_lease(held)
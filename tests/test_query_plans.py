@@ -0,0 +1,46 @@
+"""
+EXPLAIN checks of the hot API queries (api/loadtest/explain_check.py).
+
+Needs a MySQL server and recreates the tables of its database, so it only
+runs when POSSUM_TEST_MYSQL_HOST is set, e.g. against database/docker-compose.yml:
+
+    POSSUM_TEST_MYSQL_HOST=127.0.0.1 python -m pytest tests/test_query_plans.py
+"""
+import os
+import sys
+import argparse
+
+import pytest
+
+from conftest import REPO_ROOT
+
+MYSQL_HOST = os.getenv("POSSUM_TEST_MYSQL_HOST")
+
+pytestmark = pytest.mark.skipif(not MYSQL_HOST, reason="POSSUM_TEST_MYSQL_HOST not set")
+
+
+@pytest.fixture(scope="module")
+def explain_check():
+    pytest.importorskip("mysql.connector")
+    sys.path.append(os.path.join(REPO_ROOT, "api", "loadtest"))
+    import explain_check
+    return explain_check
+
+
+@pytest.fixture(scope="module")
+def conn(explain_check):
+    args = argparse.Namespace(
+        host=MYSQL_HOST,
+        port=int(os.getenv("POSSUM_TEST_MYSQL_PORT", "3306")),
+        user=os.getenv("POSSUM_TEST_MYSQL_USER", "root"),
+        password=os.getenv("POSSUM_TEST_MYSQL_PASSWORD", "rootpassword"),
+        database=os.getenv("POSSUM_TEST_MYSQL_DATABASE", "possum_loadtest")
+    )
+    conn = explain_check.connect(args)
+    yield conn
+    conn.close()
+
+
+def test_hot_queries_use_indexes(explain_check, conn):
+    problems = explain_check.check_all(conn, rois=100000, verbose=False)
+    assert problems == []
@@ -0,0 +1,233 @@
+"""
+Resumable uploads of cloud/gcs_client.py against a local HTTP stub that
+implements the GCS resumable protocol (308 + Range, Content-Range queries).
+"""
+import os
+import re
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("dotenv")
+storage = pytest.importorskip("google.cloud.storage")
+
+CHUNK = 256 * 1024
+
+
+class StubSessions:
+    """
+    Server side state: uploaded bytes per session, the requests seen and
+    chunk offsets that fail once with 503.
+    """
+
+    def __init__(self):
+        self.sessions = {}
+        self.requests = []
+        self.fail_once = set()
+        self.lock = threading.Lock()
+
+    def create(self, path, size, stored=b""):
+        self.sessions[path] = {"size": size, "data": bytearray(stored)}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_PUT(self):
+        state = self.server.state
+        content_range = self.headers["Content-Range"]
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        with state.lock:
+            state.requests.append((self.path, content_range, len(body)))
+            session = state.sessions.get(self.path)
+
+            if session is None:
+                return self.reply(404)
+
+            query = re.fullmatch(r"bytes \*/(\d+)", content_range)
+            if query is None:
+                start, end, _ = map(int, re.fullmatch(r"bytes (\d+)-(\d+)/(\d+)", content_range).groups())
+
+                if start in state.fail_once:
+                    state.fail_once.discard(start)
+                    return self.reply(503)
+
+                # GCS ignores bytes it already has
+                if start <= len(session["data"]):
+                    session["data"][start:end + 1] = body
+
+            stored = len(session["data"])
+            if stored == session["size"]:
+                return self.reply(200)
+
+            return self.reply(308, {"Range": f"bytes=0-{stored - 1}"} if stored else {})
+
+    def reply(self, status, headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.state = StubSessions()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def gcs_client(stub, tmp_path, monkeypatch):
+    """
+    cloud.gcs_client with the bucket replaced by one that opens sessions on the stub.
+    """
+    fake_bucket = mock.Mock()
+
+    def create_session(gcs_path, size):
+        path = f"/upload/{gcs_path}/{len(stub.state.sessions)}"
+        stub.state.create(path, size)
+        return f"http://127.0.0.1:{stub.server_port}{path}"
+
+    fake_bucket.blob.side_effect = lambda gcs_path: mock.Mock(
+        create_resumable_upload_session=lambda content_type, size: create_session(gcs_path, size)
+    )
+
+    # The module builds its client from a key file at import time
+    with mock.patch.object(storage.Client, "from_service_account_json"):
+        from cloud import gcs_client
+
+    monkeypatch.setattr(gcs_client, "bucket", fake_bucket)
+    monkeypatch.setattr(gcs_client, "SESSIONS_PATH", str(tmp_path / "upload_sessions.json"))
+    monkeypatch.setattr(gcs_client, "CHUNK_SIZE", CHUNK)
+    monkeypatch.setattr(gcs_client, "RESUMABLE_THRESHOLD", CHUNK)
+    monkeypatch.setattr(gcs_client, "RETRY_BASE_DELAY", 0)
+
+    return gcs_client
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "visit.mp4"
+    path.write_bytes(os.urandom(3 * CHUNK + 1234))
+    return str(path)
+
+
+def chunk_starts(state):
+    return [
+        int(content_range.split()[1].split("-")[0])
+        for _, content_range, _ in state.requests
+        if "*" not in content_range
+    ]
+
+
+def test_upload_in_chunks(gcs_client, stub, video):
+    url = gcs_client.upload_file_resumable(video, "videos/visit.mp4", "video/mp4")
+
+    (session,) = stub.state.sessions.values()
+    assert url == f"gs://{gcs_client.GCS_BUCKET}/videos/visit.mp4"
+    assert bytes(session["data"]) == open(video, "rb").read()
+    assert chunk_starts(stub.state) == [0, CHUNK, 2 * CHUNK, 3 * CHUNK]
+    # Finished sessions are forgotten
+    assert json.load(open(gcs_client.SESSIONS_PATH)) == {}
+
+
+def test_resume_from_persisted_session(gcs_client, stub, video):
+    data = open(video, "rb").read()
+    size = len(data)
+
+    # Previous run stored two chunks, then the process died
+    path = "/upload/videos/visit.mp4/previous"
+    stub.state.create(path, size, stored=data[:2 * CHUNK])
+    key = f"videos/visit.mp4|{size}|{int(os.path.getmtime(video))}"
+    gcs_client._store_session(key, f"http://127.0.0.1:{stub.server_port}{path}")
+
+    gcs_client.upload_file_resumable(video, "videos/visit.mp4", "video/mp4")
+
+    # No new session, the offset is asked first and only the rest is sent
+    assert list(stub.state.sessions) == [path]
+    assert stub.state.requests[0][1:] == (f"bytes */{size}", 0)
+    assert chunk_starts(stub.state) == [2 * CHUNK, 3 * CHUNK]
+    assert bytes(stub.state.sessions[path]["data"]) == data
+
+
+def test_changed_file_does_not_resume_old_session(gcs_client, stub, video):
+    size = os.path.getsize(video)
+    gcs_client._store_session(f"videos/visit.mp4|{size}|0", f"http://127.0.0.1:{stub.server_port}/upload/stale")
+
+    gcs_client.upload_file_resumable(video, "videos/visit.mp4", "video/mp4")
+
+    assert "/upload/stale" not in [path for path, _, _ in stub.state.requests]
+    (session,) = stub.state.sessions.values()
+    assert bytes(session["data"]) == open(video, "rb").read()
+
+
+def test_failed_chunk_is_retried(gcs_client, stub, video):
+    stub.state.fail_once.add(CHUNK)
+
+    gcs_client.upload_file_resumable(video, "videos/visit.mp4", "video/mp4")
+
+    (session,) = stub.state.sessions.values()
+    assert bytes(session["data"]) == open(video, "rb").read()
+    assert chunk_starts(stub.state) == [0, CHUNK, CHUNK, 2 * CHUNK, 3 * CHUNK]
+
+    # The offset is re-read from GCS before the chunk is sent again
+    ranges = [content_range for _, content_range, _ in stub.state.requests]
+    retry = ranges.index(f"bytes {CHUNK}-{2 * CHUNK - 1}/{session['size']}")
+    assert ranges[retry + 1].startswith("bytes */")
+
+
+def test_upload_fails_after_retries(gcs_client, stub, video, monkeypatch):
+    monkeypatch.setattr(gcs_client, "CHUNK_RETRIES", 2)
+    key_prefix = "videos/visit.mp4|"
+
+    class AlwaysFail(set):
+        def __contains__(self, offset):
+            return offset == CHUNK
+
+        def discard(self, offset):
+            pass
+
+    stub.state.fail_once = AlwaysFail()
+
+    with pytest.raises(Exception):
+        gcs_client.upload_file_resumable(video, "videos/visit.mp4", "video/mp4")
+
+    # The session is kept for the next attempt
+    assert any(key.startswith(key_prefix) for key in json.load(open(gcs_client.SESSIONS_PATH)))
+
+
+def test_expired_session_starts_over(gcs_client, stub, video):
+    size = os.path.getsize(video)
+    key = f"videos/visit.mp4|{size}|{int(os.path.getmtime(video))}"
+    gcs_client._store_session(key, f"http://127.0.0.1:{stub.server_port}/upload/expired")
+
+    gcs_client.upload_file_resumable(video, "videos/visit.mp4", "video/mp4")
+
+    # The saved session was tried first, answered 404 and replaced
+    assert stub.state.requests[0][0] == "/upload/expired"
+    (session,) = stub.state.sessions.values()
+    assert bytes(session["data"]) == open(video, "rb").read()
+
+
+def test_throttled_upload_streams_chunks(gcs_client, stub, video):
+    from cloud.upload_scheduler import TokenBucket
+
+    # 100 MB/s: fast enough for the test, but every chunk goes through the bucket
+    gcs_client.upload_file_resumable(video, "videos/visit.mp4", "video/mp4", TokenBucket(100e6))
+
+    (session,) = stub.state.sessions.values()
+    assert bytes(session["data"]) == open(video, "rb").read()
+    # Content-Length was sent for every metered chunk
+    assert [length for _, content_range, length in stub.state.requests if "*" not in content_range] == \
+        [CHUNK, CHUNK, CHUNK, 1234]
@@ -0,0 +1,55 @@
+"""
+Visit confirmation window (visits/sliding_window.py) with a changing sampling rate.
+"""
+from visits.sliding_window import SlidingTimeWindow
+
+FPS = 25
+# PipelineConfig defaults
+WINDOW_SEC = 1.0
+CONFIRM_RATIO = 0.6
+IDLE_SKIP = 12
+
+
+def frame_time(frame_idx):
+    return frame_idx / FPS
+
+
+def confirmed(window):
+    return window.is_full() and window.ratio() >= CONFIRM_RATIO
+
+
+def test_constant_rate_ratio_is_share_of_samples():
+    window = SlidingTimeWindow(WINDOW_SEC, min_samples=3)
+
+    # 5 fps, 3 of 5 samples positive
+    for i, value in enumerate([True, False, True, True, False]):
+        window.append(frame_time(i * 5), value)
+
+    assert abs(window.ratio() - 3 / 5) < 1e-9
+
+
+def test_burst_after_idle_sample_does_not_confirm_at_once():
+    window = SlidingTimeWindow(WINDOW_SEC, min_samples=3)
+
+    # Idle sampling: every 12th frame, nothing found
+    for frame_idx in range(0, 3 * IDLE_SKIP, IDLE_SKIP):
+        window.append(frame_time(frame_idx), False)
+
+    # Motion: the step drops to 1 and the possum is seen in consecutive frames
+    first_positive = 3 * IDLE_SKIP
+    window.append(frame_time(first_positive), True)
+    window.append(frame_time(first_positive + 1), True)
+
+    # [F (0.48 s before), T, T (40 ms apart)] is 2 of 3 samples, but 80 ms of 560
+    assert window.is_full() and len(window) == 3
+    assert window.ratio() < CONFIRM_RATIO
+    assert not confirmed(window)
+
+    frame_idx = first_positive + 1
+    while not confirmed(window):
+        frame_idx += 1
+        window.append(frame_time(frame_idx), True)
+        assert frame_idx - first_positive < FPS, "never confirmed"
+
+    # About half a window of positive evidence is needed, not two frames
+    assert frame_time(frame_idx - first_positive) >= 0.45
@@ -0,0 +1,63 @@
+"""
+Persisted retries of failed media uploads (cloud/upload_scheduler.py).
+"""
+import json
+import time
+import threading
+
+from cloud.upload_scheduler import UploadRetryQueue
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_failed_job_is_retried_until_it_succeeds(tmp_path):
+    attempts = []
+
+    def upload(job):
+        attempts.append(job["visit_id"])
+        if len(attempts) == 1:
+            return False
+        if len(attempts) == 2:
+            raise OSError("GCS unavailable")
+        return True
+
+    retries = UploadRetryQueue(upload, str(tmp_path / "pending.json"), retry_delay_sec=0.05)
+    retries.add({"visit_id": 12})
+
+    wait_until(lambda: retries.queue_depth() == 0)
+    assert attempts == [12, 12, 12]
+    assert json.load(open(tmp_path / "pending.json")) == []
+
+
+def test_job_waits_for_retry_delay(tmp_path):
+    attempted = threading.Event()
+
+    retries = UploadRetryQueue(lambda job: attempted.set() or True, str(tmp_path / "pending.json"),
+                               retry_delay_sec=60)
+    retries.add({"visit_id": 12})
+
+    assert not attempted.wait(0.2)
+    assert retries.queue_depth() == 1
+
+
+def test_pending_jobs_survive_a_restart(tmp_path):
+    state_path = str(tmp_path / "pending.json")
+
+    UploadRetryQueue(lambda job: False, state_path, retry_delay_sec=60).add({"visit_id": 12})
+    stored = json.load(open(state_path))
+    assert [job["visit_id"] for job in stored] == [12]
+
+    # The next process picks the job up once it is due
+    stored[0]["not_before"] = 0
+    json.dump(stored, open(state_path, "w"))
+    uploaded = []
+
+    retries = UploadRetryQueue(lambda job: uploaded.append(job["visit_id"]) or True, state_path)
+
+    wait_until(lambda: retries.queue_depth() == 0)
+    assert uploaded == [12]
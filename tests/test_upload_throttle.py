@@ -0,0 +1,53 @@
+"""
+Bandwidth cap of deferred video uploads (cloud/upload_scheduler.py).
+"""
+import io
+import time
+
+from cloud.upload_scheduler import TokenBucket, ThrottledReader, THROTTLE_BLOCK_SIZE
+
+
+class RecordingBucket:
+    def __init__(self):
+        self.consumed = []
+
+    def consume(self, amount):
+        self.consumed.append(amount)
+
+
+def test_reader_meters_every_block():
+    data = bytes(range(256)) * 1024
+    f = io.BytesIO(data)
+    f.seek(1000)
+    throttle = RecordingBucket()
+
+    reader = ThrottledReader(f, 200000, throttle)
+    assert len(reader) == 200000
+
+    # http.client reads the body in its own block size
+    received = b"".join(iter(lambda: reader.read(1024 * 1024), b""))
+
+    assert received == data[1000:201000]
+    assert sum(throttle.consumed) == 200000
+    assert max(throttle.consumed) <= THROTTLE_BLOCK_SIZE
+
+
+def test_reader_read_all_is_metered():
+    throttle = RecordingBucket()
+    reader = ThrottledReader(io.BytesIO(b"x" * 150000), 150000, throttle)
+
+    assert reader.read() == b"x" * 150000
+    assert max(throttle.consumed) <= THROTTLE_BLOCK_SIZE
+
+
+def test_token_bucket_holds_rate_within_a_transfer():
+    # 1 MB/s with a one-block burst: 256 KiB take about 0.2 s, not one burst
+    throttle = TokenBucket(1000 * 1000, THROTTLE_BLOCK_SIZE)
+    reader = ThrottledReader(io.BytesIO(b"x" * 256 * 1024), 256 * 1024, throttle)
+
+    start = time.monotonic()
+    while reader.read(16 * 1024):
+        pass
+    elapsed = time.monotonic() - start
+
+    assert elapsed >= (256 - 64) * 1024 / 1e6 * 0.9
@@ -0,0 +1,122 @@
+"""
+V4 signed URLs of possum_api (URL_SIGNER=key) checked against an
+independently built canonical request and a throwaway RSA key.
+"""
+import os
+import sys
+import json
+import hashlib
+import binascii
+from urllib.parse import urlsplit, parse_qsl, quote
+
+import pytest
+
+from conftest import REPO_ROOT
+
+storage = pytest.importorskip("google.cloud.storage")
+pytest.importorskip("google.oauth2.service_account")
+rsa = pytest.importorskip("cryptography.hazmat.primitives.asymmetric.rsa")
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+
+sys.path.append(os.path.join(REPO_ROOT, "api", "possum_api"))
+from signing import SIGNED_URL_EXPIRATION, load_signing_credentials, key_signed_url, fake_signed_url
+
+CLIENT_EMAIL = "possum-signer@possum-test.iam.gserviceaccount.com"
+BUCKET = "possum-media"
+BLOB = "2026-01-01/visit_12/video 1.mp4"
+
+
+@pytest.fixture(scope="module")
+def private_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def credentials(private_key, tmp_path):
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ).decode()
+
+    key_file = tmp_path / "signing_key.json"
+    key_file.write_text(json.dumps({
+        "type": "service_account",
+        "project_id": "possum-test",
+        "private_key_id": "test-key",
+        "private_key": pem,
+        "client_email": CLIENT_EMAIL,
+        "client_id": "1",
+        "token_uri": "https://oauth2.googleapis.com/token"
+    }))
+
+    return load_signing_credentials(str(key_file))
+
+
+@pytest.fixture
+def signed_url(credentials):
+    client = storage.Client(project="possum-test", credentials=credentials)
+    return key_signed_url(client, BUCKET, BLOB, credentials)
+
+
+def canonical_request(url):
+    """
+    Canonical request of a V4 GET URL as defined by the GCS signing spec.
+    """
+    parts = urlsplit(url)
+    params = sorted((k, v) for k, v in parse_qsl(parts.query) if k != "X-Goog-Signature")
+    query = "&".join(f"{quote(k, safe='')}={quote(v, safe='')}" for k, v in params)
+
+    return "\n".join([
+        "GET",
+        parts.path,
+        query,
+        f"host:{parts.netloc}",
+        "",
+        "host",
+        "UNSIGNED-PAYLOAD"
+    ])
+
+
+def test_v4_query_parameters(signed_url):
+    parts = urlsplit(signed_url)
+    params = dict(parse_qsl(parts.query))
+    request_date = params["X-Goog-Date"]
+
+    assert parts.netloc == "storage.googleapis.com"
+    assert parts.path == f"/{BUCKET}/{quote(BLOB)}"
+    assert params["X-Goog-Algorithm"] == "GOOG4-RSA-SHA256"
+    assert params["X-Goog-Credential"] == f"{CLIENT_EMAIL}/{request_date[:8]}/auto/storage/goog4_request"
+    assert params["X-Goog-Expires"] == str(int(SIGNED_URL_EXPIRATION.total_seconds()))
+    assert params["X-Goog-SignedHeaders"] == "host"
+    assert len(request_date) == 16 and request_date.endswith("Z")
+
+
+def test_v4_signature_matches_key(signed_url, private_key):
+    params = dict(parse_qsl(urlsplit(signed_url).query))
+    request_date = params["X-Goog-Date"]
+    scope = f"{request_date[:8]}/auto/storage/goog4_request"
+
+    string_to_sign = "\n".join([
+        "GOOG4-RSA-SHA256",
+        request_date,
+        scope,
+        hashlib.sha256(canonical_request(signed_url).encode()).hexdigest()
+    ]).encode()
+
+    signature = binascii.unhexlify(params["X-Goog-Signature"])
+
+    # Raises InvalidSignature if the URL was not signed over this canonical request
+    private_key.public_key().verify(signature, string_to_sign, padding.PKCS1v15(), hashes.SHA256())
+    # PKCS#1 v1.5 is deterministic: the same key gives the same signature
+    assert signature == private_key.sign(string_to_sign, padding.PKCS1v15(), hashes.SHA256())
+
+
+def test_fake_signed_url_shape():
+    url = fake_signed_url(BUCKET, BLOB)
+    params = dict(parse_qsl(urlsplit(url).query))
+
+    assert urlsplit(url).path == f"/{BUCKET}/{quote(BLOB)}"
+    assert params["X-Goog-Algorithm"] == "FAKE"
+    assert params["X-Goog-Expires"] == str(int(SIGNED_URL_EXPIRATION.total_seconds()))
@@ -0,0 +1,340 @@
+"""
+Streaming transcode of the video processor (api/video_processor/main.py,
+process_streaming) against a local stand-in for the GCS JSON API: ranged
+media downloads, resumable upload sessions with generation preconditions
+and session cancellation. Needs ffmpeg and ffprobe on PATH.
+"""
+import os
+import re
+import json
+import base64
+import shutil
+import hashlib
+import threading
+import subprocess
+import importlib.util
+from urllib.parse import urlsplit, parse_qs, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import pytest
+
+from conftest import REPO_ROOT
+
+pytest.importorskip("fastapi")
+storage = pytest.importorskip("google.cloud.storage")
+google_crc32c = pytest.importorskip("google_crc32c")
+from google.auth.credentials import AnonymousCredentials
+
+if not (shutil.which("ffmpeg") and shutil.which("ffprobe")):
+    pytest.skip("ffmpeg and ffprobe are required", allow_module_level=True)
+
+PROCESSOR_DIR = os.path.join(REPO_ROOT, "api", "video_processor")
+BUCKET = "possum-videos"
+OBJECT = "visits/visit_12/visit.mp4"
+CHUNK = 256 * 1024
+
+
+class StubGCS:
+    """
+    Server side state: objects as name -> dict(generation, data, metadata)
+    and resumable sessions as id -> dict(name, metadata, precondition, data, state).
+    `on_chunk` is called for every uploaded chunk before it is stored.
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.sessions = {}
+        self.next_generation = 1000
+        self.requests = []
+        self.on_chunk = None
+        self.lock = threading.Lock()
+
+    def put_object(self, name, data, metadata=None):
+        self.next_generation += 1
+        self.objects[name] = {"generation": self.next_generation, "data": data, "metadata": metadata or {}}
+
+    def resource(self, name):
+        obj = self.objects[name]
+        data = obj["data"]
+        return {
+            "bucket": BUCKET,
+            "name": name,
+            "generation": str(obj["generation"]),
+            "metageneration": "1",
+            "size": str(len(data)),
+            "contentType": "video/mp4",
+            "metadata": obj["metadata"],
+            "crc32c": base64.b64encode(google_crc32c.value(data).to_bytes(4, "big")).decode(),
+            "md5Hash": base64.b64encode(hashlib.md5(data).digest()).decode()
+        }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        state = self.server.state
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+
+        metadata = re.fullmatch(r"/storage/v1/b/[^/]+/o/(.+)", parts.path)
+        media = re.fullmatch(r"/download/storage/v1/b/[^/]+/o/(.+)", parts.path)
+
+        with state.lock:
+            name = unquote((metadata or media).group(1)) if metadata or media else None
+            obj = state.objects.get(name)
+
+            if obj is None:
+                return self.reply(404)
+            if metadata:
+                return self.reply(200, json.dumps(state.resource(name)).encode(), {"Content-Type": "application/json"})
+
+            generation = query.get("generation", [None])[0]
+            if generation is not None and int(generation) != obj["generation"]:
+                return self.reply(404)
+
+            data = obj["data"]
+
+        byte_range = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if byte_range is None:
+            return self.reply(200, data)
+
+        start = int(byte_range.group(1))
+        end = min(int(byte_range.group(2) or len(data) - 1), len(data) - 1)
+        if start >= len(data):
+            return self.reply(416, headers={"Content-Range": f"bytes */{len(data)}"})
+
+        return self.reply(206, data[start:end + 1], {"Content-Range": f"bytes {start}-{end}/{len(data)}"})
+
+    def do_POST(self):
+        state = self.server.state
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+        with state.lock:
+            session_id = str(len(state.sessions))
+            precondition = query.get("ifGenerationMatch", [None])[0]
+            state.sessions[session_id] = {
+                "name": body.get("name") or query["name"][0],
+                "metadata": body.get("metadata") or {},
+                "precondition": None if precondition is None else int(precondition),
+                "data": bytearray(),
+                "state": "open"
+            }
+
+        self.reply(200, headers={"Location": f"http://127.0.0.1:{self.server.server_port}/upload/session/{session_id}"})
+
+    def do_PUT(self):
+        state = self.server.state
+        session_id = self.path.rsplit("/", 1)[-1]
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        content_range = self.headers["Content-Range"]
+
+        if body and state.on_chunk is not None:
+            state.on_chunk()
+
+        with state.lock:
+            session = state.sessions[session_id]
+            if session["state"] != "open":
+                return self.reply(404)
+
+            match = re.fullmatch(r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)", content_range)
+            if match.group(1) is not None:
+                session["data"][int(match.group(1)):int(match.group(2)) + 1] = body
+
+            total = match.group(3)
+            if total == "*" or len(session["data"]) < int(total):
+                stored = len(session["data"])
+                return self.reply(308, headers={"Range": f"bytes=0-{stored - 1}"} if stored else {})
+
+            current = state.objects.get(session["name"])
+            if session["precondition"] is not None and (current or {}).get("generation", 0) != session["precondition"]:
+                return self.reply(412)
+
+            session["state"] = "finalized"
+            state.put_object(session["name"], bytes(session["data"]), session["metadata"])
+            resource = state.resource(session["name"])
+
+        self.reply(200, json.dumps(resource).encode(), {"Content-Type": "application/json"})
+
+    def do_DELETE(self):
+        state = self.server.state
+
+        with state.lock:
+            session = state.sessions.get(self.path.rsplit("/", 1)[-1])
+            if session is not None and session["state"] == "open":
+                session["state"] = "cancelled"
+
+        # GCS answers a cancelled resumable upload with 499
+        self.reply(499)
+
+    def reply(self, status, body=b"", headers=None):
+        self.server.state.requests.append((self.command, urlsplit(self.path).path, status))
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        try:
+            self.wfile.write(body)
+        except ConnectionError:
+            # ffmpeg and ffprobe drop ranged reads they no longer need
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.state = StubGCS()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def processor(monkeypatch):
+    """
+    api/video_processor/main.py loaded under its own name (possum_api has a main.py too).
+    """
+    monkeypatch.syspath_prepend(PROCESSOR_DIR)
+
+    spec = importlib.util.spec_from_file_location("video_processor_main", os.path.join(PROCESSOR_DIR, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+
+    # The module creates its client from default credentials at import time
+    with mock.patch.object(storage, "Client"):
+        spec.loader.exec_module(module)
+
+    monkeypatch.setattr(module, "CHUNK_SIZE", CHUNK)
+    monkeypatch.setattr(module, "ENCODE_POLICY", "speed")
+    monkeypatch.setattr(module, "get_access_token", lambda: "test-token")
+
+    return module
+
+
+@pytest.fixture
+def bucket(stub):
+    client = storage.Client(
+        project="possum-test",
+        credentials=AnonymousCredentials(),
+        client_options={"api_endpoint": f"http://127.0.0.1:{stub.server_port}"}
+    )
+    return client.bucket(BUCKET)
+
+
+def make_video(path, source, codec_args, seconds=1):
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", source, "-t", str(seconds), *codec_args, path],
+        check=True
+    )
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def probe(path):
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-print_format", "json", "-show_streams", "-count_frames", path],
+        check=True, capture_output=True
+    )
+    return json.loads(result.stdout)["streams"][0]
+
+
+def assert_playable(data, tmp_path, frames):
+    path = str(tmp_path / "output.mp4")
+    with open(path, "wb") as f:
+        f.write(data)
+
+    stream = probe(path)
+    assert stream["codec_name"] == "h264"
+    assert stream["pix_fmt"] == "yuv420p"
+    assert int(stream["nb_read_frames"]) == frames
+
+    # Decodes from start to end without errors
+    decode = subprocess.run(["ffmpeg", "-v", "error", "-i", path, "-f", "null", "-"], capture_output=True)
+    assert decode.returncode == 0 and not decode.stderr
+
+
+def test_transcode_from_pipe_finalizes_upload(processor, stub, bucket, tmp_path):
+    # MPEG-4 part 2 with the index at the start: transcoded, read through a pipe
+    original = make_video(
+        str(tmp_path / "input.mp4"), "testsrc=size=160x120:rate=25",
+        ["-c:v", "mpeg4", "-movflags", "+faststart"]
+    )
+    stub.state.put_object(OBJECT, original)
+    original_generation = stub.state.objects[OBJECT]["generation"]
+
+    blob = bucket.get_blob(OBJECT)
+    assert processor.process_streaming(bucket, blob) == "transcode"
+
+    (session,) = stub.state.sessions.values()
+    stored = stub.state.objects[OBJECT]
+    assert session["state"] == "finalized"
+    # Only the processed generation may be replaced
+    assert session["precondition"] == original_generation
+    assert stored["generation"] != original_generation
+    assert stored["metadata"] == {"processed": "true"}
+
+    assert_playable(stored["data"], tmp_path, frames=25)
+
+
+def test_remux_over_http_finalizes_upload(processor, stub, bucket, tmp_path):
+    # H.264 with the index at the end (like OpenCV recordings): remuxed, read over HTTP
+    original = make_video(
+        str(tmp_path / "input.mp4"), "testsrc=size=160x120:rate=25",
+        ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p"], seconds=2
+    )
+    stub.state.put_object(OBJECT, original)
+
+    blob = bucket.get_blob(OBJECT)
+    assert processor.process_streaming(bucket, blob) == "remux"
+
+    (session,) = stub.state.sessions.values()
+    assert session["state"] == "finalized"
+    assert stub.state.objects[OBJECT]["data"] != original
+
+    assert_playable(stub.state.objects[OBJECT]["data"], tmp_path, frames=50)
+
+
+def test_ffmpeg_failure_cancels_upload(processor, stub, bucket, tmp_path, monkeypatch):
+    # Noise does not compress: the output spans many upload chunks
+    original = make_video(
+        str(tmp_path / "input.mp4"), "nullsrc=size=320x240:rate=25,geq=random(1)*255:128:128",
+        ["-c:v", "mpeg4", "-q:v", "2", "-movflags", "+faststart"], seconds=2
+    )
+    stub.state.put_object(OBJECT, original)
+    original_generation = stub.state.objects[OBJECT]["generation"]
+
+    encoders = []
+    popen = subprocess.Popen
+
+    def record_popen(command, *args, **kwargs):
+        process = popen(command, *args, **kwargs)
+        if command[0] == "ffmpeg":
+            encoders.append(process)
+        return process
+
+    monkeypatch.setattr(subprocess, "Popen", record_popen)
+
+    # ffmpeg dies (e.g. out of memory) after the first chunk was uploaded
+    stub.state.on_chunk = lambda: encoders[-1].kill()
+
+    blob = bucket.get_blob(OBJECT)
+    with pytest.raises(subprocess.CalledProcessError):
+        processor.process_streaming(bucket, blob)
+
+    (session,) = stub.state.sessions.values()
+    assert session["state"] == "cancelled"
+    assert ("DELETE", "/upload/session/0", 499) in stub.state.requests
+    # The original generation is untouched
+    assert stub.state.objects[OBJECT]["generation"] == original_generation
+    assert stub.state.objects[OBJECT]["data"] == original
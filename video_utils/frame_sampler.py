@@ -0,0 +1,129 @@
+import logging
+import math
+import time
+from contextlib import contextmanager
+
+
+class AdaptiveFrameSampler:
+    """
+    Decides which frames of the stream are sent through motion detection and the CNN.
+
+    The sampling step (process every N-th frame) depends on scene activity:
+    - active (motion or open visit): every `active_skip`-th frame
+    - normal: every `base_skip`-th frame
+    - idle for longer than `idle_after_sec`: every `idle_skip`-th frame
+
+    If the measured processing time of a sample is longer than the time
+    covered by the current step, the step is increased so the pipeline
+    does not fall behind the live stream.
+    """
+
+    def __init__(
+        self,
+        fps,
+        base_skip=5,
+        active_skip=1,
+        idle_skip=12,
+        max_skip=25,
+        idle_after_sec=10.0,
+        smoothing=0.2,
+        backoff=True
+    ):
+        self.fps = fps if fps and fps > 0 else 25
+        self.base_skip = base_skip
+        self.active_skip = active_skip
+        self.idle_skip = idle_skip
+        self.max_skip = max_skip
+        self.idle_after_sec = idle_after_sec
+        # Weight of the newest measurement in the processing time moving average
+        self.smoothing = smoothing
+        # Disable to keep sampling independent of processing speed (offline replay)
+        self.backoff = backoff
+
+        self.skip = base_skip
+        self.next_frame_idx = 0
+        self.last_frame_idx = None
+        self.last_active_frame = None
+        self.active = False
+        self.avg_processing_sec = None
+
+    def set_fps(self, fps):
+        """
+        Updates stream FPS (e.g. after camera reconnect).
+        """
+        if fps and fps > 0:
+            self.fps = fps
+
+    def frame_time(self, frame_idx):
+        """
+        Converts a frame index into stream time in seconds.
+        """
+        return frame_idx / self.fps
+
+    def should_process(self, frame_idx):
+        """
+        Returns True if this frame has to be processed.
+        """
+        if frame_idx < self.next_frame_idx:
+            return False
+
+        self.last_frame_idx = frame_idx
+        return True
+
+    def set_activity(self, active):
+        """
+        Marks the current sample as active (motion detected or visit in progress).
+        """
+        self.active = active
+        if active:
+            self.last_active_frame = self.last_frame_idx
+
+    @contextmanager
+    def measure(self):
+        """
+        Measures processing time of the current sample and schedules the next one.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.update(time.perf_counter() - start)
+
+    def update(self, processing_sec):
+        """
+        Recalculates the sampling step after a processed frame.
+        """
+        if self.avg_processing_sec is None:
+            self.avg_processing_sec = processing_sec
+        else:
+            self.avg_processing_sec = (
+                self.smoothing * processing_sec +
+                (1 - self.smoothing) * self.avg_processing_sec
+            )
+
+        if self.active:
+            target_skip = self.active_skip
+        elif self._idle_for_sec() >= self.idle_after_sec:
+            target_skip = self.idle_skip
+        else:
+            target_skip = self.base_skip
+
+        # Number of frames arriving while one sample is being processed
+        budget_skip = math.ceil(self.avg_processing_sec * self.fps) if self.backoff else 1
+
+        new_skip = min(self.max_skip, max(1, target_skip, budget_skip))
+
+        if new_skip != self.skip:
+            logging.info(
+                f"Sampling step changed {self.skip} -> {new_skip} "
+                f"(active={self.active}, avg processing={self.avg_processing_sec * 1000:.1f} ms)"
+            )
+            self.skip = new_skip
+
+        self.next_frame_idx = self.last_frame_idx + self.skip
+
+    def _idle_for_sec(self):
+        if self.last_active_frame is None:
+            return self.frame_time(self.last_frame_idx)
+
+        return self.frame_time(self.last_frame_idx - self.last_active_frame)
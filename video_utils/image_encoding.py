@@ -0,0 +1,69 @@
+import os
+import cv2
+from dataclasses import dataclass
+
+# PARAMETERS
+# OpenCV quality flag, file extension and MIME type per format
+FORMATS = {
+    "jpeg": (cv2.IMWRITE_JPEG_QUALITY, ".jpg", "image/jpeg"),
+    "webp": (cv2.IMWRITE_WEBP_QUALITY, ".webp", "image/webp")
+}
+
+
+@dataclass
+class ImageEncoding:
+    format: str = "jpeg"    # "jpeg" or "webp"
+    quality: int = 90       # 1-100 for both formats
+    max_dim: int = 0        # Downscale so the longest side fits (0 = original size)
+
+    def __post_init__(self):
+        if self.format not in FORMATS:
+            raise ValueError(f"Unknown image format {self.format!r}, expected one of {sorted(FORMATS)}")
+
+    @property
+    def extension(self):
+        return FORMATS[self.format][1]
+
+    @property
+    def content_type(self):
+        return FORMATS[self.format][2]
+
+    def params(self):
+        return [FORMATS[self.format][0], self.quality]
+
+    def filename(self, name):
+        """
+        Replaces the extension of `name` with the one of this format.
+        """
+        return os.path.splitext(name)[0] + self.extension
+
+
+def build_policy(image_format="jpeg", frame_quality=85, roi_quality=90, crop_quality=95, frame_max_dim=0):
+    """
+    Encoding per artefact type:
+    - frame: full visit frames (largest files, stored and uploaded)
+    - roi: possum crops of a visit (website thumbnails)
+    - crop: training crops (kept at high quality, never resized)
+    """
+    return {
+        "frame": ImageEncoding(image_format, frame_quality, frame_max_dim),
+        "roi": ImageEncoding(image_format, roi_quality),
+        "crop": ImageEncoding(image_format, crop_quality)
+    }
+
+
+def encode_image(image, encoding):
+    """
+    Resizes (if max_dim is set) and encodes an image. Returns bytes.
+    """
+    if encoding.max_dim:
+        h, w = image.shape[:2]
+        scale = encoding.max_dim / max(h, w)
+        if scale < 1:
+            image = cv2.resize(image, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+
+    ok, encoded = cv2.imencode(encoding.extension, image, encoding.params())
+    if not ok:
+        raise RuntimeError(f"Image encoding failed ({encoding.format})")
+
+    return encoded.tobytes()
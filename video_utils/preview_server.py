@@ -0,0 +1,121 @@
+import cv2
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BOUNDARY = "frame"
+
+
+def draw_detections(frame, bboxes, possum_indices):
+    """
+    Returns a copy of the frame with bounding boxes drawn.
+    Green = possum, Red = other motion.
+    """
+    display_frame = frame.copy()
+
+    for i, (x1, y1, x2, y2) in enumerate(bboxes):
+        color = (0, 255, 0) if i in possum_indices else (0, 0, 255)
+        cv2.rectangle(display_frame, (x1, y1), (x2, y2), color, 2)
+
+    return display_frame
+
+
+class PreviewServer:
+    """
+    Low-rate debug preview served as MJPEG over HTTP.
+
+    The detection loop only copies and draws a frame when a client is
+    connected and the preview interval has passed, JPEG encoding is done
+    in the HTTP handler threads.
+    Open http://127.0.0.1:<port>/ in a browser to watch the stream.
+    """
+
+    def __init__(self, port, max_fps=2, host="127.0.0.1", jpeg_quality=70):
+        self.interval = 1.0 / max_fps if max_fps > 0 else 1.0
+        self.jpeg_quality = jpeg_quality
+        self.clients = 0
+        self.last_publish = 0.0
+        self.frame = None
+        self.frame_id = 0
+        self.condition = threading.Condition()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._stream(self)
+
+            def log_message(self, format, *args):
+                # Keep HTTP access logs out of the pipeline log
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+        threading.Thread(
+            target=self.httpd.serve_forever,
+            daemon=True
+        ).start()
+
+        logging.info(f"Debug preview available at http://{host}:{port}/")
+
+    def wants_frame(self):
+        """
+        True if a client is watching and a new preview frame is due.
+        """
+        return self.clients > 0 and time.monotonic() - self.last_publish >= self.interval
+
+    def publish(self, frame):
+        """
+        Hands an annotated frame over to connected clients.
+        """
+        self.last_publish = time.monotonic()
+
+        with self.condition:
+            self.frame = frame
+            self.frame_id += 1
+            self.condition.notify_all()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _stream(self, handler):
+        handler.send_response(200)
+        handler.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+
+        with self.condition:
+            self.clients += 1
+
+        last_sent = 0
+
+        try:
+            while True:
+                with self.condition:
+                    # Wait for a frame newer than the last one sent
+                    self.condition.wait_for(lambda: self.frame_id != last_sent, timeout=5)
+                    if self.frame_id == last_sent:
+                        continue
+                    frame = self.frame
+                    last_sent = self.frame_id
+
+                ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                if not ok:
+                    continue
+
+                handler.wfile.write(f"--{BOUNDARY}\r\n".encode())
+                handler.wfile.write(b"Content-Type: image/jpeg\r\n")
+                handler.wfile.write(f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                handler.wfile.write(jpeg.tobytes())
+                handler.wfile.write(b"\r\n")
+
+        except (BrokenPipeError, ConnectionResetError):
+            # Client closed the page
+            pass
+
+        finally:
+            with self.condition:
+                self.clients -= 1
@@ -1,6 +1,7 @@
 import cv2
 import logging
 import time
+from datetime import datetime, timedelta
 
 # Function to initialise RTSP video stream capture and retrieve FPS
 def initialise_video_capture(rtsp_url):
@@ -21,3 +22,83 @@ def initialise_video_capture(rtsp_url):
 
     return cap, fps
 
+
+class RtspSource:
+    """
+    Live camera stream source with reconnect logic.
+    """
+    is_live = True
+
+    def __init__(self, rtsp_url, reconnect_delay=2):
+        self.rtsp_url = rtsp_url
+        self.reconnect_delay = reconnect_delay
+        self.cap, self.fps = initialise_video_capture(rtsp_url)
+
+    def read(self):
+        return self.cap.read()
+
+    def frame_timestamp(self, frame_idx):
+        # Live stream: wall clock time of the frame
+        return datetime.now()
+
+    def reconnect(self):
+        """
+        Reopens the stream. Returns True if reading can continue.
+        """
+        logging.info("Frame not received. Reconnecting...")
+        self.release()
+        # Wait before reconnect attempt
+        time.sleep(self.reconnect_delay)
+        self.cap, self.fps = initialise_video_capture(self.rtsp_url)
+        return True
+
+    def release(self):
+        try:
+            self.cap.release()
+        except Exception:
+            pass
+
+
+class VideoFileSource:
+    """
+    Recorded video file source.
+
+    If `start_time` is given, frame timestamps are derived from the frame
+    index (stream time), otherwise the wall clock is used like a live feed.
+    """
+    is_live = False
+
+    def __init__(self, video_path, start_time=None):
+        self.video_path = video_path
+        self.start_time = start_time
+        self.cap = cv2.VideoCapture(video_path)
+
+        if not self.cap.isOpened():
+            raise IOError(f"Cannot open video file: {video_path}")
+
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 0 else 25
+
+    def read(self):
+        return self.cap.read()
+
+    def duration_sec(self):
+        """
+        Length of the video from its frame count (0 if the container doesn't store it).
+        """
+        frame_count = self.cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        return frame_count / self.fps if frame_count and frame_count > 0 else 0
+
+    def frame_timestamp(self, frame_idx):
+        if self.start_time is None:
+            return datetime.now()
+
+        return self.start_time + timedelta(seconds=frame_idx / self.fps)
+
+    def reconnect(self):
+        # End of file, nothing to reconnect to
+        logging.info("Video ended.")
+        return False
+
+    def release(self):
+        self.cap.release()
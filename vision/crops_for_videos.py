@@ -1,18 +1,37 @@
 import cv2
 import os
+import csv
+import argparse
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Run from the project root as a module: python -m vision.crops_for_videos
+from video_utils.image_encoding import ImageEncoding, encode_image
 
 # PARAMETERS 
 PADDING_RATIO = 0.3  # additional padding around detected motion
 MIN_AREA = 400       # minimum area of contour to be considered a valid motion
 KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (9, 9))  # kernel for morphological operations
+# Columns of the crop manifest CSV
+MANIFEST_FIELDS = ["source_video", "crop_path", "frame_idx", "roi_idx", "x1", "y1", "x2", "y2"]
+# Training crops are kept at high quality (same default as the "crop" tier of the live pipeline)
+CROP_ENCODING = ImageEncoding("jpeg", 95)
+
+
+def create_bg_subtractor():
+    """
+    Creates a new background subtractor for motion detection.
+    Each video stream needs its own instance, background state must not be shared.
+    """
+    return cv2.createBackgroundSubtractorMOG2(
+        history=500,        # number of frames for background history
+        varThreshold=25,    # threshold on pixel variance to consider it foreground
+        detectShadows=False # do not detect shadows
+    )
+
 
 # Background subtractor for motion detection
-BG_SUBTRACTOR = cv2.createBackgroundSubtractorMOG2(
-    history=500,        # number of frames for background history
-    varThreshold=25,    # threshold on pixel variance to consider it foreground
-    detectShadows=False # do not detect shadows
-)
+BG_SUBTRACTOR = create_bg_subtractor()
 
 
 def get_crops_from_frame(frame, bg_subtractor=BG_SUBTRACTOR, min_area=MIN_AREA, padding_ratio=PADDING_RATIO, kernel=KERNEL):
@@ -101,7 +120,34 @@ def get_crops_from_frame(frame, bg_subtractor=BG_SUBTRACTOR, min_area=MIN_AREA,
     return rois, bboxes
 
 
-def save_debug_frame(frame, bboxes, debug_path):
+class MotionDetector:
+    """
+    Motion detection stage with its own background subtractor.
+    Calling it with a frame returns (rois, bboxes).
+    """
+
+    def __init__(self, min_area=MIN_AREA, padding_ratio=PADDING_RATIO, kernel=KERNEL):
+        self.bg_subtractor = create_bg_subtractor()
+        self.min_area = min_area
+        self.padding_ratio = padding_ratio
+        self.kernel = kernel
+
+    def __call__(self, frame):
+        return get_crops_from_frame(
+            frame,
+            bg_subtractor=self.bg_subtractor,
+            min_area=self.min_area,
+            padding_ratio=self.padding_ratio,
+            kernel=self.kernel
+        )
+
+
+def save_image(path, image, encoding=CROP_ENCODING):
+    with open(path, "wb") as f:
+        f.write(encode_image(image, encoding))
+
+
+def save_debug_frame(frame, bboxes, debug_path, encoding=CROP_ENCODING):
     """
     Draw bounding boxes on the frame for visualization and save the debug image.
     """
@@ -110,13 +156,30 @@ def save_debug_frame(frame, bboxes, debug_path):
     for (x1, y1, x2, y2) in bboxes:
         # Draw a green rectangle (color=(0,255,0)) with thickness=2
         cv2.rectangle(debug_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-    cv2.imwrite(debug_path, debug_frame)
-
-
-def process_video(video_path, output_dir, skip_frames=10, min_area=MIN_AREA, save_to_disk=True):
+    save_image(debug_path, debug_frame, encoding)
+
+
+def process_video(
+    video_path,
+    output_dir,
+    skip_frames=10,
+    min_area=MIN_AREA,
+    save_to_disk=True,
+    start_frame=0,
+    end_frame=None,
+    warmup_frames=0,
+    save_debug=True,
+    encoding=CROP_ENCODING
+):
     """
     Process a video file and extract crops from motion detection.
 
+    Every call uses its own background subtractor, so background state does not
+    leak between videos. A segment [start_frame, end_frame) can be processed
+    separately: `warmup_frames` before the segment are fed to the subtractor
+    without saving crops so the background model is ready at start_frame.
+
+    Returns manifest rows if save_to_disk=True, otherwise (rois, bboxes).
     """
     # Extract video file name without extension for creating output directories
     # (root, ext)
@@ -125,37 +188,70 @@ def process_video(video_path, output_dir, skip_frames=10, min_area=MIN_AREA, sav
         video_output_dir = os.path.join(output_dir, video_name)
         os.makedirs(video_output_dir, exist_ok=True)
         debug_dir = os.path.join(video_output_dir, "debug")
-        os.makedirs(debug_dir, exist_ok=True)
+        if save_debug:
+            os.makedirs(debug_dir, exist_ok=True)
+
+    detector = MotionDetector(min_area=min_area)
 
     # Open video file
     cap = cv2.VideoCapture(video_path)
     # Initialize frame and crop indices
-    frame_idx = 0
+    frame_idx = max(0, start_frame - warmup_frames)
+    if frame_idx > 0:
+        # Jump to the beginning of the warm-up part of the segment
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+
     crop_idx = 0
     rois_all = []    # only used if save_to_disk=False
     bboxes_all = []
+    manifest = []    # only used if save_to_disk=True
 
     while True:
+        # Stop at the end of the segment
+        if end_frame is not None and frame_idx >= end_frame:
+            break
         # ret: boolean flag, True if the frame was successfully read, False if end of video or error
         # frame: the actual frame/image as a numpy array with shape (height, width, channels)
         ret, frame = cap.read()
         if not ret:
             break
+
+        # Warm-up frames only update the background model (same sampling as the segment)
+        if frame_idx < start_frame:
+            if frame_idx % skip_frames == 0:
+                detector(frame)
+            frame_idx += 1
+            continue
+
         # Apply frame skipping: only process every N-th frame
         if frame_idx % skip_frames == 0:
                     # Extract ROIs and bounding boxes from current frame
-                    rois, bboxes = get_crops_from_frame(frame)
+                    rois, bboxes = detector(frame)
 
                     if save_to_disk:
                         # save each ROI to disk
                         for i, roi in enumerate(rois):
-                            crop_name = f"frame_{frame_idx:06d}_roi_{i}.jpg"
-                            cv2.imwrite(os.path.join(video_output_dir, crop_name), roi)
+                            crop_name = encoding.filename(f"frame_{frame_idx:06d}_roi_{i}")
+                            crop_path = os.path.join(video_output_dir, crop_name)
+                            save_image(crop_path, roi, encoding)
                             crop_idx += 1
 
+                            x1, y1, x2, y2 = bboxes[i]
+                            manifest.append({
+                                "source_video": video_path,
+                                "crop_path": crop_path,
+                                "frame_idx": frame_idx,
+                                "roi_idx": i,
+                                "x1": x1,
+                                "y1": y1,
+                                "x2": x2,
+                                "y2": y2
+                            })
+
                         # save debug frame
-                        debug_name = f"frame_{frame_idx:06d}.jpg"
-                        save_debug_frame(frame, bboxes, os.path.join(debug_dir, debug_name))
+                        if save_debug:
+                            debug_name = encoding.filename(f"frame_{frame_idx:06d}")
+                            save_debug_frame(frame, bboxes, os.path.join(debug_dir, debug_name), encoding)
                     else:
                         # keep ROIs in memory
                         rois_all.extend(rois)
@@ -165,25 +261,136 @@ def process_video(video_path, output_dir, skip_frames=10, min_area=MIN_AREA, sav
     # Release the video capture object
     cap.release()
     if save_to_disk:
-        print(f"Processed {video_name}, saved {crop_idx} crops")
+        print(f"Processed {video_name} frames {start_frame}-{frame_idx}, saved {crop_idx} crops")
+        return manifest
     else:
         return rois_all, bboxes_all
 
 
-# MAIN SCRIPT
-if __name__ == "__main__":
-    VIDEO_DIR = "videos"
-    OUTPUT_DIR = "crops"
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+def split_video_into_segments(video_path, segment_seconds, warmup_seconds):
+    """
+    Splits a long video into (start_frame, end_frame, warmup_frames) segments.
+    Short videos are returned as one segment.
+    """
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25
+    cap.release()
+
+    segment_frames = int(segment_seconds * fps) if segment_seconds else 0
+    warmup_frames = int(warmup_seconds * fps)
+
+    # Unknown length or short video: process in one piece
+    if segment_frames <= 0 or total_frames <= 0 or total_frames <= segment_frames * 1.5:
+        return [(0, None, 0)]
+
+    segments = []
+    for start in range(0, total_frames, segment_frames):
+        end = min(total_frames, start + segment_frames)
+        segments.append((start, end, warmup_frames if start > 0 else 0))
+
+    return segments
+
+
+def _process_segment(task):
+    # Worker entry point (must be module level to be picklable)
+    # Parallelism comes from processes, avoid OpenCV thread oversubscription
+    cv2.setNumThreads(1)
+    video_path, output_dir, skip_frames, start_frame, end_frame, warmup_frames, save_debug, encoding = task
+    return process_video(
+        video_path,
+        output_dir,
+        skip_frames=skip_frames,
+        start_frame=start_frame,
+        end_frame=end_frame,
+        warmup_frames=warmup_frames,
+        save_debug=save_debug,
+        encoding=encoding
+    )
+
+
+def process_videos_parallel(
+    video_paths,
+    output_dir,
+    workers=None,
+    skip_frames=1,
+    segment_seconds=600,
+    warmup_seconds=20,
+    save_debug=True,
+    manifest_path=None,
+    encoding=CROP_ENCODING
+):
+    """
+    Extracts crops from many videos with a process pool.
 
-    for video_file in os.listdir(VIDEO_DIR):
-        if video_file.lower().endswith((".mp4", ".avi", ".mov")):
-            process_video(os.path.join(VIDEO_DIR, video_file), OUTPUT_DIR, skip_frames=1)
+    Long videos are split into time segments with a warm-up overlap so one
+    long recording is also processed on several cores. Each task creates its
+    own background subtractor. Writes a manifest CSV with one row per crop.
+    """
+    tasks = []
+    for video_path in video_paths:
+        for start_frame, end_frame, warmup_frames in split_video_into_segments(video_path, segment_seconds, warmup_seconds):
+            tasks.append((video_path, output_dir, skip_frames, start_frame, end_frame, warmup_frames, save_debug, encoding))
 
-    print("Done.")
+    print(f"Processing {len(video_paths)} videos as {len(tasks)} tasks on {workers or os.cpu_count()} workers")
+
+    manifest = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_process_segment, task): task for task in tasks}
+
+        for future in as_completed(futures):
+            try:
+                manifest.extend(future.result())
+            except Exception as e:
+                print(f"Failed to process {futures[future][0]} from frame {futures[future][3]}: {e}")
 
+    # Stable order: by video, then frame, then ROI
+    manifest.sort(key=lambda row: (row["source_video"], row["frame_idx"], row["roi_idx"]))
 
+    if manifest_path is None:
+        manifest_path = os.path.join(output_dir, "manifest.csv")
 
+    with open(manifest_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS)
+        writer.writeheader()
+        writer.writerows(manifest)
 
+    print(f"Saved {len(manifest)} crops, manifest: {manifest_path}")
 
+    return manifest
 
+
+# MAIN SCRIPT
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract motion crops from videos for training data")
+    parser.add_argument("--videos", default="videos", help="Folder with videos")
+    parser.add_argument("--output", default="crops", help="Output folder for crops")
+    parser.add_argument("--workers", type=int, default=None, help="Number of processes (default: all cores)")
+    parser.add_argument("--skip-frames", type=int, default=1)
+    parser.add_argument("--segment-seconds", type=float, default=600, help="Split longer videos into segments (0 = off)")
+    parser.add_argument("--warmup-seconds", type=float, default=20, help="Background warm-up before each segment")
+    parser.add_argument("--no-debug", action="store_true", help="Do not save debug frames")
+    parser.add_argument("--image-format", choices=["jpeg", "webp"], default=CROP_ENCODING.format)
+    parser.add_argument("--quality", type=int, default=CROP_ENCODING.quality, help="Crop encoding quality (1-100)")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+
+    video_files = [
+        os.path.join(args.videos, video_file)
+        for video_file in sorted(os.listdir(args.videos))
+        if video_file.lower().endswith((".mp4", ".avi", ".mov"))
+    ]
+
+    process_videos_parallel(
+        video_files,
+        args.output,
+        workers=args.workers,
+        skip_frames=args.skip_frames,
+        segment_seconds=args.segment_seconds,
+        warmup_seconds=args.warmup_seconds,
+        save_debug=not args.no_debug,
+        encoding=ImageEncoding(args.image_format, args.quality)
+    )
+
+    print("Done.")
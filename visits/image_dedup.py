@@ -0,0 +1,42 @@
+import cv2
+import numpy as np
+from collections import deque
+
+# PARAMETERS
+HASH_SIZE = 8       # 8x8 gradient bits -> 64-bit hash
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """
+    Difference hash of an image: grayscale, resize to (hash_size + 1) x hash_size
+    and compare horizontally adjacent pixels. Small shifts, noise and
+    JPEG artefacts change only a few bits.
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+
+    return int(np.packbits(bits).tobytes().hex(), 16)
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class RecentImageHashes:
+    """
+    Hashes of the last `history` images saved for a visit.
+    An image is a near-duplicate if it is within `threshold` bits of any of them.
+    """
+
+    def __init__(self, threshold, history=8):
+        self.threshold = threshold
+        self.hashes = deque(maxlen=history)
+
+    def is_duplicate(self, image_hash):
+        return any(hamming_distance(image_hash, h) <= self.threshold for h in self.hashes)
+
+    def add(self, image_hash):
+        self.hashes.append(image_hash)
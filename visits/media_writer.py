@@ -0,0 +1,155 @@
+import cv2
+import os
+import logging
+import queue
+import threading
+from metrics import metrics
+from video_utils.image_encoding import encode_image
+
+
+class MediaWriter:
+    """
+    Encodes and writes images in background worker threads.
+
+    - bounded queue keeps memory under control when the disk is slow
+    - required images (visit frames and ROIs) wait up to `block_timeout`
+      seconds for a free slot (back-pressure), optional images are dropped
+      immediately when the queue is full
+    - `on_written` callback runs only after the file was fsynced and renamed
+      into place, so upload records never point to partial files
+
+    Images passed to `submit` must not be modified afterwards.
+    """
+
+    def __init__(self, workers=2, max_queue=64, block_timeout=0.5):
+        self.jobs = queue.Queue(maxsize=max_queue)
+        self.block_timeout = block_timeout
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+        # Number of queued or in-progress writes per tag (visit_id)
+        self.pending = {}
+        self.pending_lock = threading.Condition()
+
+        self.threads = []
+        for _ in range(workers):
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, path, image, on_written=None, tag=None, required=True, encoding=None):
+        """
+        Queues an image for writing. Returns False if the image was dropped.
+        """
+        job = (path, image, on_written, tag, encoding)
+
+        with self.pending_lock:
+            self.pending[tag] = self.pending.get(tag, 0) + 1
+
+        try:
+            if required:
+                self.jobs.put(job, timeout=self.block_timeout)
+            else:
+                self.jobs.put_nowait(job)
+
+        except queue.Full:
+            self.dropped += 1
+            metrics.inc("media_dropped")
+            self._done(tag)
+            logging.warning(f"Media writer queue full, dropped {path}")
+            return False
+
+        return True
+
+    def wait_for(self, tag, timeout=10):
+        """
+        Blocks until all writes submitted with this tag are finished.
+        """
+        with self.pending_lock:
+            finished = self.pending_lock.wait_for(
+                lambda: self.pending.get(tag, 0) == 0,
+                timeout=timeout
+            )
+
+        if not finished:
+            logging.warning(f"Timed out waiting for media writes of {tag}")
+
+        return finished
+
+    def queue_depth(self):
+        return self.jobs.qsize()
+
+    def stop(self):
+        """
+        Writes all queued images and stops the workers.
+        """
+        self.jobs.join()
+
+        for _ in self.threads:
+            self.jobs.put(None)
+
+        for thread in self.threads:
+            thread.join()
+
+        logging.info(
+            f"Media writer stopped: {self.written} written, "
+            f"{self.dropped} dropped, {self.failed} failed"
+        )
+
+    def _worker(self):
+        while True:
+            job = self.jobs.get()
+
+            if job is None:
+                self.jobs.task_done()
+                break
+
+            path, image, on_written, tag, encoding = job
+
+            try:
+                with metrics.timer("disk_write"):
+                    write_image_durably(path, image, encoding)
+                self.written += 1
+
+                if on_written is not None:
+                    on_written()
+
+            except Exception:
+                self.failed += 1
+                logging.exception(f"Failed to write {path}")
+
+            finally:
+                self._done(tag)
+                self.jobs.task_done()
+
+    def _done(self, tag):
+        with self.pending_lock:
+            self.pending[tag] -= 1
+            if self.pending[tag] == 0:
+                del self.pending[tag]
+            self.pending_lock.notify_all()
+
+
+def write_image_durably(path, image, encoding=None):
+    """
+    Encodes image (video_utils.image_encoding.ImageEncoding, by file extension
+    if not given) and writes it atomically (temp file + fsync + rename).
+    """
+    if encoding is not None:
+        data = encode_image(image, encoding)
+    else:
+        ok, encoded = cv2.imencode(os.path.splitext(path)[1], image)
+        if not ok:
+            raise RuntimeError(f"Image encoding failed for {path}")
+        data = encoded.tobytes()
+
+    temp_path = path + ".tmp"
+
+    with open(temp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(temp_path, path)
@@ -0,0 +1,75 @@
+from collections import deque
+
+
+class SlidingTimeWindow:
+    """
+    Sliding window of detection results defined in seconds instead of sample count.
+
+    Keeps semantics of the detection rules stable when the sampling rate changes.
+    Iterating over the window yields the stored boolean results, so sum() and any()
+    work the same way as with a deque.
+    """
+
+    def __init__(self, duration_sec, min_samples=1):
+        self.duration_sec = duration_sec
+        self.min_samples = min_samples
+        self.samples = deque()
+        # Stream time of the first sample since the window was last cleared
+        self.started_at = None
+
+    def append(self, timestamp, value):
+        """
+        Adds a result observed at `timestamp` (seconds) and drops expired results.
+        """
+        if self.started_at is None:
+            self.started_at = timestamp
+
+        self.samples.append((timestamp, value))
+
+        # Remove results older than the window duration
+        while self.samples and self.samples[0][0] <= timestamp - self.duration_sec:
+            self.samples.popleft()
+
+    def clear(self):
+        self.samples.clear()
+        self.started_at = None
+
+    def is_full(self):
+        """
+        True if the window has observed a full duration with enough samples.
+        """
+        if not self.samples or self.started_at is None:
+            return False
+
+        observed_sec = self.samples[-1][0] - self.started_at
+
+        return observed_sec >= self.duration_sec and len(self.samples) >= self.min_samples
+
+    def ratio(self):
+        """
+        Time-weighted share of positive results in the window.
+
+        Each result counts for the time until the next one, the newest for the
+        interval before it. After an idle (sparse) sample, a burst of samples
+        at the active rate therefore counts for the time it covers instead of
+        one vote per frame. At a constant rate this is the share of positive samples.
+        """
+        if not self.samples:
+            return 0.0
+
+        times = [timestamp for timestamp, _ in self.samples]
+        intervals = [later - earlier for earlier, later in zip(times, times[1:])]
+        # The newest result is assumed to hold for the current sampling interval
+        intervals.append(intervals[-1] if intervals else 0)
+
+        covered = sum(intervals)
+        if covered <= 0:
+            return sum(self) / len(self.samples)
+
+        return sum(interval for interval, value in zip(intervals, self) if value) / covered
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __iter__(self):
+        return (value for _, value in self.samples)
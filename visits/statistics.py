@@ -0,0 +1,261 @@
+import os
+import cv2
+import json
+import logging
+import numpy as np
+
+# Fence calibration of the original camera ("main"): the fence is split into
+# two planes at zone_split_x, each with its own homography (image px -> cm)
+# and a pixel to cm coefficient as fallback when a move crosses the zones
+DEFAULT_CALIBRATION = {
+    "zone_split_x": 700,
+    "zones": {
+        "LEFT": {
+            "image": [[110, 397], [700, 340], [711, 680], [128, 740]],
+            "real": [[0, 0], [365, 0], [365, 195], [0, 195]],
+            "pixel_to_cm": 365 / 603    # ≈ 0.605
+        },
+        "RIGHT": {
+            "image": [[700, 340], [1065, 380], [1067, 818], [711, 680]],
+            "real": [[0, 0], [360, 0], [360, 192], [0, 192]],
+            "pixel_to_cm": 360 / 366    # ≈ 0.98
+        }
+    }
+}
+
+# Calibrations of further cameras: {"camera_id": {same layout as DEFAULT_CALIBRATION}}
+CALIBRATION_PATH = os.getenv(
+    "CAMERA_CALIBRATION_PATH",
+    os.path.join(os.path.dirname(__file__), "camera_calibration.json")
+)
+
+# Prepared calibrations per camera id
+_calibrations = {}
+
+
+def prepare_calibration(spec):
+    """
+    Computes the homographies of a calibration spec.
+    """
+    zones = {}
+
+    for name, zone in spec["zones"].items():
+        zones[name] = {
+            "homography": cv2.getPerspectiveTransform(
+                np.array(zone["image"], dtype=np.float32),
+                np.array(zone["real"], dtype=np.float32)
+            ),
+            "pixel_to_cm": zone["pixel_to_cm"]
+        }
+
+    return {"zone_split_x": spec["zone_split_x"], "zones": zones}
+
+
+def load_calibration(camera_id=None):
+    """
+    Returns the prepared calibration of a camera.
+    Cameras without an entry in CALIBRATION_PATH use DEFAULT_CALIBRATION.
+    """
+    if camera_id not in _calibrations:
+        spec = DEFAULT_CALIBRATION
+
+        if camera_id is not None and os.path.exists(CALIBRATION_PATH):
+            with open(CALIBRATION_PATH) as f:
+                spec = json.load(f).get(camera_id, DEFAULT_CALIBRATION)
+
+            if spec is DEFAULT_CALIBRATION:
+                logging.info(f"No calibration for camera {camera_id}, using the default one")
+
+        _calibrations[camera_id] = prepare_calibration(spec)
+
+    return _calibrations[camera_id]
+
+
+def get_zone(x, calibration):
+    if x < calibration["zone_split_x"]:
+        return "LEFT"
+    return "RIGHT"
+
+
+def compute_visit_statistics(rows, calibration=None):
+    """
+    Calculates movement statistics of a visit from its ROIs
+    using adaptive movement threshold and smart handling of large time gaps.
+
+    rows: (roi_id, roi_timestamp, cx, cy, bbox_width) sorted by timestamp.
+    calibration: camera calibration from load_calibration (default camera if None).
+    Returns None if there is not enough data.
+    """
+    if len(rows) < 2:
+        return None
+
+    if calibration is None:
+        calibration = load_calibration()
+    zones = calibration["zones"]
+
+    # FILTER ROIS: keep one ROI per timestamp (compare by X only)
+    filtered_rows = []
+
+    prev_cx = None
+    i = 0
+
+    while i < len(rows):
+
+        current_ts = rows[i][1]
+        same_ts_group = []
+
+        # collect all ROIs with same timestamp
+        while i < len(rows) and rows[i][1] == current_ts:
+            same_ts_group.append(rows[i])
+            i += 1
+
+        # if only one ROI keep it
+        if len(same_ts_group) == 1:
+            chosen = same_ts_group[0]
+
+        else:
+            # multiple ROIs in same timestamp
+            if prev_cx is None:
+                # first frame take first ROI
+                chosen = same_ts_group[0]
+            else:
+                # choose ROI closest by X only
+                min_dx = float("inf")
+                chosen = None
+
+                for roi in same_ts_group:
+                    _, _, cx, _, _ = roi
+                    cx = float(cx)
+
+                    dx = abs(cx - prev_cx)
+
+                    if dx < min_dx:
+                        min_dx = dx
+                        chosen = roi
+
+        filtered_rows.append(chosen)
+
+        # update previous X
+        _, _, cx, _, _ = chosen
+        prev_cx = float(cx)
+
+    total_time = 0.0
+    moving_time = 0.0
+    idle_time = 0.0
+    total_distance_cm = 0.0
+    max_speed = 0.0
+
+    prev_ts = None
+    prev_cx = None
+    prev_cy = None
+
+    for roi_id, ts, cx, cy, bbox_width in filtered_rows:
+
+        cx = float(cx)
+        cy = float(cy)
+        bbox_width = float(bbox_width)
+
+        if prev_ts is not None:
+
+            delta_time = (ts - prev_ts).total_seconds()
+
+            if delta_time > 0:
+
+                zone_prev = get_zone(prev_cx, calibration)
+                zone_curr = get_zone(cx, calibration)
+
+                # COEFFICIENTS 
+                coef_prev = zones[zone_prev]["pixel_to_cm"]
+                coef_curr = zones[zone_curr]["pixel_to_cm"]
+                coef = (coef_prev + coef_curr) / 2
+
+                point_prev = np.array([[[prev_cx, prev_cy]]], dtype=np.float32)
+                point_curr = np.array([[[cx, cy]]], dtype=np.float32)
+
+                # SAME ZONE use homography
+                if zone_prev == zone_curr:
+
+                    homography = zones[zone_curr]["homography"]
+                    real_prev = cv2.perspectiveTransform(point_prev, homography)
+                    real_curr = cv2.perspectiveTransform(point_curr, homography)
+
+                    x1, y1 = real_prev[0][0]
+                    x2, y2 = real_curr[0][0]
+
+                    distance_cm = ((x2 - x1)**2 + (y2 - y1)**2)**0.5
+
+                # DIFFERENT ZONES fallback to pixel coef
+                else:
+
+                    distance_cm_px = ((cx - prev_cx)**2 + (cy - prev_cy)**2)**0.5
+                    distance_cm = distance_cm_px * coef
+
+
+                # convert bbox width to cm
+                bbox_width_cm = bbox_width * coef
+
+                # convert minimal noise threshold (5px) to cm
+                noise_cm = 8 * coef
+
+                min_shift_cm = max(noise_cm, bbox_width_cm * 0.05)
+
+                # print(
+                #     f"visit={visit_id} "
+                #     f"dt={delta_time:.3f}s "
+                #     f"dist_cm={distance_cm:.2f} "
+                #     f"cx_prev={prev_cx:.1f} "
+                #     f"cx={cx:.1f}"
+                #     f"min_shift_cm={min_shift_cm:.2f}"
+    # )
+
+                # Always accumulate total observed time
+                total_time += delta_time
+
+                # Handle large time gaps (likely idle period)
+                if delta_time > 2:
+
+                    if distance_cm >= min_shift_cm:
+                        # Assume movement lasted at most 1 second
+                        move_part = 1.0
+                        moving_time += move_part
+                        idle_time += (delta_time - move_part)
+                        total_distance_cm += distance_cm
+                        speed = distance_cm / move_part
+                    else:
+                        # No significant displacement → full idle
+                        idle_time += delta_time
+                        speed = 0.0
+
+                else:
+                    # Normal time interval
+                    if distance_cm >= min_shift_cm:
+                        moving_time += delta_time
+                        total_distance_cm += distance_cm
+                        speed = distance_cm / delta_time
+                    else:
+                        idle_time += delta_time
+                        speed = 0.0
+
+                # Track peak speed (only meaningful for movement)
+                if speed > max_speed:
+                    max_speed = speed
+
+        prev_ts = ts
+        prev_cx = cx
+        prev_cy = cy
+
+    if total_time == 0:
+        return None
+
+    activity_ratio = moving_time / total_time if total_time > 0 else 0
+    avg_speed = total_distance_cm / moving_time if moving_time > 0 else 0
+
+    return {
+        "total_time": total_time,
+        "moving_time": moving_time,
+        "idle_time": idle_time,
+        "activity_ratio": activity_ratio,
+        "total_distance_cm": total_distance_cm,
+        "avg_speed": avg_speed,
+        "max_speed": max_speed
+    }
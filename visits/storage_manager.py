@@ -0,0 +1,186 @@
+import os
+import time
+import shutil
+import logging
+import threading
+from metrics import metrics
+
+# PARAMETERS
+# Marker files written into a visit folder once its uploads are confirmed
+MEDIA_MARKER = ".uploaded_media"
+VIDEO_MARKER = ".uploaded_video"
+
+
+def mark_uploaded(visit_folder, kind):
+    """
+    Records a confirmed upload of a visit ("media" or "video").
+    Markers live next to the media so they survive restarts.
+    """
+    marker = MEDIA_MARKER if kind == "media" else VIDEO_MARKER
+
+    try:
+        with open(os.path.join(visit_folder, marker), "w") as f:
+            f.write(str(time.time()))
+    except OSError:
+        logging.exception(f"Failed to mark {visit_folder} as uploaded ({kind})")
+
+
+def is_uploaded(visit_folder):
+    """
+    True if DB records, ROIs and previews are uploaded and the video
+    is uploaded too (or there is none).
+    """
+    if not os.path.exists(os.path.join(visit_folder, MEDIA_MARKER)):
+        return False
+
+    has_video = os.path.exists(os.path.join(visit_folder, "visit.mp4"))
+    return not has_video or os.path.exists(os.path.join(visit_folder, VIDEO_MARKER))
+
+
+def scan_entry(path):
+    """
+    Returns (size in bytes, newest modification time) of a file or folder.
+    """
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime
+
+    size = 0
+    newest = os.stat(path).st_mtime
+
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except OSError:
+                # Removed by a writer/cleanup in the meantime
+                continue
+            size += stat.st_size
+            newest = max(newest, stat.st_mtime)
+
+    return size, newest
+
+
+class StorageManager:
+    """
+    Keeps the local media folder (possum_detected/<day>/...) within a quota.
+
+    - usage is limited by `max_bytes` and a minimum of free disk space
+    - entries older than `max_age_days` are removed
+    - eviction is least recently modified first
+    - visit folders are only removed after their uploads are confirmed
+      (see mark_uploaded), unuploaded visits are never evicted
+    - detection ROIs saved outside visits are local debugging copies and
+      are evicted like uploaded visits
+    """
+
+    def __init__(self, root_dir, max_bytes, max_age_days=0, min_free_bytes=0, check_interval_sec=300):
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.max_age_sec = max_age_days * 24 * 3600
+        self.min_free_bytes = min_free_bytes
+        self.check_interval_sec = check_interval_sec
+
+        self.used_bytes = 0
+        self.unuploaded_bytes = 0
+
+    def start(self):
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def scan(self):
+        """
+        Returns [(path, size, mtime, evictable)] of visit folders and loose files.
+        """
+        entries = []
+
+        if not os.path.isdir(self.root_dir):
+            return entries
+
+        for day in sorted(os.listdir(self.root_dir)):
+            day_dir = os.path.join(self.root_dir, day)
+            if not os.path.isdir(day_dir):
+                continue
+
+            for name in os.listdir(day_dir):
+                # Image still being written by the media writer
+                if name.endswith(".tmp"):
+                    continue
+
+                path = os.path.join(day_dir, name)
+
+                try:
+                    size, mtime = scan_entry(path)
+                except OSError:
+                    continue
+
+                evictable = not os.path.isdir(path) or is_uploaded(path)
+                entries.append((path, size, mtime, evictable))
+
+        return entries
+
+    def enforce(self):
+        """
+        Scans the media folder once and evicts entries over the age or size limits.
+        Returns the number of freed bytes.
+        """
+        entries = self.scan()
+        now = time.time()
+
+        self.used_bytes = sum(size for _, size, _, _ in entries)
+        self.unuploaded_bytes = sum(size for _, size, _, evictable in entries if not evictable)
+
+        freed = 0
+
+        # Least recently modified first
+        for path, size, mtime, evictable in sorted(entries, key=lambda entry: entry[2]):
+            too_old = self.max_age_sec and now - mtime > self.max_age_sec
+            over_quota = self.used_bytes - freed > self.max_bytes or self._low_disk()
+
+            if not (too_old or over_quota):
+                # Everything after this entry is newer and within quota
+                break
+
+            if not evictable:
+                continue
+
+            if self._remove(path):
+                freed += size
+                metrics.inc("storage_evicted_bytes", size)
+
+        self.used_bytes -= freed
+
+        if self.used_bytes > self.max_bytes or self._low_disk():
+            logging.warning(
+                f"Local storage over quota: {self.used_bytes / 1e9:.2f} GB used, "
+                f"{self.unuploaded_bytes / 1e9:.2f} GB not uploaded yet and kept"
+            )
+
+        if freed:
+            logging.info(f"Storage manager freed {freed / 1e6:.1f} MB")
+
+        return freed
+
+    def _low_disk(self):
+        if not self.min_free_bytes:
+            return False
+        return shutil.disk_usage(self.root_dir).free < self.min_free_bytes
+
+    def _remove(self, path):
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            return True
+        except OSError:
+            logging.exception(f"Failed to evict {path}")
+            return False
+
+    def _worker(self):
+        while True:
+            try:
+                self.enforce()
+            except Exception:
+                logging.exception("Storage check failed")
+
+            time.sleep(self.check_interval_sec)
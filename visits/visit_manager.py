@@ -6,13 +6,80 @@ from db.visit_repository import insert_visit
 # Enables running background threads for parallel execution
 import threading
 from db.visit_repository import update_visit_end
-from cloud.uploader import upload_visit_media
+from cloud.uploader import upload_visit_media, upload_visit_video
+from cloud.upload_scheduler import VideoUploadScheduler, UploadRetryQueue
+from visits.storage_manager import mark_uploaded
 from video_utils.trimming import trim_video
-from db.visit_repository import with_db_retry
+from db.visit_repository import with_db_retry, check_schema_version
+from config import UPLOAD_QUIET_WINDOWS, UPLOAD_BANDWIDTH_KBPS, UPLOAD_STATE_PATH
+from config import MEDIA_RETRY_STATE_PATH, MEDIA_RETRY_DELAY_SEC
 import queue
 
+# Small work (DB records, ROIs, previews): uploaded as soon as a visit closes
 upload_queue = queue.Queue()
 
+def upload_video_and_mark(visit_id, video_path, throttle=None):
+    upload_visit_video(visit_id, video_path, throttle)
+    # Storage manager may now evict the visit folder
+    mark_uploaded(os.path.dirname(video_path), "video")
+
+def upload_media_and_mark(visit_snapshot):
+    if not upload_visit_media(visit_snapshot):
+        return False
+
+    mark_uploaded(os.path.dirname(visit_snapshot["video_path"]), "media")
+    return True
+
+def snapshot_to_job(visit_snapshot):
+    """
+    JSON form of a visit snapshot for the persisted retry queue.
+    """
+    return {
+        "visit_id": visit_snapshot["visit_id"],
+        "video_path": visit_snapshot["video_path"],
+        "frame_upload_queue": [
+            [frame_path, timestamp.isoformat()]
+            for frame_path, timestamp in visit_snapshot["frame_upload_queue"]
+        ],
+        "roi_upload_queue": [
+            [roi_path, [int(v) for v in bbox], frame_path, timestamp.isoformat()]
+            for roi_path, bbox, frame_path, timestamp in visit_snapshot["roi_upload_queue"]
+        ]
+    }
+
+def job_to_snapshot(job):
+    return {
+        "visit_id": job["visit_id"],
+        "video_path": job["video_path"],
+        "frame_upload_queue": [
+            (frame_path, datetime.fromisoformat(timestamp))
+            for frame_path, timestamp in job["frame_upload_queue"]
+        ],
+        "roi_upload_queue": [
+            (roi_path, tuple(bbox), frame_path, datetime.fromisoformat(timestamp))
+            for roi_path, bbox, frame_path, timestamp in job["roi_upload_queue"]
+        ],
+        # Rows of the failed attempt are replaced
+        "retry": True
+    }
+
+def retry_media(job):
+    visit_folder = os.path.dirname(job["video_path"])
+
+    if not os.path.isdir(visit_folder):
+        # Nothing left to upload, the job is dropped
+        logging.error(f"Media of visit {job['visit_id']} is missing: {visit_folder}")
+        return True
+
+    return upload_media_and_mark(job_to_snapshot(job))
+
+# Large videos: deferred to quiet windows and bandwidth limited. Failed media
+# uploads: persisted and retried. Both are created by start_upload_workers(),
+# importing this module starts no threads
+video_scheduler = None
+media_retries = None
+workers_lock = threading.Lock()
+
 def upload_worker():
     while True:
         visit_snapshot = upload_queue.get()
@@ -21,22 +88,59 @@ def upload_worker():
             break
 
         try:
-            upload_visit_media(visit_snapshot)
+            # Visit appears in the dashboard with its ROI thumbnail right away
+            uploaded = upload_media_and_mark(visit_snapshot)
         except Exception:
             logging.exception("Upload failed")
+            uploaded = False
+
+        try:
+            if not uploaded:
+                # Not marked as uploaded: the storage manager keeps the visit until the retry succeeds
+                media_retries.add(snapshot_to_job(visit_snapshot))
+        except Exception:
+            logging.exception(f"Media upload of visit {visit_snapshot['visit_id']} could not be queued for retry")
         finally:
+            video_scheduler.submit(visit_snapshot["visit_id"], visit_snapshot["video_path"])
             upload_queue.task_done()
 
-threading.Thread(
-    target=upload_worker,
-    daemon=True
-).start()
+def start_upload_workers():
+    """
+    Starts the video scheduler, the media retry queue and the upload worker
+    once per process and returns (video_scheduler, media_retries).
+    """
+    global video_scheduler, media_retries
+
+    with workers_lock:
+        if video_scheduler is None:
+            # Stop before the first visit if migrations are missing
+            check_schema_version()
+
+            media_retries = UploadRetryQueue(
+                retry_media,
+                MEDIA_RETRY_STATE_PATH,
+                retry_delay_sec=MEDIA_RETRY_DELAY_SEC
+            )
+
+            video_scheduler = VideoUploadScheduler(
+                upload_video_and_mark,
+                UPLOAD_STATE_PATH,
+                quiet_windows=UPLOAD_QUIET_WINDOWS,
+                bandwidth_kbps=UPLOAD_BANDWIDTH_KBPS
+            )
+
+            threading.Thread(
+                target=upload_worker,
+                daemon=True
+            ).start()
+
+    return video_scheduler, media_retries
 
 # Function to initialize a new visit session with video and folder setup
-def create_new_visit(frame, base_dir, frame_idx, fps):
+def create_new_visit(frame, base_dir, frame_idx, fps, camera_id="main"):
 
     now_time = datetime.now()
-    visit_id = with_db_retry(insert_visit, now_time)
+    visit_id = with_db_retry(insert_visit, now_time, camera_id)
     # Logs visit start time
     logging.info(f"Visit {visit_id} started at {now_time.strftime('%Y-%m-%d %H:%M:%S')}")
 
@@ -78,7 +182,11 @@ def create_new_visit(frame, base_dir, frame_idx, fps):
 
 
 # Function to finalize visit session, trim video, update DB, and upload media
-def close_visit(current_visit, fps):
+def close_visit(current_visit, fps, media_writer=None):
+
+    if media_writer is not None:
+        # Frames and ROIs still being written are added to the upload queues by writer threads
+        media_writer.wait_for(current_visit["visit_id"])
 
     if current_visit["video_writer"] is not None:
         # Releases video writer and finalizes video file
@@ -96,8 +204,9 @@ def close_visit(current_visit, fps):
     visit_snapshot = {
         "visit_id": current_visit["visit_id"],
         "video_path": current_visit["video_path"],
-        "frame_upload_queue": list(current_visit["frame_upload_queue"]),
-        "roi_upload_queue": list(current_visit["roi_upload_queue"])
+        # Writer threads may finish out of order, keep records sorted by timestamp
+        "frame_upload_queue": sorted(current_visit["frame_upload_queue"], key=lambda item: item[1]),
+        "roi_upload_queue": sorted(current_visit["roi_upload_queue"], key=lambda item: item[3])
     }
 
     # Background function that uploads visit media to cloud storage without blocking main thread